@@ -0,0 +1,298 @@
+### Benchmarks of the Financial Analysis Dashboard
+
+# The benchmarks run offline on the fixture data provider (deterministic random walks), in a temporary price store
+# They time the loading of the prices, every analysis of the FinancialAnalysis class, the size and the serialization of the figures,
+# the search of the tickers and the callbacks of the dashboard from the request to the answer, at several scales
+# The bytes of the figures are given as sent by the dashboard, before and after the gzip compression of the server
+# The run of the analysis is also timed against a misbehaving provider (see FaultyProvider), to check that its p99 stays bounded
+# The results are saved as json and can be compared with a previous run to catch the regressions:
+#     python Benchmark_Financial_Analysis.py --output results.json
+#     python Benchmark_Financial_Analysis.py --output new.json --baseline results.json
+# The command fails (exit code 1) when a benchmark is slower than the baseline by more than the threshold
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import shutil
+import statistics
+import itertools
+import gzip
+
+# The dashboard reads the data provider when it is imported
+os.environ['DASHBOARD_DATA_PROVIDER'] = 'fixture'
+
+import numpy as np
+import pandas as pd
+import plotly
+import dash
+import Dashboard_Financial_Analysis as dfa
+
+
+### Definition of the scales and of the analyses
+
+# 2 against 200 tickers, 1 year against 30 years of daily bars, and about one million 1 minute bars (Bitcoin trades all day)
+scales = {
+    '1y_daily_2': {'tickers': ['AAPL', 'MSFT'], 'start': '2023-01-01', 'end': '2024-01-01', 'interval': '1d'},
+    '30y_daily_2': {'tickers': ['AAPL', 'MSFT'], 'start': '1994-01-01', 'end': '2024-01-01', 'interval': '1d'},
+    '30y_daily_200': {'tickers': 200, 'start': '1994-01-01', 'end': '2024-01-01', 'interval': '1d'},
+    'intraday_1m_1M': {'tickers': ['BTC-USD'], 'start': '2022-01-01', 'end': '2023-12-01', 'interval': '1m'},
+}
+
+# The analyses proposed by the dashboard for each number of assets
+common_analyses = ['plot_index_evolution', 'plot_returns_distribution', 'plot_volatility_evolution',
+                   'plot_daily_returns_evolution', 'plot_weekly_returns_evolution', 'plot_value_at_risk', 'plot_drawdowns',
+                   'plot_risk_ratios', 'plot_monte_carlo']
+analyses_by_mode = {
+    '1': common_analyses + ['perform_linear_regression', 'plot_rolling_regression'],
+    '2': common_analyses + ['perform_linear_regression', 'plot_rolling_regression'],
+    'N': common_analyses + ['plot_rolling_regression', 'plot_correlation_heatmap', 'plot_portfolio_evolution', 'plot_asset_statistics'],
+}
+
+# Queries typed in the search field, from full names to pieces of words and typos
+search_queries = ['apple', 'micro', 'tesla', 'gold', 'bank of am', 'nvda', 'berkshire hath', 'bitcoin', 'crude oil', 'jonhson']
+
+
+### Creation of the measurement functions
+
+# Time of each call of a function, in milliseconds
+def measure(function, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+def summary(times, **extra):
+    result = {'ms': statistics.median(times), 'min_ms': min(times), 'runs': len(times)}
+    result.update(extra)
+    return result
+
+def scale_tickers(scale):
+    if isinstance(scale['tickers'], int):
+        return list(itertools.islice(dfa.ticker_universe.tickers, scale['tickers']))
+    return scale['tickers']
+
+def scale_mode(tickers):
+    return str(len(tickers)) if len(tickers) <= 2 else 'N'
+
+
+### Creation of the benchmarks of the FinancialAnalysis class
+
+def benchmark_analysis(name, scale, store, repeat):
+    results = {}
+    tickers = scale_tickers(scale)
+    benchmark = len(tickers) != 2
+    analysis = dfa.FinancialAnalysis(store=store)
+    load = lambda: analysis.load(tickers, scale['start'], scale['end'], benchmark=benchmark, interval=scale['interval'])
+
+    # The first load downloads (generates) the prices and writes them in the price store, the next ones only read them
+    results[f'{name}/load/cold'] = summary(measure(load, 1))
+    results[f'{name}/load/warm'] = summary(measure(load, repeat))
+    panel, _ = load()
+    analysis = analysis.session(panel, tickers, interval=scale['interval'])
+    results[f'{name}/panel'] = {'rows': len(panel.dates), 'tickers': len(panel), 'bytes': int(panel.nbytes)}
+
+    # Conversion of the whole panel to another currency: the first one loads the exchange rates, the next ones find the converted panel
+    results[f'{name}/fx_conversion/cold'] = summary(measure(lambda: analysis.fx.convert(panel, 'EUR', scale['interval']), 1))
+    results[f'{name}/fx_conversion/warm'] = summary(measure(lambda: analysis.fx.convert(panel, 'EUR', scale['interval']), repeat))
+
+    for analysis_name in analyses_by_mode[scale_mode(tickers)]:
+        draw = getattr(analysis, analysis_name)
+        # The first call also computes the derived series (returns, volatility, ...), the next ones find them memoized
+        analysis.metrics = dfa.DerivedMetrics()
+        cold = measure(draw, 1)
+        warm = measure(draw, repeat)
+        # The figure as the dashboard sends it: compact arrays (see compact_figure), serialized by the engine of the dashboard
+        figure = dfa.compact_figure(draw())
+        serialization = measure(figure.to_json, repeat)
+        results[f'{name}/analysis/{analysis_name}'] = summary(warm, cold_ms=cold[0])
+        payload = figure.to_json().encode()
+        results[f'{name}/figure/{analysis_name}'] = summary(serialization, bytes=len(payload), gzip_bytes=len(gzip.compress(payload, 5)),
+                                                            points=int(sum(np.size(trace.x) for trace in figure.data if trace.x is not None)))
+    return results
+
+
+### Creation of the benchmarks of the dashboard callbacks
+
+# Call a callback of the dashboard like the browser does, waiting for the end of the background callbacks
+def post_callback(client, outputs, inputs, states=()):
+    body = {
+        'output': f'{outputs[0][0]}.{outputs[0][1]}' if len(outputs) == 1 else '..' + '...'.join(f'{i}.{p}' for i, p in outputs) + '..',
+        'outputs': [{'id': i, 'property': p} for i, p in outputs] if len(outputs) > 1 else {'id': outputs[0][0], 'property': outputs[0][1]},
+        'inputs': [{'id': i, 'property': p, 'value': v} for i, p, v in inputs],
+        'state': [{'id': i, 'property': p, 'value': v} for i, p, v in states],
+        'changedPropIds': [f'{inputs[0][0]}.{inputs[0][1]}'],
+    }
+    response = client.post('/_dash-update-component', json=body)
+    answer = response.get_json() if response.status_code == 200 else None
+    while answer is not None and 'cacheKey' in answer and 'response' not in answer:
+        time.sleep(0.02)
+        polled = client.post(f"/_dash-update-component?cacheKey={answer['cacheKey']}&job={answer['job']}", json=body)
+        if polled.status_code == 200 and 'response' in polled.get_json():
+            return polled.get_json()['response']
+    if response.status_code != 200:
+        raise RuntimeError(f'Callback {body["output"]} failed with status {response.status_code}')
+    return answer['response']
+
+def run_states(tickers, scale):
+    date = lambda value: pd.Timestamp(value).strftime('%d.%m.%Y')
+    mode = scale_mode(tickers)
+    tickers_list = [{'props': {'id': 'tickers-list', 'value': ', '.join(tickers)}}] if mode == 'N' else []
+    ticker_2 = [{'props': {'id': 'ticker-2', 'value': tickers[1]}}] if mode == '2' else []
+    return [('num-assets', 'value', mode), ('ticker-1', 'value', tickers[0]), ('ticker-2-container', 'children', ticker_2),
+            ('tickers-list-container', 'children', tickers_list), ('start-date', 'value', date(scale['start'])),
+            ('end-date', 'value', date(scale['end'])), ('analysis-checklist', 'value', analyses_by_mode[mode]),
+            ('prerender-analyses', 'value', []), ('bar-interval', 'value', scale['interval']), ('bar-frequency', 'value', None),
+            ('client-rendering', 'value', ['client']), ('base-currency', 'value', None)]
+
+def benchmark_callbacks(name, scale, store, repeat):
+    results = {}
+    tickers = scale_tickers(scale)
+    dashboard = dfa.Dashboard_Financial_Analysis(dfa.FinancialAnalysis(store=store))
+    client = dashboard.app.server.test_client()
+
+    run_outputs = [('analysis-dropdown', 'options'), ('analysis-dropdown', 'value'), ('error-message', 'children'), ('analysis-run', 'data'),
+                   ('analysis-data', 'data')]
+    run = lambda: post_callback(client, run_outputs, [('run-analysis', 'n_clicks', 1)], run_states(tickers, scale))
+    results[f'{name}/callback/run_analysis'] = summary(measure(run, repeat))
+    answer = run()
+    handle = answer['analysis-run']['data']
+    # The prices sent to the browser for the analyses it draws itself (none above the budget of values)
+    data = answer.get('analysis-data', {}).get('data')
+    results[f'{name}/client_data'] = {'bytes': len(json.dumps(data)) if data else 0}
+
+    # The server draws all the analyses asked by the browser, the ones the browser draws itself included (when it has no data)
+    display_outputs = [('selected-analysis-output', 'children')]
+    for analysis_name in analyses_by_mode[scale_mode(tickers)]:
+        request = {'analysis': analysis_name, 'handle': handle, 'window': 20, 'overlays': [], 'prerender': False}
+        display = lambda: post_callback(client, display_outputs, [('analysis-request', 'data', request)])
+        # The first display draws the figure, the next ones take it from the figure cache
+        first = measure(display, 1)
+        results[f'{name}/callback/display/{analysis_name}'] = summary(measure(display, repeat), first_ms=first[0])
+    return results
+
+
+### Creation of the benchmarks against a misbehaving provider
+
+# Time of the run of the analysis (p50 and p99) when the provider hangs on every refresh of stored prices, and when it fails often
+# The fetch guards use short timeouts here, so that the benchmark stays short; the runs must stay within their bounds
+fault_scenarios = {
+    # The stored prices stop six months before the end date, every refresh hangs: the stored prices are served after the revalidation delay
+    'hanging_refresh': {'faults': {'hang_rate': 1.0, 'hang_seconds': 30}, 'warm_until': '2023-07-01'},
+    # New tickers at each run, a third of the requests fail and the others are slow: the retries get the prices within the deadline
+    'flaky': {'faults': {'failure_rate': 0.3, 'latency': 0.05, 'jitter': 0.1}, 'warm_until': None},
+}
+
+def benchmark_faults(store_root, repeat):
+    results = {}
+    runs = max(repeat, 20)
+    for name, scenario in fault_scenarios.items():
+        provider = dfa.GuardedProvider(dfa.FaultyProvider(dfa.FixtureProvider(), **scenario['faults']), timeout=1, deadline=3, backoff=0.1)
+        store = dfa.PriceStore(provider, root=os.path.join(store_root, f'faults_{name}'), revalidate_timeout=0.5)
+        if scenario['warm_until']:
+            dfa.PriceStore(dfa.FixtureProvider(), root=store.base_root).get_many(['AAPL', 'MSFT'], '2023-01-01', scenario['warm_until'])
+        client = dfa.Dashboard_Financial_Analysis(dfa.FinancialAnalysis(store=store)).app.server.test_client()
+        run_outputs = [('analysis-dropdown', 'options'), ('analysis-dropdown', 'value'), ('error-message', 'children'),
+                       ('analysis-run', 'data'), ('analysis-data', 'data')]
+        times, errors = [], 0
+        for i in range(runs):
+            tickers = ['AAPL', 'MSFT'] if scenario['warm_until'] else [f'FLAKY{i}', f'FLAKY{i}-B']
+            scale = {'tickers': tickers, 'start': '2023-01-01', 'end': '2024-01-01', 'interval': '1d'}
+            start = time.perf_counter()
+            answer = post_callback(client, run_outputs, [('run-analysis', 'n_clicks', 1)], run_states(tickers, scale))
+            times.append((time.perf_counter() - start) * 1000)
+            errors += bool(answer.get('error-message', {}).get('children'))
+        results[f'faults/{name}/callback/run_analysis'] = summary(times, p99_ms=float(np.percentile(times, 99)), errors=errors)
+    return results
+
+
+### Creation of the benchmarks of the ticker search
+
+def benchmark_search(repeat):
+    results = {}
+    # The index itself, without the cache of the last queries
+    for query in search_queries:
+        results[f'search/index/{query}'] = summary(measure(lambda: dfa.search_index._search(query), repeat))
+    # The update_suggestions callback from the request to the answer
+    client = dfa.Dashboard_Financial_Analysis(dfa.FinancialAnalysis()).app.server.test_client()
+    suggestions = lambda: [post_callback(client, [('company-suggestions', 'options')], [('search-input', 'value', query)])
+                           for query in search_queries]
+    results['search/callback/update_suggestions'] = summary(measure(suggestions, repeat), queries=len(search_queries))
+    return results
+
+
+### Creation of the comparison with a baseline
+
+# Return the benchmarks slower than the baseline by more than the threshold (and by more than 1 ms, below it is noise)
+def compare(results, baseline, threshold):
+    regressions = []
+    for key, result in sorted(results.items()):
+        if 'ms' not in result or 'ms' not in baseline.get(key, {}):
+            continue
+        before, after = baseline[key]['ms'], result['ms']
+        ratio = after / before if before > 0 else float('inf')
+        flag = ratio > threshold and after - before > 1
+        print(f"{'REGRESSION' if flag else '':>10} {key:<70} {before:10.2f} ms -> {after:10.2f} ms ({ratio:5.2f}x)")
+        if flag:
+            regressions.append(key)
+    return regressions
+
+
+### Run the benchmarks
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks of the Financial Analysis Dashboard, on offline synthetic prices.')
+    parser.add_argument('--output', default='benchmark_results.json', help='json file where the results are saved')
+    parser.add_argument('--baseline', help='json file of a previous run to compare with')
+    parser.add_argument('--threshold', type=float, default=1.25, help='slowdown (ratio) above which a benchmark is a regression')
+    parser.add_argument('--scales', nargs='+', choices=list(scales), default=list(scales), help='scales to run')
+    parser.add_argument('--repeat', type=int, default=5, help='number of timed runs of each benchmark')
+    parser.add_argument('--skip-callbacks', action='store_true', help="don't time the callbacks of the dashboard")
+    parser.add_argument('--skip-faults', action='store_true', help="don't time the runs against a misbehaving provider")
+    args = parser.parse_args()
+
+    store_root = tempfile.mkdtemp(prefix='benchmark_price_store_')
+    # The sessions of the benchmark don't go in the session store of the dashboard
+    dfa.session_store = dfa.SessionStore(os.path.join(store_root, 'sessions'))
+    results = {}
+    try:
+        store = dfa.PriceStore(dfa.FixtureProvider(), root=store_root)
+        for name in args.scales:
+            print(f"Running the scale {name}...")
+            results.update(benchmark_analysis(name, scales[name], store, args.repeat))
+            if not args.skip_callbacks:
+                results.update(benchmark_callbacks(name, scales[name], store, args.repeat))
+        if not args.skip_faults:
+            print("Running against a misbehaving provider...")
+            results.update(benchmark_faults(store_root, args.repeat))
+        print("Running the search...")
+        results.update(benchmark_search(args.repeat))
+    finally:
+        shutil.rmtree(store_root, ignore_errors=True)
+
+    report = {
+        'meta': {'date': pd.Timestamp.now().isoformat(), 'python': platform.python_version(), 'platform': platform.platform(),
+                 'cpus': os.cpu_count(), 'numpy': np.__version__, 'pandas': pd.__version__, 'plotly': plotly.__version__,
+                 'dash': dash.__version__, 'repeat': args.repeat},
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved in {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} benchmark(s) slower than the baseline by more than {args.threshold}x")
+            sys.exit(1)
+        print("No regression against the baseline.")
+
+if __name__ == '__main__':
+    main()
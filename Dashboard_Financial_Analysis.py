@@ -1,729 +1,3640 @@
-### Code Advanced Programming Project Spring 2024, HEC, UNIL 
-
-# Isaac Graber, mail: isaac.graber@unil.ch
-# Financial Analysis Dashboard 
-
-### Install the necessary packages 
-
-import dash
-from dash import dcc, html, Output, Input, State, exceptions
-import yfinance as yf
-import pandas as pd
-import numpy as np
-import plotly.graph_objects as go
-from datetime import datetime
-import dash_bootstrap_components as dbc
-from rapidfuzz import process, fuzz
-import os
-import time
-# Download the CSV file "companies.csv", this file contain tickers associated with their respective company names
-# The user must place this file in the same place as the current python script 
-
-dir_path = os.path.dirname(os.path.realpath(__file__))
-file_path = os.path.join(dir_path, 'companies.csv')
-df = pd.read_csv(file_path)
-
-# Creating a data frame with tickers and company name
-company_to_ticker = pd.Series(df['ticker'].values, index=df['company name']).to_dict()
-
-# Adding some additionnal tickers
-additional_tickers={
-    # European companies
-    "Nestle SA": "NESN.SW", "Novartis AG": "NOVN.SW", "Roche Holding AG": "ROG.SW","HSBC Holdings plc": "HSBA.L", "Shell plc": "SHEL.L", "Unilever PLC": "ULVR.L",
-    "Bayer AG": "BAYN.DE", "Siemens AG": "SIE.DE", "Volkswagen AG": "VOW.DE","SAP SE": "SAP.DE", "Allianz SE": "ALV.DE", "Adidas AG": "ADS.DE",
-    # Swiss Companies
-    "UBS Group AG": "UBSG.SW", "ABB Ltd": "ABBN.SW","Zurich Insurance Group": "ZURN.SW", "Swiss Re": "SREN.SW", "Lonza Group AG": "LONN.SW",
-    # Global Stock Market Indexes
-    "Dow Jones Industrial Average": "^DJI", "NASDAQ Composite": "^IXIC", "S&P 500": "^GSPC","FTSE 100": "^FTSE", "DAX": "^GDAXI", "CAC 40": "^FCHI", "IBEX 35": "^IBEX",
-    "Euro Stoxx 50": "^STOXX50E", "FTSE MIB": "FTSEMIB.MI", "Hang Seng Index": "^HSI","Shanghai Composite": "000001.SS", "Nikkei 225": "^N225", "S&P/ASX 200": "^AXJO",
-    "Bovespa Index": "^BVSP", "TSX Composite Index": "^GSPTSE", "KOSPI": "^KS11", "SENSEX": "^BSESN", "Nifty 50": "^NSEI", "MOEX Russia Index": "IMOEX.ME",
-    "Swiss Market Index": "^SSMI", "TA-35": "TA35.TA" ,"US 10-Year Treasury Yield": "^TNX", "German 10-Year Bund Yield": "^DE10Y", 
-    "UK 10-Year Gilt Yield": "^TNX", "Swiss 10-Year Bond Yield": "^TNX",
-    # Cryptocurrencies
-    "Bitcoin": "BTC-USD", "Ethereum": "ETH-USD", "Binance Coin": "BNB-USD","Cardano": "ADA-USD", "Tether": "USDT-USD", "Solana-USD": "SOL-USD",
-    "XRP": "XRP-USD", "Polkadot": "DOT1-USD", "Dogecoin": "DOGE-USD","USD Coin": "USDC-USD", "Avalanche": "AVAX-USD", "Chainlink": "LINK-USD","Nvidia Corporation": "NVDA",  
-    "Sony Corporation": "SONY",  "Intel Corporation": "INTC",  "Advanced Micro Devices": "AMD",  "Samsung Electronics": "005930.KS",  "Alphabet Inc.": "GOOGL", 
-    }
-
-company_to_ticker.update(additional_tickers)
-
-# Creation of a function that access the company name based on the ticker provided 
-def get_company_name(ticker):
-        try:
-            stock_info = yf.Ticker(ticker)
-            return stock_info.info.get('longName', stock_info.info.get('shortName', ticker))
-        except Exception as e:
-            print(f"Failed to fetch name for ticker {ticker}: {e}")
-            
-            return ticker
-    
-# Creation of a function that access the currency in which the ticker is exprimed 
-def get_currency(ticker):
-        ticker_info = yf.Ticker(ticker).info
-        currency = ticker_info['currency']
-        
-        return currency
-
-
-### Creation of the FinancialAnalysis class 
-
-# This class stocks the downloading of the datas and all the analysis available for the the user in the application
-class FinancialAnalysis:
-    def __init__(self):
-        self.data = {}
-        self.tickers = []
-
-    def analysis(self, tickers, start_date, end_date):
-        
-        # Save the tickers provided as a list
-        self.tickers = tickers
-        self.data = {}
-       
-        # Determine if we need to include the S&P 500 for the regression purpose, if we provide one ticker not equal to one from the S&P 500
-        include_spy = len(tickers) == 1 and tickers[0] != '^GSPC'        
-        
-        # Use the provided tickers
-        tickers_to_fetch = tickers[:]  
-        
-        # Add S&P 500 for regression purpose
-        if include_spy:
-            tickers_to_fetch.append('^GSPC')  
-        
-        # Download the data with yfinance library
-        for ticker in tickers_to_fetch:
-            try:
-                data = yf.download(ticker, start=start_date, end=end_date)
-                
-                if data.empty:
-                    print(f"No data found for {ticker}, skipping.")
-                    continue 
-
-                self.data[ticker] = {
-                    'dates': data.index,
-                    'prices': data['Adj Close'],
-                    'daily Returns': data['Adj Close'].pct_change(),
-                    'daily volatility': data['Adj Close'].pct_change().rolling(window=20).std()
-                }
-            
-            except Exception as e:
-                print(f"An error occurred while processing {ticker}: {e}")
-                continue
-
-    ### Definition of our analysis 
-    
-    # Plot the index evolution and include currency information in the title
-    def plot_index_evolution(self):
-        fig = go.Figure()
-        titles = []
-        for ticker in self.tickers:
-            if ticker in self.data:
-                company_name = get_company_name(ticker)
-                currency=get_currency(ticker)
-                titles.append(f"{company_name}")
-                
-                fig.add_trace(go.Scatter(
-                    x=self.data[ticker]['dates'],y=self.data[ticker]['prices'],mode='lines',name=f'{company_name} Prices ({currency})'))
-
-        # Dynamic adaptation of titles
-        if len(titles) == 1:
-            title = f"Evolution of Index prices {titles[0]} in {currency}"
-        elif len(titles) > 1:
-            title = " and ".join(titles)
-            title = f"Evolution of Index for {title}"
-        else:
-            title = "Evolution of Index prices"
-        fig.update_layout(title=title, xaxis_title='Date', yaxis_title='Adjusted Close Price')
-        return fig
-
-    # Define the returns distribution
-    def plot_returns_distribution(self):
-        fig = go.Figure()
-        titles = []
-        
-        # Determine global min and max for bin edges
-        # Ensure histograms are plotted on the same scale
-        min_return = min(self.data[ticker]['daily Returns'].min() for ticker in self.tickers)
-        max_return = max(self.data[ticker]['daily Returns'].max() for ticker in self.tickers)
-        
-        # Each histogram is segmented into identical ranges
-        bin_edges = np.linspace(min_return, max_return, 51)  
-
-        for ticker in self.tickers:
-            company_name = get_company_name(ticker)  
-            titles.append(company_name)
-            daily_returns = self.data[ticker]['daily Returns'].dropna()
-            fig.add_trace(go.Histogram(
-                x=daily_returns,
-                name=f'{company_name}',
-                opacity=0.5,
-                xbins=dict(  
-                    start=min_return,
-                    end=max_return,
-                    size=(max_return - min_return) / 50
-                ),
-                histnorm='probability'
-            ))
-
-        if len(titles) == 1:
-            title = f"Distribution of daily Returns for {titles[0]}"
-        elif len(titles) > 1:
-            title = " and ".join(titles)
-            title = f"Distribution of daily Returns for {title}"
-        else:
-            title = "Distribution of daily Returns"
-
-        fig.update_layout(
-            title=title,
-            xaxis_title='Daily Returns',
-            yaxis_title='Probability', 
-            barmode='overlay',
-            bargap=0.1  
-        )
-        return fig
-
-    # Define the volatility evolution 
-    def plot_volatility_evolution(self):
-        fig = go.Figure()
-        titles = [] 
-        for ticker in self.tickers:
-            company_name = get_company_name(ticker)  
-            titles.append(company_name)  
-            fig.add_trace(go.Scatter(x=self.data[ticker]['dates'], y=self.data[ticker]['daily volatility'].dropna(), mode='lines', name=f'{company_name} Volatility'))
-        
-        if len(titles) == 1:
-            title = f"Evolution of Daily Volatility for {titles[0]}"
-        elif len(titles) > 1:
-            title = " and ".join(titles)
-            title = f"Evolution of Daily Volatility for {title}"
-        else:
-            title = "Evolution of Daily Volatility"
-
-        fig.update_layout(title=title, xaxis_title='Date', yaxis_title='Volatility')
-        return fig
-    
-    # Define the daily returns evolution
-    def plot_daily_returns_evolution(self):
-        fig = go.Figure()
-        titles = [] 
-        for ticker in self.tickers:
-            company_name = get_company_name(ticker)  
-            titles.append(company_name)  
-            fig.add_trace(go.Scatter(
-                x=self.data[ticker]['dates'],
-                y=self.data[ticker]['daily Returns'],
-                mode='lines',
-                name=f'{company_name} Daily Returns'
-            ))
-
-        if len(titles) == 1:
-            title = f"Evolution of Daily Returns for {titles[0]}"
-        elif len(titles) > 1:
-            title = " and ".join(titles)
-            title = f"Evolution of Daily Returns for {title}"
-        else:
-            title = "Evolution of Daily Returns"
-
-        fig.update_layout(
-            title=title,
-            xaxis_title='Date',
-            yaxis_title='Daily Returns (%)',
-            yaxis_tickformat='%',  
-            
-        )
-        return fig
-
-    # Define the weekly returns evolution 
-    def plot_weekly_returns_evolution(self):
-        fig = go.Figure()
-        titles=[]
-        for ticker in self.tickers:
-            company_name = get_company_name(ticker) 
-            titles.append(company_name)
-            # Define the weekly prices and weekly returns
-            if 'prices' in self.data[ticker]:
-                # Resample the data to weekly frequency, using 'last' to get the last available price of the week
-                weekly_prices = self.data[ticker]['prices'].resample('W').last()
-                # Calculate weekly returns from these prices
-                weekly_returns = weekly_prices.pct_change().dropna()
-                fig.add_trace(go.Scatter(
-                    x=weekly_returns.index,
-                    y=weekly_returns,
-                    mode='lines',
-                    name=f'{company_name} Weekly Returns'
-                ))
-        if len(titles) == 1:
-            title = f"Weekly Returns Evolution for {titles[0]}"
-        elif len(titles) > 1:
-            title = " and ".join(titles)
-            title = f"Weekly Returns Evolution for {title}"
-        else:
-            title = "Weekly Returns Evolution"
-        
-        fig.update_layout(
-            title=title,
-            xaxis_title='Date',
-            yaxis_title='Weekly Returns (%)',
-            yaxis_tickformat='%',  
-            
-        )
-        return fig
-    
-    # Define the linear regression 
-    # We use the daily returns for the linear regression
-    def perform_linear_regression(self):
-        
-        # If one ticker is provided, we use the S&P 500 for the linear regression 
-        if len(self.tickers) == 1:
-            ticker = self.tickers[0]
-            market_data = self.data['^GSPC']['daily Returns'] if ticker != '^GSPC' else self.data[ticker]['daily Returns']
-            asset_data = self.data[ticker]['daily Returns']
-        
-            # Align data by common dates and drop any NaN values
-            common_data = pd.concat([market_data, asset_data], axis=1, join='inner').dropna()
-            market_data_aligned = common_data.iloc[:, 0]
-            asset_data_aligned = common_data.iloc[:, 1]
-
-            # Check if lengths are equal after cleaning
-            if len(market_data_aligned) != len(asset_data_aligned):
-                print("Data alignment error: Arrays do not match in length.")
-                return None
-
-            # Perform linear regression
-            slope, intercept = np.polyfit(market_data_aligned, asset_data_aligned, 1)
-            beta = slope
-
-            # Generate plot
-            trace = go.Scatter(x=market_data_aligned, y=asset_data_aligned, mode='markers', name=get_company_name(ticker))
-            regression_line = np.polyval([slope, intercept], market_data_aligned)
-            regression_trace = go.Scatter(x=market_data_aligned, y=regression_line, mode='lines', name='Regression Line')
-        
-            figure = go.Figure(data=[trace, regression_trace])
-            figure.update_layout(
-                title=f'Linear Regression: {get_company_name(ticker)} on {"itself" if ticker == "^GSPC" else "S&P 500 index"}',
-                xaxis_title='S&P 500 Returns' if ticker != '^GSPC' else get_company_name(ticker) + ' Returns',
-                yaxis_title=get_company_name(ticker) + ' Returns'
-            )
-            # Display the beta value in the graph
-            figure.add_annotation(x=max(market_data_aligned), y=max(asset_data_aligned), text=f'Beta: {beta:.2f}', showarrow=False, arrowhead=1)
-            return figure
-        
-        # If two tickers are provided, we regress the first asset's daily returns on the second 
-        elif len(self.tickers) == 2:
-           asset1_data = self.data[self.tickers[0]]['daily Returns']
-           asset2_data = self.data[self.tickers[1]]['daily Returns']
-
-           # Align data by common dates and drop any NaN values
-           common_data = pd.concat([asset1_data, asset2_data], axis=1, join='inner').dropna()
-           asset2_data_aligned = common_data.iloc[:, 0]
-           asset1_data_aligned = common_data.iloc[:, 1]
-
-           # Check if lengths are equal after cleaning
-           if len(asset1_data_aligned) != len(asset2_data_aligned):
-            print("Data alignment error: Arrays do not match in length.")
-            return None
-
-           # Perform linear regression
-           slope, intercept = np.polyfit(asset2_data_aligned, asset1_data_aligned, 1)
-           beta = slope
-
-           # Generate plot
-           trace = go.Scatter(x=asset2_data_aligned, y=asset1_data_aligned, mode='markers', name=get_company_name(self.tickers[1]))
-           regression_line = np.polyval([slope, intercept], asset2_data_aligned)
-           regression_trace = go.Scatter(x=asset2_data_aligned, y=regression_line, mode='lines', name='Regression Line')
-        
-           figure = go.Figure(data=[trace, regression_trace])
-           figure.update_layout(
-               title=f'Linear Regression: {get_company_name(self.tickers[0])} on {get_company_name(self.tickers[1])}',
-               xaxis_title=get_company_name(self.tickers[1]) + ' Returns',
-               yaxis_title=get_company_name(self.tickers[0]) + ' Returns'
-           )
-           figure.add_annotation(x=max(asset2_data_aligned), y=max(asset1_data_aligned), text=f'Beta: {beta:.2f}', showarrow=True, arrowhead=1)
-           return figure
-
-
-### Creation of the Dashboard_Financial_Analysis class
-
-# This class construct the dashboard with two central parts: the layout and the callbacks 
-# The layout define the visual aspect of the dashboard and the callbacks define the interactivity of the dashboard 
-
-
-# Define a common input style for some elements in the dashboard 
-common_input_style = {'margin': '10px', 'font-size': '14px', 'margin-left': '0px'}  # Adjusted 'margin-left
-
-# Definition of the overall class
-class Dashboard_Financial_Analysis:
-    def __init__(self, analysis_instance):
-        self.analysis = analysis_instance
-        # We define here the overall style of the dashboard with the library dash_bootstraps components
-        self.app = dash.Dash(__name__, suppress_callback_exceptions=True, external_stylesheets=[dbc.themes.CERULEAN])
-        
-        ### Define the layout
-        # We give "id" for all the components that will be used in the callback part
-        
-        # Use the command container to wrap the whole layout
-        self.app.layout =dbc.Container([
-            # Design the title part
-            dbc.Row(
-                dbc.Col(html.H1("Financial Analysis Dashboard", className="text-center mt-4", style={'font-size': '24px'}), width=12)
-                ),
-            html.Hr(style={'background-color': 'primary', 'height': '2px'}),
-            dbc.Row([
-                dbc.Col([
-                    html.P("This dashboard provides financial analysis tools to explore stock data, visualize market trends, and conduct statistical analysis. Select a number of assets, the tickers, define a date range and choose the type of analysis to perform. In order to select assets, you will need to use the corresponding tickers from Yahoo Finance. You can find via the ticker researcher about seven thousands tickers. Otherwise, here's the link to find the tickers : https://finance.yahoo.com/", className="text-center mb-4", style={'font-size': '14px','font-family':'Segoe UI'})
-                ], width=12)
-            ]),
-            # Design the ticker researcher part 
-            dbc.Row([
-    dbc.Col([
-        html.H3("1 : Ticker Researcher ", className="mb-3", style={'margin-top':'20px','font-size': '16px'}),
-        html.Div("You can search here the symbol (ticker) attributed to your company by entering its name. Then you can copy the ticker and paste it in the tickers fields. ", style={'margin-bottom':'15px','font-size': '14px'}),
-        dbc.Row([ 
-            dbc.Col([
-                dcc.Input(
-                    id='search-input', 
-                    type='text', 
-                    placeholder='Type a company...', 
-                    style={
-                        'width': '240px',  
-                        'height': '25px',  
-                        'font-size': 'smaller', 
-                        'padding': '10px 5px',}
-                ),
-                # Dropdown for company suggestions placed directly below the input
-                dcc.Dropdown(
-                    id='company-suggestions',
-                    placeholder="Open to select a company",
-                    style={
-                        'width': '240px',
-                        'margin-top': '5px',
-                        'font-size': 'smaller',},
-                    options=[],
-                    # Disable the ability to clear the selection
-                    clearable=False,  
-                    searchable=False,)
-            ], width=2),
-            
-            dbc.Col([
-                html.Div(
-                    id='ticker-result', 
-                    className="p-2 border bg-light", 
-                    style={
-                        'width': '160px', 
-                        'height': '25px',  
-                        'font-size': 'smaller',
-                        'padding': '10px 5px',
-                        'display': 'flex',
-                        'align-items': 'center', 
-                        'justify-content': 'center'
-                    }
-                ),
-                # Add a copy button for the ticker 
-                html.Button('Copy', id='copy-btn', n_clicks=0, className="btn btn-primary btn-sm", style={'display': 'inline-block','padding': '3px 6px','font-size': '12px'}),
-                ], width=2), 
-                    ]),
-                html.Div(
-                    id='search-results', 
-                    style={'height': '50px', 'overflow-y': 'auto', 'width': '100%'}
-                )], width=12)
-        ], className="mb-3"),
-
-            # Design the selection of assets 
-            dbc.Row([
-                dbc.Col([
-                    html.H3("2 : Select the number of assets", style={'font-size': 'medium'}),
-                    dbc.RadioItems(
-                        id='num-assets',
-                        options=[
-                            {'label': 'One Asset', 'value': '1'},
-                            {'label': 'Two Assets', 'value': '2'}
-                        ],
-                        value='1',
-                        inline=True,
-                        style=common_input_style
-                    )], width=12)
-            ], className="mb-5"),
-            
-            # Design the selection of tickers 
-            dbc.Row([
-                dbc.Col([
-                    html.H3("3 : Enter the ticker(s) for your asset(s)", style={'font-size': 'medium'}),
-                    dcc.Input(id='ticker-1', type='text', placeholder='Enter Ticker 1', style=common_input_style),
-                    html.Div(id='ticker-2-container', children=[], style={'display': 'none'})  # Adjusted for initial hidden state
-                ], width=12)
-            ], className="mb-5"),
-
-            # Design the selection of the dates 
-            dbc.Row([
-                dbc.Col([
-                    html.H3("4 : Enter a date range for analysis", style={'font-size': 'medium'}),
-                    dcc.Input(id='start-date', type='text', placeholder='Start Date (DD.MM.YYYY)', style={'margin': '5px 41px 5px 0', 'font-size': 'smaller'}),
-                    dcc.Input(id='end-date', type='text', placeholder='End Date (DD.MM.YYYY)', style={'margin': '5px 0 5px 41px', 'font-size': 'smaller'})  # Added margin
-                ], width=12)
-            ], className="mb-5"),
-            
-            # Design the selection of the analysis
-                        dbc.Row([
-                dbc.Col([
-                    html.H3("5 : Choose the analysis to perform", style={'font-size': 'medium'}),
-                    # we create a section with a certain id containing an empty checklist that will adapt on the number of assets choosen
-                    html.Div(id='dynamic-analysis-checklist-container', children=[
-                        # The actual checklist is the return of a function in the callback
-                        # We set it initially empty in order to be always present in the layout
-                        dbc.Checklist(
-                            id='analysis-checklist',
-                            options=[],
-                            value=[],
-                            inline=True,
-                            style=common_input_style
-                        )
-                    ])
-                ], width=12)
-            ], className="mb-4"),
-            
-            # Design the run analysis button
-            dbc.Row(dbc.Col(
-                html.Button('Run Analysis', id='run-analysis', n_clicks=0, className="mx-auto mb-2 btn btn-primary btn-sm", style=common_input_style), width=12)),
-                html.Div("This button launches the analysis based on your parameters (number assets, tickers, dates, selected analysis). If you change your setup, don't forget to run again! ",style={'margin-top':'5px','font-size': '14px'}),
-            
-            # Design the dropdown to choose between the selected analysis 
-            dbc.Row([      
-            dbc.Col([
-                html.H3("6 : Choose the analysis you want to display here", className="mt-5 mb-2", style={'font-size': 'medium'}),  # Increased margin-bottom
-                dcc.Dropdown(id='analysis-dropdown', style={'width': '50%', 'font-size': 'smaller', 'margin-top': '15px'}, options=[], value=None)  # Added margin-top
-            ], width=12)
-            ], className="mb-4"),
-            
-            # Design the place where the selected analysis show up
-            dbc.Row([
-                dbc.Col(html.Div(id='selected-analysis-output'), width=12)
-            ], className="mb-4"),
-            # Design a place for a potential apparition of an error message
-            dbc.Row([
-                dbc.Col(html.Div(id='error-message', style={'color': 'red', 'margin': '5px', 'font-size': 'smaller'}), width=12)
-            ], className="mb-4"),
-            # Design and specify the place where the graphs of our analysis show up
-            dbc.Row([
-                dbc.Col(html.Div(id='output-container'), width=12)
-            ], className="mb-4")
-            # Specify the overall background color and font of the text
-        ], fluid=True,style={'background-color': '#E0EEEE','font-family': 'Segoe UI'})
-       
-        ### Define the callbacks part 
-        
-        self.setup_callbacks()
-    
-    # Define all the callbacks in this method 
-    # A callback has always two parts, the specification of output/inputs with id's and the function implementing that 
-    def setup_callbacks(self):
-        
-        ### Callbacks for the ticker researcher 
-        # Define the dynamic research of company name and return a list limited to five names
-        @self.app.callback(
-            Output('company-suggestions', 'options'),
-            Input('search-input', 'value')
-        )
-        def update_suggestions(query):
-            if query:
-                matches = process.extract(query, company_to_ticker.keys(), scorer=fuzz.WRatio, limit=5)
-                return [{'label': match[0], 'value': company_to_ticker[match[0]]} for match in matches]
-            return []
-        
-        # Define the ticker result when you select a company 
-        @self.app.callback(
-            Output('ticker-result', 'children'),
-            Input('company-suggestions', 'value')
-        )
-        def display_selected_ticker(ticker):
-            if ticker:
-                return f"{ticker}"
-            return "" 
-        
-        # Define the apparition of ticker 2 input field when two assets are choosen 
-        @self.app.callback(
-            [Output('ticker-2-container', 'children'), Output('ticker-2-container', 'style')],
-            Input('num-assets', 'value')
-        )
-        def manage_ticker_2_input(num_assets):
-            if num_assets == '2':
-                return [dcc.Input(id='ticker-2', type='text', placeholder='Enter Ticker 2', style=common_input_style)], {'display': 'block'}
-            return [], {'display': 'none'}
-        
-        # Define a callback that update dynamically the options for analysis based on number of assets choosen 
-        @self.app.callback(
-            Output('dynamic-analysis-checklist-container', 'children'),
-            Input('num-assets', 'value')
-        )
-        def update_analysis_checklist(num_assets):
-            options = [
-                {'label': 'Evolution of Index Prices', 'value': 'plot_index_evolution'},
-                {'label': 'Distribution of Daily Returns', 'value': 'plot_returns_distribution'},
-                {'label': 'Evolution of Daily Volatility', 'value': 'plot_volatility_evolution'},
-                {'label': 'Evolution of Daily Returns', 'value': 'plot_daily_returns_evolution'},
-                {'label': 'Evolution of Weekly Returns', 'value': 'plot_weekly_returns_evolution'}
-            ]
-            
-            if num_assets == '1':
-                options.append({'label': 'Linear Regression on S&P 500', 'value': 'perform_linear_regression'})
-            else:
-                options.append({'label': 'Linear Regression Analysis', 'value': 'perform_linear_regression'})
-
-            return dbc.Checklist(
-                id='analysis-checklist',
-                options=options,
-                value=['plot_index_evolution'],
-                inline=True,
-                style=common_input_style
-            )
-        
-        ### Critical compoenent of the dashboard 
-        # Propose : a list of the selected analysis, the default analysis value and the potential error message
-        # This proposition is directly triggered by the "input" (Run-analysis button) and takes "states" of relevant components to display the correct output
-        @self.app.callback(
-            [Output('analysis-dropdown', 'options'), Output('analysis-dropdown', 'value'), Output('error-message', 'children')],
-            Input('run-analysis', 'n_clicks'),
-            [State('num-assets', 'value'), State('ticker-1', 'value'), State('ticker-2-container', 'children'),
-             State('start-date', 'value'), State('end-date', 'value'), State('analysis-checklist', 'value')]
-        )
-        
-        def perform_and_display_analysis(n_clicks, num_assets, ticker1, ticker2_container, start_date, end_date, analysis_options):
-            # Prevent from running until user clicks on the run-analysis button 
-            if n_clicks == 0:
-                raise exceptions.PreventUpdate
-           
-            # calculate the time where the analyse starts 
-            start_time = time.time()
-
-            # More robust check for ticker2
-            # start with an empty value for ticker 2 and assign a value if user has choosen two assets and provided two tickers
-            ticker2 = None
-            if num_assets == '2' and ticker2_container:
-                input_component = ticker2_container[0] if ticker2_container else None
-                if input_component and 'props' in input_component and 'value' in input_component['props']:
-                    ticker2 = input_component['props']['value']
-            # create tickers based on user's choices
-            tickers = [ticker1 if ticker1 else None, ticker2 if ticker2 else None]
-
-            # Check if the required number of tickers matches the number of assets selected
-            if num_assets == '2' and (not tickers[0] or not tickers[1]):
-                return [], None, "Please provide both tickers when two assets are selected."
-
-            # Filter out None values for further processing
-            tickers = [ticker for ticker in tickers if ticker]
-            # Check if at least one ticker is provided to run the analysis
-            if not tickers:
-                return [], None, "Please provide at least one ticker."
-            # Check if there are dates to run the analysis
-            if not start_date or not end_date:
-                return [], None, "Please ensure all date fields are filled out."
-            # Check if the dates are specified properly (correct format and correct order)
-            try:
-                start_date = datetime.strptime(start_date, '%d.%m.%Y')
-                end_date = datetime.strptime(end_date, '%d.%m.%Y')
-                if start_date >= end_date:
-                    return [], None, "Start date must be before end date."
-            except ValueError:
-                return [], None, "Invalid date format. Please use DD.MM.YYYY."
-            
-            # Create an empty valid ticker once the tickers are correctly handled
-            valid_tickers = []
-            error_message = ""
-            # Download the data inside this method detect potential errors
-            for ticker in tickers:
-                try:
-                    data = yf.download(ticker, start=start_date, end=end_date)
-                    if data.empty:
-                        error_message += f"No data found for {ticker}. Please check ticker names and try again.\n"
-                    else:
-                        self.analysis.data[ticker] = {
-                            'dates': data.index,
-                            'prices': data['Adj Close'],
-                            'daily Returns': data['Adj Close'].pct_change(),
-                            'daily volatility': data['Adj Close'].pct_change().rolling(window=20).std()
-                        }
-                        # Tickers (with valid data) go in valid_tickers
-                        valid_tickers.append(ticker)
-                except Exception as e:
-                    error_message += f"Error downloading data for {ticker}: {str(e)}\n"
-            # If error message, return empty valid_tickers and the appropriate error message
-            if error_message:
-                return [], None, error_message
-
-            # Add S&P 500 data only for the linear regression analyse in the case of one asset choosen which isn't the S&P 500 itself
-            if 'perform_linear_regression' in analysis_options and len(valid_tickers) == 1 and valid_tickers[0] != '^GSPC':
-                try:
-                    sp500_data = yf.download('^GSPC', start=start_date, end=end_date)
-                    if not sp500_data.empty:
-                        self.analysis.data['^GSPC'] = {
-                            'dates': sp500_data.index,
-                            'prices': sp500_data['Adj Close'],
-                            'daily Returns': sp500_data['Adj Close'].pct_change(),
-                            'daily volatility': sp500_data['Adj Close'].pct_change().rolling(window=20).std()
-                        }
-                except Exception as e:
-                    error_message += f"Error downloading S&P 500 data: {str(e)}\n"
-            
-            # Assign the valid tickers as the tickers in the Financial_Analysis class 
-            # Link the two classes
-            self.analysis.tickers = valid_tickers
-            # Return the different option in the dropdown
-            options = [{'label': opt.replace('plot_', '').replace('_', ' ').title(), 'value': opt} for opt in analysis_options]
-            if 'perform_linear_regression' in analysis_options:
-                regression_label = 'Linear Regression on S&P 500' if len(valid_tickers) == 1 else 'Linear Regression Analysis'
-                options = [{'label': regression_label, 'value': 'perform_linear_regression'} if opt['value'] == 'perform_linear_regression' else opt for opt in options]
-            
-            # calculate the run time 
-            end_time = time.time()
-            elapsed_time = end_time - start_time
-            print(f"Runtime for updating dropdown with selected analysis: {elapsed_time:.2f} seconds")  
-            
-            return options, options[0]['value'] if options else None, ""
-        
-        # Define the apparition of the graph based on the user's selection in the dropdown of selected analysis
-        @self.app.callback(
-            Output('selected-analysis-output', 'children'),
-            Input('analysis-dropdown', 'value')
-        )
-        def display_analysis_result(selected_analysis):
-            # Verifies that the method to execute exists, preventing runtime errors
-            if selected_analysis and hasattr(self.analysis, selected_analysis):
-                # If the selected analysis method exists, this line retrieves the method from self.analysis
-                analysis_function = getattr(self.analysis, selected_analysis)
-                # Return the plotly figure created in self.analysis
-                return dcc.Graph(figure=analysis_function())
-            return "Select an analysis to display results."
-        # This callback uses a JavaScript function to handle clipboard actions 
-        self.app.clientside_callback(
-            """
-            function(n_clicks, ticker) {
-                if (n_clicks > 0) {
-                    navigator.clipboard.writeText(ticker).then(function() {
-                        // Change button text temporarily to indicate success
-                        setTimeout(function(){ document.getElementById('copy-btn').textContent = 'Copy'; }, 2000);  // Revert to 'Copy' after 2 seconds
-                        return 'Copied!';
-                    }, function(err) {
-                        console.error('Could not copy text: ', err);
-                        return 'Failed to copy!';
-                    });
-                }
-                return 'Copy';  // Default text ensuring users know it's the copy button
-            }
-            """,
-            Output('copy-btn', 'children'),
-            [Input('copy-btn', 'n_clicks')],
-            [State('ticker-result', 'children')]
-        )
-
-### This part makes the application running and create the server 
-    def run(self):
-        self.app.run_server(debug=True)
-
-# When the app is created, it creates two instances of the class directly
-# The app instance which represents the dashboard, utilizes the financial analysis functionalities directly !
-if __name__ == '__main__':
-    analysis_instance = FinancialAnalysis()
-    app = Dashboard_Financial_Analysis(analysis_instance)
-    app.run()
-
-                                                            ### End of code
-
+### Code Advanced Programming Project Spring 2024, HEC, UNIL 
+
+# Isaac Graber, mail: isaac.graber@unil.ch
+# Financial Analysis Dashboard 
+
+### Install the necessary packages 
+
+import dash
+from dash import dcc, html, dash_table, Output, Input, State, ClientsideFunction, exceptions
+from dash.dash_table import FormatTemplate
+from dash.dash_table.Format import Format, Scheme
+import pandas as pd
+import numpy as np
+import plotly.graph_objects as go
+import plotly.io as pio
+from plotly.subplots import make_subplots
+from datetime import datetime
+import dash_bootstrap_components as dbc
+from rapidfuzz import process, fuzz, utils
+import os
+import time
+import json
+import threading
+from collections import OrderedDict
+from functools import lru_cache, wraps
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import contextmanager, ExitStack
+from urllib.parse import quote
+import zlib
+import gzip
+import base64
+import hashlib
+import copy
+import uuid
+import cProfile
+import flask
+import shutil
+import importlib
+import math
+import random
+import warnings
+import multiprocessing
+from statistics import NormalDist
+from collections.abc import Mapping
+
+# Module imported at the first access to one of its attributes
+class LazyModule:
+    def __init__(self, name):
+        self.name = name
+        self.module = None
+
+    def __getattr__(self, attribute):
+        if self.module is None:
+            self.module = importlib.import_module(self.name)
+        return getattr(self.module, attribute)
+
+# yfinance takes most of a second to import and is only used for the downloads, the workers of the server start without it
+# (plotly.graph_objects is already imported by dash)
+yf = LazyModule('yfinance')
+
+# Download the CSV file "companies.csv", this file contain tickers associated with their respective company names
+# The user must place this file in the same place as the current python script 
+# It is only read when it changed since the last start (see the universe snapshot below)
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+file_path = os.path.join(dir_path, 'companies.csv')
+
+# Adding some additionnal tickers
+additional_tickers={
+    # European companies
+    "Nestle SA": "NESN.SW", "Novartis AG": "NOVN.SW", "Roche Holding AG": "ROG.SW","HSBC Holdings plc": "HSBA.L", "Shell plc": "SHEL.L", "Unilever PLC": "ULVR.L",
+    "Bayer AG": "BAYN.DE", "Siemens AG": "SIE.DE", "Volkswagen AG": "VOW.DE","SAP SE": "SAP.DE", "Allianz SE": "ALV.DE", "Adidas AG": "ADS.DE",
+    # Swiss Companies
+    "UBS Group AG": "UBSG.SW", "ABB Ltd": "ABBN.SW","Zurich Insurance Group": "ZURN.SW", "Swiss Re": "SREN.SW", "Lonza Group AG": "LONN.SW",
+    # Global Stock Market Indexes
+    "Dow Jones Industrial Average": "^DJI", "NASDAQ Composite": "^IXIC", "S&P 500": "^GSPC","FTSE 100": "^FTSE", "DAX": "^GDAXI", "CAC 40": "^FCHI", "IBEX 35": "^IBEX",
+    "Euro Stoxx 50": "^STOXX50E", "FTSE MIB": "FTSEMIB.MI", "Hang Seng Index": "^HSI","Shanghai Composite": "000001.SS", "Nikkei 225": "^N225", "S&P/ASX 200": "^AXJO",
+    "Bovespa Index": "^BVSP", "TSX Composite Index": "^GSPTSE", "KOSPI": "^KS11", "SENSEX": "^BSESN", "Nifty 50": "^NSEI", "MOEX Russia Index": "IMOEX.ME",
+    "Swiss Market Index": "^SSMI", "TA-35": "TA35.TA" ,"US 10-Year Treasury Yield": "^TNX", "German 10-Year Bund Yield": "^DE10Y", 
+    "UK 10-Year Gilt Yield": "^TNX", "Swiss 10-Year Bond Yield": "^TNX",
+    # Cryptocurrencies
+    "Bitcoin": "BTC-USD", "Ethereum": "ETH-USD", "Binance Coin": "BNB-USD","Cardano": "ADA-USD", "Tether": "USDT-USD", "Solana-USD": "SOL-USD",
+    "XRP": "XRP-USD", "Polkadot": "DOT1-USD", "Dogecoin": "DOGE-USD","USD Coin": "USDC-USD", "Avalanche": "AVAX-USD", "Chainlink": "LINK-USD","Nvidia Corporation": "NVDA",  
+    "Sony Corporation": "SONY",  "Intel Corporation": "INTC",  "Advanced Micro Devices": "AMD",  "Samsung Electronics": "005930.KS",  "Alphabet Inc.": "GOOGL", 
+    }
+
+
+### Creation of the PackedStrings class
+
+# Strings saved as one array of utf-8 bytes and the offsets of each string, so that they can be saved as .npy files and memory mapped
+# A string is only decoded when it is accessed
+def pack_strings(name, strings):
+    encoded = [str(string).encode('utf-8') for string in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(string) for string in encoded])
+    return {f'{name}_data': np.frombuffer(b''.join(encoded), dtype=np.uint8), f'{name}_offsets': offsets}
+
+class PackedStrings:
+    def __init__(self, arrays, name):
+        self.data = arrays[f'{name}_data']
+        self.offsets = arrays[f'{name}_offsets']
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.data[self.offsets[i]:self.offsets[i + 1]].tobytes().decode('utf-8')
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+
+### Creation of the TickerSearchIndex class
+
+# The ticker researcher is called at each keystroke, so the names are prepared once (see the universe snapshot below)
+# Each searchable text (company name, ticker, short name, tags) is normalized and cut in trigrams
+# A query only scores with WRatio the entries sharing the most trigrams with it, and recent queries are kept in a cache
+class TickerSearchIndex:
+    def __init__(self, arrays, candidates=100, cache_size=4096):
+        # arrays are the numpy arrays returned by the build method, they can be memory mapped
+        self.texts = PackedStrings(arrays, 'search_text')
+        self.labels = PackedStrings(arrays, 'search_label')
+        self.tickers = PackedStrings(arrays, 'search_ticker')
+        self.weights = arrays['search_weight']
+        self.lengths = arrays['search_length']
+        self.postings = {kind: (arrays[f'search_{kind}_keys'], arrays[f'search_{kind}_offsets'], arrays[f'search_{kind}_ids'])
+                         for kind in ('trigram', 'prefix')}
+        self.candidates = candidates
+        self.search = lru_cache(maxsize=cache_size)(self._search)
+
+    # Prepare the arrays of the index
+    # entries is a list of (searchable text, label shown in the dropdown, ticker, weight)
+    # The weight lowers the score of the texts shared by many companies like the tags
+    # The entries of each trigram (and of each prefix of 1 or 2 letters) are saved as sorted keys, offsets and concatenated entries
+    @classmethod
+    def build(cls, entries):
+        texts = []
+        labels = []
+        tickers = []
+        weights = []
+        trigrams = {}
+        prefixes = {}
+        seen = set()
+        for text, label, ticker, weight in entries:
+            text = utils.default_process(str(text))
+            if not text or (text, ticker) in seen:
+                continue
+            seen.add((text, ticker))
+            entry_id = len(texts)
+            texts.append(text)
+            labels.append(label)
+            tickers.append(ticker)
+            weights.append(weight)
+            for trigram in cls._trigrams(text):
+                trigrams.setdefault(trigram, []).append(entry_id)
+            # The prefixes of each word are used for queries too short to have a trigram
+            for word in text.split():
+                for length in (1, 2):
+                    prefixes.setdefault(word[:length], set()).add(entry_id)
+        arrays = {'search_weight': np.array(weights, dtype=np.float64),
+                  'search_length': np.array([len(text) for text in texts], dtype=np.int32)}
+        arrays.update(pack_strings('search_text', texts))
+        arrays.update(pack_strings('search_label', labels))
+        arrays.update(pack_strings('search_ticker', tickers))
+        for kind, postings, dtype in (('trigram', trigrams, 'U3'), ('prefix', prefixes, 'U2')):
+            keys = sorted(postings)
+            ids = [np.array(sorted(postings[key]), dtype=np.int32) for key in keys]
+            offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+            offsets[1:] = np.cumsum([len(key_ids) for key_ids in ids])
+            arrays[f'search_{kind}_keys'] = np.array(keys, dtype=dtype)
+            arrays[f'search_{kind}_offsets'] = offsets
+            arrays[f'search_{kind}_ids'] = np.concatenate(ids) if ids else np.array([], dtype=np.int32)
+        return arrays
+
+    # Trigrams of a text, the text is padded so that the beginning of the text counts more
+    @staticmethod
+    def _trigrams(text):
+        padded = f'  {text}'
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+    # Entries of each key ('trigram' or 'prefix') found in the index, by binary search in the sorted keys
+    def _lookup(self, kind, keys):
+        all_keys, offsets, ids = self.postings[kind]
+        keys = list(keys)
+        positions = np.searchsorted(all_keys, np.array(keys, dtype=all_keys.dtype))
+        return [ids[offsets[position]:offsets[position + 1]] for key, position in zip(keys, positions)
+                if position < len(all_keys) and all_keys[position] == key]
+
+    # Shortlist the entries sharing the most trigrams with the query, the tags lose the ties
+    def _shortlist(self, query):
+        if len(query) < 3:
+            postings = self._lookup('prefix', [query])
+            return postings[0][:self.candidates] if postings else np.array([], dtype=np.int32)
+        postings = self._lookup('trigram', self._trigrams(query))
+        if not postings:
+            return np.array([], dtype=np.int32)
+        counts = np.bincount(np.concatenate(postings), minlength=len(self.weights)) * self.weights
+        if np.count_nonzero(counts) <= self.candidates:
+            return np.flatnonzero(counts)
+        return np.argpartition(counts, -self.candidates)[-self.candidates:]
+
+    # Return the best matches as dropdown options, one option per ticker
+    def _search(self, query, limit=5):
+        query = utils.default_process(query)
+        if not query:
+            return []
+        shortlist = self._shortlist(query)
+        if not len(shortlist):
+            return []
+        scores = process.cdist([query], [self.texts[i] for i in shortlist], scorer=fuzz.WRatio, processor=None)[0]
+        lengths = self.lengths[shortlist]
+        # A text shorter than the query (a ticker inside a name for example) only matches a part of what was typed
+        scores = scores * self.weights[shortlist] * np.minimum(1, lengths / len(query))
+        options = []
+        seen_tickers = set()
+        # Equal scores are ordered by the length closest to the query
+        for entry_id in shortlist[np.lexsort((np.abs(lengths - len(query)), -scores))]:
+            ticker = self.tickers[entry_id]
+            if ticker not in seen_tickers:
+                seen_tickers.add(ticker)
+                options.append({'label': self.labels[entry_id], 'value': ticker})
+            if len(options) == limit:
+                break
+        return options
+
+
+### Creation of the universe snapshot
+
+# Reading companies.csv and preparing the search index took most of a second at each start of a worker of the server
+# They are saved once as a snapshot of .npy files, which the next starts memory map: a worker only reads the pages it uses
+# Each snapshot is a folder named after the size and the time of the csv file and the additional tickers, so a change rebuilds it
+# Only the columns used by the dashboard are read from the csv file (not the descriptions, websites and logos)
+universe_snapshot_path = os.path.join(dir_path, 'universe_snapshot')
+universe_snapshot_version = 2
+universe_columns = ['ticker', 'company name', 'short name', 'exchange', 'sector', 'industry', 'market cap', 'tag 1', 'tag 2', 'tag 3']
+
+def universe_snapshot_key(csv_path):
+    stat = os.stat(csv_path)
+    content = json.dumps([universe_snapshot_version, stat.st_size, stat.st_mtime_ns, additional_tickers], sort_keys=True)
+    return f'{zlib.crc32(content.encode()):08x}'
+
+# Arrays of the tickers of the csv file (used for the names, the exchanges and the screener) and of the search index
+def build_universe(csv_path):
+    companies = pd.read_csv(csv_path, usecols=universe_columns, dtype=str, keep_default_na=False)
+    company_to_ticker = dict(zip(companies['company name'], companies['ticker']))
+    company_to_ticker.update(additional_tickers)
+
+    # Each ticker can be found by its company name, its symbol, its short name and its tags
+    # The label shown in the dropdown is always the company name
+    search_entries = [(name, name, ticker, 1.0) for name, ticker in company_to_ticker.items()]
+    search_entries += [(ticker, name, ticker, 1.0) for name, ticker in company_to_ticker.items()]
+    search_entries += [(short_name, name, ticker, 1.0) for short_name, name, ticker in zip(companies['short name'], companies['company name'], companies['ticker'])]
+    for column in ['tag 1', 'tag 2', 'tag 3']:
+        search_entries += [(tag, name, ticker, 0.8) for tag, name, ticker in zip(companies[column], companies['company name'], companies['ticker'])
+                           if tag]
+    arrays = TickerSearchIndex.build(search_entries)
+    for column in ['ticker', 'company name', 'short name', 'exchange', 'sector', 'industry']:
+        arrays.update(pack_strings(f"universe_{column.replace(' ', '_')}", companies[column]))
+    arrays['universe_market_cap'] = pd.to_numeric(companies['market cap'], errors='coerce').to_numpy(dtype=np.float64)
+    return arrays
+
+# Return the arrays of the snapshot of the csv file, building it first if needed
+# The snapshot is written in a temporary folder and renamed, so a worker never reads a snapshot being written by another one
+def load_universe(csv_path=file_path, root=universe_snapshot_path):
+    folder = os.path.join(root, universe_snapshot_key(csv_path))
+    if not os.path.isdir(folder):
+        arrays = build_universe(csv_path)
+        tmp_folder = os.path.join(root, f'.tmp-{uuid.uuid4().hex}')
+        try:
+            os.makedirs(tmp_folder)
+            for name, array in arrays.items():
+                np.save(os.path.join(tmp_folder, f'{name}.npy'), array)
+            os.rename(tmp_folder, folder)
+        except OSError as e:
+            # Another worker saved the same snapshot first, or the folder is read only: the arrays built here are used
+            shutil.rmtree(tmp_folder, ignore_errors=True)
+            if not os.path.isdir(folder):
+                print(f"Failed to save the snapshot of the tickers: {e}")
+                return arrays
+        # The snapshots of older versions of the csv file are not needed anymore
+        for name in os.listdir(root):
+            if name != os.path.basename(folder) and not name.startswith('.tmp-'):
+                shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+    arrays = {}
+    for name in os.listdir(folder):
+        path = os.path.join(folder, name)
+        try:
+            # A plain array on the mapped memory, numpy.memmap slows down each of the many small slices of the search
+            arrays[name[:-len('.npy')]] = np.load(path, mmap_mode='r').view(np.ndarray)
+        except ValueError:
+            # An empty array can't be memory mapped
+            arrays[name[:-len('.npy')]] = np.load(path)
+    return arrays
+
+universe_arrays = load_universe()
+search_index = TickerSearchIndex(universe_arrays)
+
+
+# Currency of the tickers which are not in the csv file, based on the suffix of the ticker
+currency_by_suffix = {
+    '.SW': 'CHF', '.L': 'GBp', '.DE': 'EUR', '.MI': 'EUR', '.PA': 'EUR', '.MC': 'EUR', '.AS': 'EUR',
+    '.KS': 'KRW', '.SS': 'CNY', '.HK': 'HKD', '.T': 'JPY', '.ME': 'RUB', '.TA': 'ILS', '-USD': 'USD',
+}
+currency_by_index = {
+    '^FTSE': 'GBP', '^GDAXI': 'EUR', '^FCHI': 'EUR', '^IBEX': 'EUR', '^STOXX50E': 'EUR', '^HSI': 'HKD',
+    '^N225': 'JPY', '^AXJO': 'AUD', '^BVSP': 'BRL', '^GSPTSE': 'CAD', '^KS11': 'KRW', '^BSESN': 'INR',
+    '^NSEI': 'INR', '^SSMI': 'CHF', '^DE10Y': 'EUR',
+}
+
+# Creation of a function that guesses the currency of a ticker, the tickers without suffix are listed in the US
+def infer_currency(ticker):
+    if ticker in currency_by_index:
+        return currency_by_index[ticker]
+    for suffix, currency in currency_by_suffix.items():
+        if ticker.endswith(suffix):
+            return currency
+    return 'USD'
+
+
+### Creation of the ProcessThreadPool class
+
+# The analysis runs in background processes forked from the server (see the Dashboard class)
+# A forked process inherits the thread pools of its parent but not their threads, so the submitted work would never run
+# This pool creates its own ThreadPoolExecutor (or ProcessPoolExecutor, see the Monte Carlo simulations) in every process that uses it,
+# on its first use, the options are given to the executor (mp_context for example)
+class ProcessThreadPool:
+    def __init__(self, max_workers, executor_class=ThreadPoolExecutor, **options):
+        self.max_workers = max_workers
+        self.executor_class = executor_class
+        self.options = options
+        self.pid = None
+        self.executor = None
+
+    def _executor(self):
+        if self.pid != os.getpid():
+            self.executor = self.executor_class(max_workers=self.max_workers, **self.options)
+            self.pid = os.getpid()
+        return self.executor
+
+    def submit(self, fn, *args, **kwargs):
+        return self._executor().submit(fn, *args, **kwargs)
+
+    def map(self, fn, *iterables):
+        return self._executor().map(fn, *iterables)
+
+
+# diskcache is optional (pip install "dash[diskcache]"), it shares the jobs, the sessions and the timings between processes
+try:
+    import diskcache
+except ImportError:
+    diskcache = None
+
+
+### Creation of the Telemetry class
+
+# Every stage of the dashboard (downloads, reads of the price store, derived series, figures, callbacks, requests) is timed
+# The durations go in histograms with fixed buckets per (stage, labels), the hits and misses of the caches in counters
+# They are served in the Prometheus text format on the /metrics route of the server (see the Dashboard class)
+# The analysis runs in background processes and the server can have several workers, so each process adds what it measured
+# to a diskcache folder every few seconds (and at the end of each background job), the route shows the sum of all the processes
+telemetry_path = os.path.join(dir_path, 'telemetry')
+
+class Telemetry:
+    buckets = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+    def __init__(self, path=telemetry_path, flush_interval=5):
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        # Measures not yet added to the shared folder {(stage, labels): [count per bucket..., count above, sum, count]}
+        self.histograms = {}
+        # {(name, labels): value}
+        self.counters = {}
+        self.flushed_at = time.time()
+        # Without diskcache each process only shows its own measures
+        self.shared = diskcache.Cache(path) if diskcache is not None else None
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    # A forked process starts from zero, the measures of its parent are added by the parent
+    def _after_fork(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.flushed_at = time.time()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def observe(self, stage, seconds, **labels):
+        key = self._key(stage, labels)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [0] * (len(self.buckets) + 3)
+            histogram[bisect_left(self.buckets, seconds)] += 1
+            histogram[-2] += seconds
+            histogram[-1] += 1
+        self._maybe_flush()
+
+    def increment(self, name, amount=1, **labels):
+        key = self._key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+        self._maybe_flush()
+
+    # Time the block of a with statement: with telemetry.span('download', interval='1d'): ...
+    @contextmanager
+    def span(self, stage, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start, **labels)
+
+    # Same as span for a whole function
+    def timed(self, stage, **labels):
+        def decorator(function):
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.span(stage, **labels):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def _maybe_flush(self):
+        if self.shared is not None and time.time() - self.flushed_at > self.flush_interval:
+            self.flush()
+
+    # Add the measures of this process to the shared folder, in one transaction so that two processes never lose an update
+    def flush(self):
+        if self.shared is None:
+            return
+        with self.lock:
+            histograms, counters = self.histograms, self.counters
+            self.histograms, self.counters = {}, {}
+            self.flushed_at = time.time()
+        if not histograms and not counters:
+            return
+        try:
+            with self.shared.transact():
+                for key, values in histograms.items():
+                    total = self.shared.get(('histogram',) + key)
+                    self.shared.set(('histogram',) + key, [a + b for a, b in zip(total, values)] if total else values)
+                for key, value in counters.items():
+                    self.shared.set(('counter',) + key, self.shared.get(('counter',) + key, 0) + value)
+        except Exception as e:
+            print(f"Failed to save the timings: {e}")
+
+    # Measures of all the processes, the ones of this process not yet flushed included
+    def collect(self):
+        histograms, counters = {}, {}
+        if self.shared is not None:
+            for key in list(self.shared):
+                value = self.shared.get(key)
+                if value is not None:
+                    (histograms if key[0] == 'histogram' else counters)[key[1:]] = value
+        with self.lock:
+            for key, values in self.histograms.items():
+                histograms[key] = [a + b for a, b in zip(histograms[key], values)] if key in histograms else list(values)
+            for key, value in self.counters.items():
+                counters[key] = counters.get(key, 0) + value
+        return histograms, counters
+
+    # Prometheus text format: one histogram dashboard_stage_seconds with a label per stage, one counter per name
+    def render(self):
+        histograms, counters = self.collect()
+        def labels_text(labels):
+            return ','.join(f'{key}="{value}"' for key, value in labels)
+        lines = ['# HELP dashboard_stage_seconds Duration of the stages of the dashboard',
+                 '# TYPE dashboard_stage_seconds histogram']
+        for (stage, labels), values in sorted(histograms.items()):
+            labels = labels_text((('stage', stage),) + labels)
+            cumulative = np.cumsum(values[:-2])
+            for bound, count in zip(self.buckets + ('+Inf',), cumulative):
+                lines.append(f'dashboard_stage_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'dashboard_stage_seconds_sum{{{labels}}} {values[-2]}')
+            lines.append(f'dashboard_stage_seconds_count{{{labels}}} {values[-1]}')
+        for name in sorted({name for name, _ in counters}):
+            lines += [f'# HELP dashboard_{name}_total Number of {name.replace("_", " ")}', f'# TYPE dashboard_{name}_total counter']
+            for (counter_name, labels), value in sorted(counters.items()):
+                if counter_name == name:
+                    lines.append(f'dashboard_{name}_total{{{labels_text(labels)}}} {value}')
+        return '\n'.join(lines) + '\n'
+
+telemetry = Telemetry()
+
+# Class decorator timing every public method of a class as the stage 'method', with the name of the method as label
+def timed_methods(cls):
+    for name, attribute in list(vars(cls).items()):
+        if callable(attribute) and not name.startswith('_') and not isinstance(attribute, (staticmethod, classmethod, type)):
+            setattr(cls, name, telemetry.timed('method', method=f'{cls.__name__}.{name}')(attribute))
+    return cls
+
+
+### Creation of the interval functions
+
+# The bars can be daily ('1d', the default) or intraday with the intervals of yfinance ('1m', '5m', '15m', '30m', '1h', ...)
+# Length of one bar of an interval
+def interval_length(interval):
+    units = {'m': 'min', 'h': 'h', 'd': 'D'}
+    return pd.Timedelta(int(interval[:-1]), unit=units[interval[-1]])
+
+# Length of the pieces in which a long history is downloaded and stored, about the largest request yfinance accepts
+# Only one piece is in memory at a time, whatever the length of the history
+def ingestion_chunk(interval):
+    length = interval_length(interval)
+    if length < pd.Timedelta(minutes=2):
+        return pd.Timedelta(days=7)
+    if length < pd.Timedelta(hours=1):
+        return pd.Timedelta(days=30)
+    if length < pd.Timedelta(days=1):
+        return pd.Timedelta(days=180)
+    return pd.Timedelta(days=3650)
+
+# Number of bars in a year, used to annualize the volatility (252 trading days of 6.5 hours for the intraday bars)
+def periods_per_year(frequency):
+    per_year = {'1d': 252, 'D': 252, 'W': 52, 'M': 12}
+    if frequency in per_year:
+        return per_year[frequency]
+    return 252 * pd.Timedelta(hours=6.5) / interval_length(frequency)
+
+
+### Creation of the data providers
+
+# A data provider downloads the prices of a list of tickers and the information about one ticker
+# The dashboard uses yfinance, the fixture provider makes the whole application run without network (demos, load tests)
+class DataProvider:
+    name = 'base'
+
+    # Return a dictionary {ticker: data frame with the usual yfinance columns ('Adj Close', 'Volume', ...)}
+    # The intraday bars are indexed by UTC times without time zone
+    def download(self, tickers, start_date, end_date, interval='1d'):
+        raise NotImplementedError
+
+    # Return the yfinance-like information dictionary of a ticker ('longName', 'currency', ...) or None
+    def info(self, ticker):
+        return None
+
+class YFinanceProvider(DataProvider):
+    name = 'yfinance'
+
+    def __init__(self, batch_size=50, max_workers=8):
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.executor = ProcessThreadPool(max_workers)
+
+    # One batched yf.download per group of tickers, the batches run in parallel
+    # The total time is then close to the time of the slowest ticker instead of the sum of all of them
+    def download(self, tickers, start_date, end_date, interval='1d'):
+        batches = [tickers[i:i + self.batch_size] for i in range(0, len(tickers), self.batch_size)]
+        results = {}
+        for batch_results in self.executor.map(lambda batch: self._download_batch(batch, start_date, end_date, interval), batches):
+            results.update(batch_results)
+        return results
+
+    def _download_batch(self, tickers, start_date, end_date, interval):
+        data = yf.download(tickers, start=start_date, end=end_date, interval=interval, group_by='ticker', auto_adjust=False,
+                           progress=False, threads=min(self.max_workers, len(tickers)), timeout=fetch_timeout)
+        # yfinance prints the errors of the tickers instead of raising them, a batch left empty by the network or by the rate limit
+        # of Yahoo is raised so that it is retried (see GuardedProvider), an empty batch of wrong tickers is not
+        errors = getattr(getattr(yf, 'shared', None), '_ERRORS', None) or {}
+        if data.empty and any(word in str(error).lower() for error in errors.values() for word in transient_errors):
+            raise ConnectionError(f"Download of {', '.join(tickers)} failed: {'; '.join(set(map(str, errors.values())))}")
+        # The intraday bars come in the time zone of the exchange, they are kept in UTC
+        if data.index.tz is not None:
+            data.index = data.index.tz_convert('UTC').tz_localize(None)
+        results = {}
+        for ticker in tickers:
+            # Recent versions of yfinance always return a (ticker, field) column index, older ones only for several tickers
+            if isinstance(data.columns, pd.MultiIndex):
+                if ticker not in data.columns.get_level_values(0):
+                    results[ticker] = pd.DataFrame()
+                    continue
+                frame = data[ticker]
+            else:
+                frame = data
+            results[ticker] = frame.dropna(how='all')
+        return results
+
+    def info(self, ticker):
+        return yf.Ticker(ticker).info
+
+class FixtureProvider(DataProvider):
+    name = 'fixture'
+
+    # The prices are read from "<ticker>.csv" or "<ticker>.parquet" files if a folder is given
+    # Otherwise a random walk is generated, always the same for a given ticker whatever the date range asked
+    def __init__(self, fixture_dir=None, origin='1990-01-01'):
+        self.fixture_dir = fixture_dir
+        self.origin = pd.Timestamp(origin)
+
+    def _load_file(self, ticker):
+        if not self.fixture_dir:
+            return None
+        base_path = os.path.join(self.fixture_dir, quote(ticker, safe=''))
+        if os.path.exists(base_path + '.parquet'):
+            return pd.read_parquet(base_path + '.parquet')
+        if os.path.exists(base_path + '.csv'):
+            return pd.read_csv(base_path + '.csv', index_col=0, parse_dates=True)
+        return None
+
+    def _generate(self, ticker, end):
+        # Cryptocurrencies trade every day, the other assets only on business days
+        if ticker.endswith('-USD'):
+            dates = pd.date_range(self.origin, end, freq='D')
+        else:
+            dates = pd.bdate_range(self.origin, end)
+        # The parameters are drawn before the returns so that a longer range only adds values at the end
+        rng = np.random.default_rng(zlib.crc32(ticker.encode()))
+        volatility = rng.uniform(0.008, 0.03)
+        first_price = rng.uniform(20, 500)
+        returns = rng.normal(0.0003, volatility, len(dates))
+        prices = first_price * np.exp(np.cumsum(returns))
+        volumes = np.random.default_rng(zlib.crc32(ticker.encode()) + 1).integers(10_000, 10_000_000, len(dates))
+        return pd.DataFrame({'Open': prices, 'High': prices * 1.01, 'Low': prices * 0.99, 'Close': prices,
+                             'Adj Close': prices, 'Volume': volumes}, index=pd.DatetimeIndex(dates, name='Date'))
+
+    # Intraday bars between the daily closes of the random walk (a Brownian bridge per day, drawn from the ticker and the day)
+    # Only the days of the range are generated, so a long range can be asked in pieces
+    # The equities trade from 14:30 to 21:00 UTC, the cryptocurrencies all day
+    def _generate_intraday(self, ticker, start, end, interval):
+        daily = self._generate(ticker, end)['Adj Close']
+        previous_closes = daily.shift(1).fillna(daily.iloc[0])
+        crypto = ticker.endswith('-USD')
+        length = interval_length(interval)
+        session = pd.Timedelta(days=1) if crypto else pd.Timedelta(hours=6.5)
+        bars = max(int(session / length), 1)
+        volatility = daily.pct_change().std() / np.sqrt(bars)
+        frames = []
+        for day in daily.index[(daily.index >= start.normalize()) & (daily.index < end)]:
+            rng = np.random.default_rng([zlib.crc32(ticker.encode()), int(day.value // 10 ** 9)])
+            steps = np.cumsum(rng.normal(0, volatility, bars))
+            times = np.arange(1, bars + 1) / bars
+            log_path = steps - times * steps[-1] + times * np.log(daily[day] / previous_closes[day])
+            opens = day + (pd.Timedelta(0) if crypto else pd.Timedelta(hours=14, minutes=30)) + np.arange(bars) * length
+            frames.append(pd.Series(previous_closes[day] * np.exp(log_path), index=opens))
+        if not frames:
+            return pd.DataFrame(columns=['Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume'])
+        prices = pd.concat(frames)
+        prices = prices[(prices.index >= start) & (prices.index < end)]
+        volumes = np.random.default_rng(zlib.crc32(ticker.encode()) + 1).integers(100, 100_000, len(prices))
+        return pd.DataFrame({'Open': prices.values, 'High': prices.values * 1.001, 'Low': prices.values * 0.999, 'Close': prices.values,
+                             'Adj Close': prices.values, 'Volume': volumes}, index=pd.DatetimeIndex(prices.index, name='Datetime'))
+
+    def download(self, tickers, start_date, end_date, interval='1d'):
+        start = pd.Timestamp(start_date)
+        end = pd.Timestamp(end_date)
+        results = {}
+        for ticker in tickers:
+            data = self._load_file(ticker) if interval == '1d' else None
+            if data is None:
+                data = self._generate(ticker, end) if interval == '1d' else self._generate_intraday(ticker, start, end, interval)
+            results[ticker] = data[(data.index >= start) & (data.index < end)]
+        return results
+
+    def info(self, ticker):
+        return {'longName': ticker, 'shortName': ticker, 'currency': infer_currency(ticker)}
+
+# Stand-in of a misbehaving Yahoo Finance: the downloads of another provider (the fixture by default) are delayed, fail or hang
+# The faults are drawn from a seeded generator, so a load test always sees the same sequence of faults
+# ticker_latency is added for each ticker asked, like a real download which grows with the batch
+class FaultyProvider(DataProvider):
+    def __init__(self, provider=None, latency=0.0, jitter=0.0, failure_rate=0.0, hang_rate=0.0, hang_seconds=300.0, seed=0,
+                 ticker_latency=0.0):
+        self.provider = provider if provider is not None else FixtureProvider()
+        # The prices are the ones of the provider, they are stored in its folder of the price store
+        self.name = self.provider.name
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.hang_rate = hang_rate
+        self.hang_seconds = hang_seconds
+        self.ticker_latency = ticker_latency
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def download(self, tickers, start_date, end_date, interval='1d'):
+        with self.lock:
+            delay = self.latency + self.ticker_latency * len(tickers) + self.random.uniform(0, self.jitter)
+            draw = self.random.random()
+        if draw < self.hang_rate:
+            time.sleep(self.hang_seconds)
+        time.sleep(delay)
+        if draw < self.hang_rate + self.failure_rate:
+            raise ConnectionError(f"Injected failure for {', '.join(tickers)}")
+        return self.provider.download(tickers, start_date, end_date, interval)
+
+    def info(self, ticker):
+        return self.provider.info(ticker)
+
+
+### Creation of the fetch guards
+
+# A download of the provider must never hang a callback: each request has a timeout, the failed requests are retried after a random
+# pause (exponential backoff with full jitter) as long as the deadline of the download is not over, and the requests go through a
+# token bucket shared by all the processes (background jobs, workers of the server) so that they don't get rate limited together
+# After breaker_failures failed downloads in a row, the circuit breaker answers at once without asking the provider for breaker_reset seconds,
+# then lets one request try again. The price store then serves the prices it has (see PriceStore.fetch_many)
+fetch_timeout = 15
+fetch_deadline = 30
+fetch_retries = 2
+fetch_backoff = 0.5
+rate_limit_per_second = 2
+rate_limit_burst = 10
+breaker_failures = 5
+breaker_reset = 30
+rate_limit_path = os.path.join(dir_path, 'rate_limit')
+# Words of the errors of yfinance which are worth a retry
+transient_errors = ('rate limit', 'too many requests', 'timed out', 'timeout', 'connection')
+
+class CircuitOpenError(ConnectionError):
+    pass
+
+# Tokens refilled at rate per second up to capacity, each request of the provider takes one
+# With diskcache the bucket is kept in a folder shared by the processes, otherwise each process has its own bucket
+class TokenBucket:
+    def __init__(self, rate, capacity, name, path=rate_limit_path):
+        self.rate = rate
+        self.capacity = capacity
+        self.key = name
+        self.state = (capacity, time.time())
+        self.lock = threading.Lock()
+        self.shared = diskcache.Cache(path) if diskcache is not None else None
+
+    # Take a token if there is one and return 0, otherwise return the seconds until the next one
+    def _take(self, state):
+        tokens, updated = state
+        now = time.time()
+        tokens = min(self.capacity, tokens + (now - updated) * self.rate)
+        if tokens >= 1:
+            return (tokens - 1, now), 0
+        return (tokens, now), (1 - tokens) / self.rate
+
+    # Wait for a token at most timeout seconds, return False if none comes in time
+    def acquire(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self.lock:
+                if self.shared is not None:
+                    with self.shared.transact():
+                        state, pause = self._take(self.shared.get(self.key, self.state))
+                        self.shared.set(self.key, state)
+                else:
+                    self.state, pause = self._take(self.state)
+            if pause == 0:
+                return True
+            if deadline is not None and time.monotonic() + pause > deadline:
+                telemetry.increment('rate_limited', bucket=self.key)
+                return False
+            time.sleep(pause)
+
+# Closed while the provider answers, open (every request fails at once) after failures errors in a row
+# Once reset_after seconds have passed, a single request is let through: its success closes the circuit, its failure opens it again
+class CircuitBreaker:
+    def __init__(self, name, failures=breaker_failures, reset_after=breaker_reset):
+        self.name = name
+        self.failures = failures
+        self.reset_after = reset_after
+        self.errors = 0
+        self.opened_at = None
+        self.trial = False
+        self.lock = threading.Lock()
+
+    def before_request(self):
+        with self.lock:
+            if self.opened_at is None:
+                return
+            if self.trial or time.monotonic() - self.opened_at < self.reset_after:
+                raise CircuitOpenError(f"{self.name} is not answering, retrying in at most {self.reset_after} s")
+            self.trial = True
+
+    def record(self, success):
+        with self.lock:
+            self.trial = False
+            if success:
+                self.errors = 0
+                self.opened_at = None
+                return
+            self.errors += 1
+            if self.errors >= self.failures or self.opened_at is not None:
+                if self.opened_at is None:
+                    telemetry.increment('circuit_opened', provider=self.name)
+                self.opened_at = time.monotonic()
+
+# Run a function in a daemon thread and wait for it at most timeout seconds, a call which doesn't answer is left behind
+# (a thread can't be stopped) and doesn't keep the process alive at exit
+def call_with_timeout(timeout, function, *args):
+    outcome = {}
+    def target():
+        try:
+            outcome['result'] = function(*args)
+        except BaseException as e:
+            outcome['error'] = e
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(max(timeout, 0))
+    if thread.is_alive():
+        raise TimeoutError(f"No answer after {timeout:.1f} s")
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome['result']
+
+# The downloads of a provider with timeouts, retries, rate limit and circuit breaker (see above), in the same folder of the price store
+class GuardedProvider(DataProvider):
+    def __init__(self, provider, timeout=fetch_timeout, deadline=fetch_deadline, retries=fetch_retries, backoff=fetch_backoff,
+                 rate=rate_limit_per_second, burst=rate_limit_burst):
+        self.provider = provider
+        self.name = provider.name
+        self.timeout = timeout
+        self.deadline = deadline
+        self.retries = retries
+        self.backoff = backoff
+        self.bucket = TokenBucket(rate, burst, provider.name)
+        self.breaker = CircuitBreaker(provider.name)
+
+    # The circuit breaker counts the downloads which failed after all their retries
+    def download(self, tickers, start_date, end_date, interval='1d'):
+        self.breaker.before_request()
+        deadline = time.monotonic() + self.deadline
+        for attempt in range(self.retries + 1):
+            if not self.bucket.acquire(timeout=deadline - time.monotonic()):
+                self.breaker.record(False)
+                raise TimeoutError(f"Rate limit of {self.name} reached, no request before the deadline")
+            try:
+                with telemetry.span('provider_request', provider=self.name):
+                    results = call_with_timeout(min(self.timeout, deadline - time.monotonic()), self.provider.download,
+                                                tickers, start_date, end_date, interval)
+            except Exception as e:
+                telemetry.increment('provider_errors', provider=self.name, error=type(e).__name__)
+                pause = random.uniform(0, self.backoff * 2 ** attempt)
+                if attempt == self.retries or time.monotonic() + pause >= deadline:
+                    self.breaker.record(False)
+                    raise
+                time.sleep(pause)
+            else:
+                self.breaker.record(True)
+                return results
+
+    def info(self, ticker):
+        return self.provider.info(ticker)
+
+# The provider is chosen with the environment variable DASHBOARD_DATA_PROVIDER ("yfinance" by default, "fixture" or "faulty")
+# The fixture files can be placed in the folder given by DASHBOARD_FIXTURE_DIR
+# The faults of the faulty provider (fixture prices) are given in DASHBOARD_FAULTS, e.g. "latency=0.5,failure_rate=0.2,hang_rate=0.05"
+# The downloads of yfinance and of the faulty provider go through the fetch guards
+def create_data_provider():
+    provider_name = os.environ.get('DASHBOARD_DATA_PROVIDER', 'yfinance')
+    if provider_name == 'fixture':
+        return FixtureProvider(os.environ.get('DASHBOARD_FIXTURE_DIR'))
+    if provider_name == 'faulty':
+        faults = dict(fault.split('=') for fault in os.environ.get('DASHBOARD_FAULTS', '').replace(' ', '').split(',') if fault)
+        return GuardedProvider(FaultyProvider(FixtureProvider(os.environ.get('DASHBOARD_FIXTURE_DIR')),
+                                              **{key: float(value) for key, value in faults.items()}))
+    if provider_name != 'yfinance':
+        print(f"Unknown data provider {provider_name}, using yfinance.")
+    return GuardedProvider(YFinanceProvider())
+
+
+### Creation of the MetadataService class
+
+# The company names and currencies are used in every figure, so they must never wait for a network call
+# The service looks first in memory (LRU with expiry), then in a json file on disk, then in the companies.csv file
+# Only unknown tickers are asked to yfinance, in the background or in bulk when the analysis is run
+metadata_path = os.path.join(dir_path, 'metadata_cache.json')
+
+class MetadataService:
+    def __init__(self, provider, seeds, path=metadata_path, max_size=4096, memory_ttl=3600, disk_ttl=7 * 24 * 3600):
+        self.provider = provider
+        self.seeds = seeds
+        self.path = path
+        self.max_size = max_size
+        self.memory_ttl = memory_ttl
+        self.disk_ttl = disk_ttl
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.executor = ProcessThreadPool(8)
+        self.disk = {}
+        self.disk_mtime = None
+        self._reload()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    # A forked process gets a copy of the lock (maybe held by a thread which does not exist there) and of fetches it will never see finish
+    def _after_fork(self):
+        self.lock = threading.Lock()
+        self.pending = {}
+
+    # Read the json file again if another process (a background analysis) has written it since the last time
+    def _reload(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return False
+        if mtime == self.disk_mtime:
+            return False
+        try:
+            with open(self.path) as f:
+                self.disk.update(json.load(f))
+            self.disk_mtime = mtime
+        except (OSError, ValueError) as e:
+            print(f"Failed to read the metadata cache, starting from an empty one: {e}")
+        return True
+
+    # Ask the data provider for the information of one ticker and save it on disk
+    def _fetch(self, ticker):
+        try:
+            with telemetry.span('metadata_fetch'):
+                info = self.provider.info(ticker) or {}
+            entry = {
+                'name': info.get('longName', info.get('shortName', ticker)),
+                'short name': info.get('shortName', ticker),
+                'exchange': info.get('exchange', ''),
+                'currency': info.get('currency', infer_currency(ticker)),
+                'fetched': time.time(),
+            }
+        except Exception as e:
+            print(f"Failed to fetch metadata for ticker {ticker}: {e}")
+            with self.lock:
+                self.pending.pop(ticker, None)
+            return None
+        with self.lock:
+            self.disk[ticker] = entry
+            self._remember(ticker, entry)
+            self.pending.pop(ticker, None)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(self.disk, f)
+            os.replace(tmp_path, self.path)
+            self.disk_mtime = os.path.getmtime(self.path)
+        return entry
+
+    # Start a fetch in the background, only once per ticker
+    def _schedule(self, ticker):
+        if ticker not in self.pending:
+            self.pending[ticker] = self.executor.submit(self._fetch, ticker)
+        return self.pending[ticker]
+
+    # Keep the entry in memory and drop the least recently used one when the memory is full
+    def _remember(self, ticker, entry):
+        self.memory[ticker] = (entry, time.time())
+        self.memory.move_to_end(ticker)
+        while len(self.memory) > self.max_size:
+            self.memory.popitem(last=False)
+
+    # Main method: never blocks, an unknown ticker returns a default entry while its fetch runs in the background
+    def get(self, ticker):
+        with self.lock:
+            if ticker in self.memory:
+                entry, stored_at = self.memory[ticker]
+                if time.time() - stored_at < self.memory_ttl:
+                    self.memory.move_to_end(ticker)
+                    telemetry.increment('cache_requests', cache='metadata', result='memory')
+                    return entry
+            entry = self.disk.get(ticker)
+            if entry is None and ticker not in self.seeds and self._reload():
+                entry = self.disk.get(ticker)
+            if entry is not None:
+                # An old entry is still served, but refreshed for the next time
+                if time.time() - entry['fetched'] > self.disk_ttl:
+                    self._schedule(ticker)
+            else:
+                entry = self.seeds.get(ticker)
+            if entry is not None:
+                self._remember(ticker, entry)
+                telemetry.increment('cache_requests', cache='metadata', result='disk' if ticker in self.disk else 'seed')
+                return entry
+            telemetry.increment('cache_requests', cache='metadata', result='miss')
+            self._schedule(ticker)
+        return {'name': ticker, 'short name': ticker, 'exchange': '', 'currency': infer_currency(ticker)}
+
+    # Fetch all the unknown tickers of a list in parallel, used when the analysis is run
+    # With a timeout of 0 the fetches are only started, a later call waits for the same fetches
+    def prefetch(self, tickers, timeout=10):
+        with self.lock:
+            if any(ticker not in self.disk and ticker not in self.seeds for ticker in tickers):
+                self._reload()
+            futures = [self._schedule(ticker) for ticker in set(tickers)
+                       if ticker not in self.memory and ticker not in self.disk and ticker not in self.seeds]
+        if futures:
+            wait(futures, timeout=timeout)
+
+# The seeds of the metadata service {ticker: entry}, the tickers of the csv file (from the universe snapshot), then the additional tickers
+# The entries are only created when a ticker is asked
+class TickerUniverse(Mapping):
+    def __init__(self, arrays, additional):
+        self.tickers = PackedStrings(arrays, 'universe_ticker')
+        self.names = PackedStrings(arrays, 'universe_company_name')
+        self.short_names = PackedStrings(arrays, 'universe_short_name')
+        self.exchanges = PackedStrings(arrays, 'universe_exchange')
+        self.sectors = PackedStrings(arrays, 'universe_sector')
+        self.industries = PackedStrings(arrays, 'universe_industry')
+        self.market_caps = arrays['universe_market_cap']
+        self.companies = None
+        # A ticker listed under several names keeps the first one
+        self.additional = {}
+        for name, ticker in additional.items():
+            self.additional.setdefault(ticker, name)
+        self.rows = None
+
+    # Row of each ticker in the csv file, the last one wins like in a dict
+    def _rows(self):
+        if self.rows is None:
+            self.rows = {ticker: row for row, ticker in enumerate(self.tickers)}
+        return self.rows
+
+    def __getitem__(self, ticker):
+        row = self._rows().get(ticker)
+        if row is not None:
+            return {'name': self.names[row], 'short name': self.short_names[row], 'exchange': self.exchanges[row], 'currency': 'USD'}
+        name = self.additional[ticker]
+        return {'name': name, 'short name': name, 'exchange': '', 'currency': infer_currency(ticker)}
+
+    def __contains__(self, ticker):
+        return ticker in self._rows() or ticker in self.additional
+
+    def __iter__(self):
+        yield from self._rows()
+        yield from (ticker for ticker in self.additional if ticker not in self._rows())
+
+    def __len__(self):
+        return len(set(self._rows()) | set(self.additional))
+
+    # Table of the companies of the csv file (ticker, name, sector, industry, market cap), decoded at the first use (screener)
+    def table(self):
+        if self.companies is None:
+            self.companies = pd.DataFrame({'ticker': list(self.tickers), 'name': list(self.names), 'sector': list(self.sectors),
+                                           'industry': list(self.industries), 'market cap': self.market_caps})
+        return self.companies
+
+    # Tickers of the csv file in the sectors and industries given (all if None, case insensitive) with a market cap in the range given
+    def select(self, sectors=None, industries=None, min_market_cap=None, max_market_cap=None):
+        companies = self.table()
+        selected = np.ones(len(companies), dtype=bool)
+        if sectors:
+            selected &= companies['sector'].str.lower().isin([sector.lower() for sector in sectors]).to_numpy()
+        if industries:
+            selected &= companies['industry'].str.lower().isin([industry.lower() for industry in industries]).to_numpy()
+        if min_market_cap is not None:
+            selected &= (companies['market cap'] >= min_market_cap).to_numpy()
+        if max_market_cap is not None:
+            selected &= (companies['market cap'] <= max_market_cap).to_numpy()
+        return list(dict.fromkeys(companies.loc[selected, 'ticker']))
+
+ticker_universe = TickerUniverse(universe_arrays, additional_tickers)
+
+data_provider = create_data_provider()
+metadata_service = MetadataService(data_provider, ticker_universe)
+
+# Creation of a function that access the company name based on the ticker provided 
+def get_company_name(ticker):
+    return metadata_service.get(ticker)['name']
+
+# Creation of a function that access the currency in which the ticker is exprimed 
+def get_currency(ticker):
+    return metadata_service.get(ticker)['currency']
+
+
+### Creation of the PriceStore class
+
+# The prices are kept on disk so that a ticker is only downloaded once, next runs only fetch the missing head or tail of the date range
+# Each ticker has its own folder with one parquet file per year and a small json file remembering the date range already covered
+# The prices of each data provider are kept in a separate folder, the intraday bars in a subfolder per interval with monthly files
+price_store_path = os.path.join(dir_path, 'price_store')
+
+# File locks (Linux, macOS) make the processes wait for each other, elsewhere only the threads of one process do
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+class PriceStore:
+    def __init__(self, provider, root=price_store_path, max_workers=8, interval='1d', revalidate_timeout=2.0, batch_size=50):
+        self.provider = provider
+        self.base_root = root
+        self.max_workers = max_workers
+        self.interval = interval
+        # Tickers asked to the provider in one call, each call has its own timeout, retries and rate limit token (see GuardedProvider)
+        self.batch_size = batch_size
+        # Seconds a ticker which already has stored prices waits for its missing dates (see fetch_many)
+        self.revalidate_timeout = revalidate_timeout
+        self.root = os.path.join(root, provider.name) if interval == '1d' else os.path.join(root, provider.name, f'interval={interval}')
+        # The stores of the other intervals, created on demand by for_interval
+        self.siblings = {interval: self}
+        self.executor = ProcessThreadPool(max_workers)
+        self.locks = {}
+        self.locks_guard = threading.Lock()
+        # Downloads running in this process {(ticker, segment): future}, a second identical request waits for the same future
+        self.in_flight = {}
+        os.makedirs(os.path.join(self.root, '.locks'), exist_ok=True)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    # The locks copied in a forked process may be held by threads which only exist in the parent
+    def _after_fork(self):
+        self.locks = {}
+        self.locks_guard = threading.Lock()
+        self.in_flight = {}
+
+    # One lock per ticker so that two callbacks never write the same files at the same time
+    # It is also a file lock so that the other processes (background jobs, workers of the server) wait too
+    @contextmanager
+    def _lock(self, ticker):
+        with self.locks_guard:
+            lock = self.locks.setdefault(ticker, threading.Lock())
+        with lock:
+            if fcntl is None:
+                yield
+                return
+            with open(os.path.join(self.root, '.locks', quote(ticker, safe='')), 'w') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    # Store of the same provider for another interval of bars
+    def for_interval(self, interval):
+        with self.locks_guard:
+            if interval not in self.siblings:
+                self.siblings[interval] = PriceStore(self.provider, self.base_root, self.max_workers, interval, self.revalidate_timeout,
+                                                      self.batch_size)
+                self.siblings[interval].siblings = self.siblings
+            return self.siblings[interval]
+
+    # Tickers like ^GSPC or EURUSD=X are quoted to get a valid folder name
+    def _ticker_path(self, ticker):
+        return os.path.join(self.root, quote(ticker, safe=''))
+
+    # The files are yearly for the daily bars and monthly for the intraday bars, a file is identified by an integer (2024 or 202403)
+    def _partition_keys(self, index):
+        if self.interval == '1d':
+            return index.year
+        return index.year * 100 + index.month
+
+    def _partition_range(self, start, end):
+        if self.interval == '1d':
+            return list(range(start.year, end.year + 1))
+        return [year * 100 + month for year in range(start.year, end.year + 1) for month in range(1, 13)
+                if start.year * 100 + start.month <= year * 100 + month <= end.year * 100 + end.month]
+
+    def _partition_file(self, ticker, key):
+        name = str(key) if self.interval == '1d' else f'{key // 100}-{key % 100:02d}'
+        return os.path.join(self._ticker_path(ticker), f'{name}.parquet')
+
+    # The last bar can still change, so the covered range never goes beyond today (or the bar in progress for intraday bars)
+    def covered_until(self):
+        if self.interval == '1d':
+            return pd.Timestamp.today().normalize()
+        return pd.Timestamp.now('UTC').tz_localize(None).floor(interval_length(self.interval))
+
+    def _coverage_time(self, ticker):
+        try:
+            return os.path.getmtime(os.path.join(self._ticker_path(ticker), 'coverage.json'))
+        except OSError:
+            return None
+
+    def _read_coverage(self, ticker):
+        coverage_file = os.path.join(self._ticker_path(ticker), 'coverage.json')
+        if not os.path.exists(coverage_file):
+            return None
+        with open(coverage_file) as f:
+            coverage = json.load(f)
+        return pd.Timestamp(coverage['start']), pd.Timestamp(coverage['end'])
+
+    def _write_coverage(self, ticker, start, end):
+        coverage_file = os.path.join(self._ticker_path(ticker), 'coverage.json')
+        tmp_file = coverage_file + '.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump({'start': start.isoformat(), 'end': end.isoformat()}, f)
+        os.replace(tmp_file, coverage_file)
+
+    # Read the files overlapping the range one by one, keeping the rows between start (included) and end (excluded)
+    # Only one file is in memory at a time, columns limits the columns read ('Adj Close' for example)
+    def iter_chunks(self, ticker, start_date, end_date, columns=None):
+        start = pd.Timestamp(start_date)
+        end = pd.Timestamp(end_date)
+        for key in self._partition_range(start, end):
+            partition_file = self._partition_file(ticker, key)
+            if os.path.exists(partition_file):
+                data = pd.read_parquet(partition_file, columns=columns).sort_index()
+                yield data[(data.index >= start) & (data.index < end)]
+
+    def _read(self, ticker, start, end, columns=None):
+        frames = list(self.iter_chunks(ticker, start, end, columns))
+        if not frames:
+            return pd.DataFrame(columns=columns)
+        return pd.concat(frames)
+
+    # Merge the new rows into the files, the freshly downloaded rows win over the old ones
+    def _write(self, ticker, data):
+        os.makedirs(self._ticker_path(ticker), exist_ok=True)
+        for key, rows in data.groupby(self._partition_keys(data.index)):
+            partition_file = self._partition_file(ticker, key)
+            if os.path.exists(partition_file):
+                rows = pd.concat([pd.read_parquet(partition_file), rows])
+                rows = rows[~rows.index.duplicated(keep='last')].sort_index()
+            tmp_file = partition_file + '.tmp'
+            rows.to_parquet(tmp_file)
+            os.replace(tmp_file, partition_file)
+
+    # Return the segments of [start, end) which are not already on disk
+    # Only the head and the tail can be missing since the covered range always stays in one piece
+    def missing_segments(self, ticker, start, end):
+        coverage = self._read_coverage(ticker)
+        if coverage is None:
+            return [(start, end)]
+        covered_start, covered_end = coverage
+        segments = []
+        if start < covered_start:
+            segments.append((start, covered_start))
+        if end > covered_end:
+            segments.append((covered_end, end))
+        return segments
+
+    # Save a downloaded segment and extend the covered range, the lock of the ticker is held by the caller
+    def _store_segment(self, ticker, segment_start, segment_end, data):
+        covered_until = self.covered_until()
+        coverage = self._read_coverage(ticker)
+        # An empty answer for a ticker never seen before is most likely a wrong ticker, we don't remember it
+        # For a known ticker it only means there is no trading in this segment (before the listing for example)
+        if data.empty and coverage is None:
+            return
+        if not data.empty:
+            self._write(ticker, data)
+        if coverage is None:
+            coverage = (segment_start, min(segment_end, covered_until))
+        else:
+            coverage = (min(coverage[0], segment_start), max(coverage[1], min(segment_end, covered_until)))
+        self._write_coverage(ticker, *coverage)
+
+    # Download a segment for several tickers, holding their locks (taken in order, so two downloads never wait for each other forever)
+    # A ticker stored by another process while this download was waiting for the locks is not asked again
+    # A long segment is downloaded and stored in pieces (see ingestion_chunk), so only one piece is in memory at a time
+    def _download_segment(self, tickers, segment_start, segment_end, requested_at):
+        with ExitStack() as stack:
+            for ticker in sorted(tickers):
+                stack.enter_context(self._lock(ticker))
+            tickers = [ticker for ticker in tickers
+                       if (self._coverage_time(ticker) or 0) < requested_at and self.missing_segments(ticker, segment_start, segment_end)]
+            if not tickers:
+                return
+            chunk_length = ingestion_chunk(self.interval)
+            bounds = [segment_start]
+            while bounds[-1] + chunk_length < segment_end:
+                bounds.append(bounds[-1] + chunk_length)
+            bounds.append(segment_end)
+            chunks = list(zip(bounds[:-1], bounds[1:]))
+            # A missing head is filled backwards, so that the covered range stays in one piece after each piece
+            coverage = self._read_coverage(tickers[0])
+            if coverage is not None and segment_end <= coverage[0]:
+                chunks.reverse()
+            for chunk_start, chunk_end in chunks:
+                with telemetry.span('download', provider=self.provider.name, interval=self.interval):
+                    results = self.provider.download(tickers, chunk_start, chunk_end, interval=self.interval)
+                with telemetry.span('store_write', interval=self.interval):
+                    for ticker, data in results.items():
+                        self._store_segment(ticker, chunk_start, chunk_end, data)
+
+    def _forget(self, keys, future):
+        with self.locks_guard:
+            for key in keys:
+                if self.in_flight.get(key) is future:
+                    del self.in_flight[key]
+
+    # Main method: serve the range from disk and download only what is missing
+    # The tickers missing the same segment are downloaded together in batches of batch_size, the batches run in parallel
+    # Each batch is stored as soon as it arrives, a batch which fails doesn't lose the others
+    # A (ticker, segment) already being downloaded for another user is not asked twice, both wait for the same download
+    # If a download fails (no connection for example), the data already cached is returned
+    # progress(done, total, ticker) is called each time all the missing segments of a ticker have been handled
+    # columns limits the columns read, the whole frames are returned by default
+    # With fetch False nothing is downloaded, only the stored prices are read (the processes of the batch report)
+    def get_many(self, tickers, start_date, end_date, progress=None, columns=None, fetch=True):
+        start = pd.Timestamp(start_date).normalize()
+        end = pd.Timestamp(end_date).normalize()
+        if fetch:
+            self.fetch_many(tickers, start, end, progress)
+        # The files are read in parallel too, which matters for baskets of hundreds of tickers
+        with telemetry.span('store_read', interval=self.interval):
+            return dict(zip(tickers, self.executor.map(lambda ticker: self._read(ticker, start, end, columns), tickers)))
+
+    # Download the missing segments of the tickers, without reading them (see iter_chunks to read a long history in pieces)
+    # Stale while revalidate: the tickers which already have stored prices only wait revalidate_timeout seconds for their missing dates,
+    # their stored prices are then used and the download goes on in the background (the next runs find it in the store)
+    # The tickers never stored are always waited for, the fetch guards of the provider bound the time of their download
+    # With stale_ok False every download is waited for (the batch report, which reads the store from other processes)
+    def fetch_many(self, tickers, start_date, end_date, progress=None, stale_ok=True):
+        start = pd.Timestamp(start_date).normalize()
+        end = pd.Timestamp(end_date).normalize()
+
+        tickers_by_segment = {}
+        segments_left = {}
+        stale = set()
+        for ticker in dict.fromkeys(tickers):
+            segments = self.missing_segments(ticker, start, end)
+            segments_left[ticker] = len(segments)
+            if segments and self._read_coverage(ticker) is not None:
+                stale.add(ticker)
+            for segment in segments:
+                tickers_by_segment.setdefault(segment, []).append(ticker)
+        done = sum(count == 0 for count in segments_left.values())
+        telemetry.increment('cache_requests', done, cache='price_store', result='hit')
+        telemetry.increment('cache_requests', len(segments_left) - done, cache='price_store', result='miss')
+        if progress is not None:
+            progress(done, len(segments_left), None)
+
+        # Future of each download this call waits for, with the tickers of this call it contains
+        futures = {}
+        new_downloads = []
+        requested_at = time.time()
+        with self.locks_guard:
+            for segment, segment_tickers in tickers_by_segment.items():
+                new_tickers = []
+                for ticker in segment_tickers:
+                    future = self.in_flight.get((ticker, segment))
+                    if future is None:
+                        new_tickers.append(ticker)
+                    else:
+                        futures.setdefault(future, []).append(ticker)
+                for i in range(0, len(new_tickers), self.batch_size):
+                    batch = new_tickers[i:i + self.batch_size]
+                    future = self.executor.submit(self._download_segment, batch, *segment, requested_at)
+                    keys = [(ticker, segment) for ticker in batch]
+                    self.in_flight.update(dict.fromkeys(keys, future))
+                    futures[future] = batch
+                    new_downloads.append((keys, future))
+        for keys, future in new_downloads:
+            future.add_done_callback(lambda future, keys=keys: self._forget(keys, future))
+
+        pending = set(futures)
+        stale_deadline = time.monotonic() + self.revalidate_timeout
+        while pending:
+            waiting_new = not stale_ok or any(ticker not in stale for future in pending for ticker in futures[future])
+            finished, pending = wait(pending, timeout=None if waiting_new else max(stale_deadline - time.monotonic(), 0),
+                                     return_when=FIRST_COMPLETED)
+            if not finished:
+                served = [ticker for ticker, count in segments_left.items() if count > 0]
+                telemetry.increment('stale_served', len(served), interval=self.interval)
+                for ticker in served:
+                    segments_left[ticker] = 0
+                    done += 1
+                    if progress is not None:
+                        progress(done, len(segments_left), ticker)
+                break
+            for future in finished:
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"Download failed for {', '.join(futures[future])}, using the cached data only: {e}")
+                for ticker in futures[future]:
+                    segments_left[ticker] -= 1
+                    if segments_left[ticker] == 0:
+                        done += 1
+                        if progress is not None:
+                            progress(done, len(segments_left), ticker)
+
+    def get(self, ticker, start_date, end_date):
+        return self.get_many([ticker], start_date, end_date)[ticker]
+
+    # Version of the stored data of the tickers: the last time each one was written (any download rewrites its coverage file)
+    # Used as the key of the results computed from many tickers, without reading their prices
+    def coverage_fingerprint(self, tickers):
+        return zlib.crc32(json.dumps([self._coverage_time(ticker) for ticker in tickers]).encode())
+
+# The store shared by the FinancialAnalysis class and the dashboard
+price_store = PriceStore(data_provider)
+
+
+### Creation of the numerical functions
+
+# These functions work on whole numpy arrays (one column per asset) so that baskets of hundreds of tickers need no Python loop
+
+# Sums over a rolling window computed with one cumulative sum: O(n) whatever the window
+def window_sums(values, window):
+    sums = np.cumsum(np.concatenate([np.zeros((1,) + values.shape[1:]), values]), axis=0)
+    return sums[window:] - sums[:-window]
+
+# Rolling standard deviation computed with cumulative sums
+# The values are centered first, the variance doesn't change and the sums stay precise on long histories
+def rolling_std(values, window):
+    if len(values) < window:
+        return values[:0]
+    centered = values - values.mean(axis=0)
+    sums = window_sums(centered, window)
+    variance = (window_sums(centered ** 2, window) - sums ** 2 / window) / (window - 1)
+    return np.sqrt(np.maximum(variance, 0))
+
+# Regression of y on x over a rolling window, from the running sums of x, y, xy, x² and y²
+# Returns the beta, the alpha and the correlation of each window, O(n) whatever the window instead of one fit per window
+def rolling_regression(x, y, window):
+    if len(x) < window:
+        return x[:0], x[:0], x[:0]
+    # Centering doesn't change beta and correlation, the alpha is computed back with the true means
+    mean_x, mean_y = x.mean(), y.mean()
+    x, y = x - mean_x, y - mean_y
+    sum_x, sum_y = window_sums(x, window), window_sums(y, window)
+    covariance = window_sums(x * y, window) - sum_x * sum_y / window
+    variance_x = window_sums(x * x, window) - sum_x ** 2 / window
+    variance_y = window_sums(y * y, window) - sum_y ** 2 / window
+    with np.errstate(divide='ignore', invalid='ignore'):
+        beta = covariance / variance_x
+        correlation = covariance / np.sqrt(variance_x * variance_y)
+    alpha = (sum_y / window + mean_y) - beta * (sum_x / window + mean_x)
+    return beta, alpha, correlation
+
+# Replace the missing values of each column by the last value available before (NaN before the first value)
+def forward_fill(values):
+    rows = np.where(np.isnan(values), 0, np.arange(len(values))[:, None])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    return np.take_along_axis(values, rows, axis=0)
+
+# Covariance and correlation matrices of the columns, each pair using the dates where both assets are defined (like pandas)
+# All the pairs are computed at once with matrix products on the values and on the masks of defined values
+def pairwise_covariance(values):
+    mask = (~np.isnan(values)).astype(float)
+    x = np.nan_to_num(values)
+    counts = mask.T @ mask
+    sums = x.T @ mask
+    sum_products = x.T @ x
+    sum_squares = (x ** 2).T @ mask
+    with np.errstate(divide='ignore', invalid='ignore'):
+        covariance = (sum_products - sums * sums.T / counts) / (counts - 1)
+        variance = (sum_squares - sums ** 2 / counts) / (counts - 1)
+        correlation = covariance / np.sqrt(variance * variance.T)
+    return covariance, correlation
+
+
+# Largest fall of each column from its highest value before, as a negative share (-0.3 for a fall of 30%)
+# The missing values are carried from the last price, NaN for a column without price
+def max_drawdowns(prices):
+    prices = forward_fill(prices)
+    peaks = np.fmax.accumulate(prices, axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        drawdowns = prices / peaks - 1
+    drawdowns[np.isnan(drawdowns)] = 0
+    return np.where(np.isnan(prices).all(axis=0), np.nan, drawdowns.min(axis=0, initial=0))
+
+# Beta of each column on the market, each column using the dates where it and the market are defined
+# Only the covariances with the market are computed, so it is linear in the number of columns (pairwise_covariance is quadratic)
+def market_betas(returns, market_returns):
+    mask = ~np.isnan(returns) & ~np.isnan(market_returns)[:, None]
+    counts = mask.sum(axis=0)
+    x = np.where(mask, market_returns[:, None], 0)
+    y = np.where(mask, returns, 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_x, mean_y = x.sum(axis=0) / counts, y.sum(axis=0) / counts
+        x, y = np.where(mask, x - mean_x, 0), np.where(mask, y - mean_y, 0)
+        covariance = (x * y).sum(axis=0) / (counts - 1)
+        return covariance / ((x ** 2).sum(axis=0) / (counts - 1))
+
+# Standard deviation of each column on its defined values, NaN with less than two values
+def column_std(values):
+    counts = (~np.isnan(values)).sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        centered = values - np.nansum(values, axis=0) / counts
+        return np.sqrt(np.nansum(centered ** 2, axis=0) / (counts - 1))
+
+
+### Creation of the risk functions
+
+# Like the functions above, they work on the returns or the prices of all the assets at once (one column per asset, NaN where it
+# didn't trade). The losses are given as negative returns, like the drawdowns (-0.03 for a loss of 3%)
+
+# Value at risk and expected shortfall (CVaR) of each column at a confidence level, from the observed returns (historical)
+# The CVaR is the mean of the returns at or below the VaR
+def historical_var(returns, level=0.95):
+    with np.errstate(invalid='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        var = np.nanquantile(returns, 1 - level, axis=0)
+        cvar = np.nanmean(np.where(returns <= var, returns, np.nan), axis=0)
+    return var, cvar
+
+# Same measures from a normal distribution with the mean and the standard deviation of the returns (parametric)
+def parametric_var(returns, level=0.95):
+    counts = (~np.isnan(returns)).sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = np.nansum(returns, axis=0) / counts
+    std = column_std(returns)
+    z = NormalDist().inv_cdf(1 - level)
+    return mean + z * std, mean - std * NormalDist().pdf(z) / (1 - level)
+
+# Longest time spent below a previous peak by each column, in days between the peak and the recovery (or the last date)
+def drawdown_durations(dates, prices):
+    prices = forward_fill(prices)
+    rows = np.arange(len(prices))[:, None]
+    # The rows before the first price count as peaks
+    at_peak = np.isnan(prices) | (prices >= np.fmax.accumulate(prices, axis=0))
+    last_peaks = np.maximum.accumulate(np.where(at_peak, rows, 0), axis=0)
+    durations = (dates[rows] - dates[last_peaks]) / np.timedelta64(1, 'D')
+    return durations.max(axis=0, initial=0)
+
+# Annualized Sharpe and Sortino ratios of each column, with a risk free rate of 0
+# The Sortino ratio only counts the returns below 0 in the deviation
+def sharpe_ratios(returns, periods):
+    counts = (~np.isnan(returns)).sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.nansum(returns, axis=0) / counts / column_std(returns) * np.sqrt(periods)
+
+def sortino_ratios(returns, periods):
+    counts = (~np.isnan(returns)).sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        downside = np.sqrt(np.nansum(np.minimum(returns, 0) ** 2, axis=0) / counts)
+        return np.nansum(returns, axis=0) / counts / downside * np.sqrt(periods)
+
+
+### Creation of the Monte Carlo simulations
+
+# The value of 1 invested in the assets (rebalanced every bar to their weights) is simulated over a horizon of bars, either by drawing
+# whole bars of past returns (bootstrap, keeps the fat tails and the correlations) or from a geometric Brownian motion with the mean
+# and the covariance of the past log returns (gbm)
+# The paths are generated in blocks of at most monte_carlo_block_bytes, and only counted in a histogram per bar, so the memory doesn't
+# grow with the number of paths. The histograms of chunks of monte_carlo_chunk_paths paths simply add up, the chunks of the large
+# simulations run on a pool of processes. Each chunk has its own seed, the result doesn't depend on the number of processes
+monte_carlo_block_bytes = 64 * 1024 ** 2
+monte_carlo_chunk_paths = 25000
+monte_carlo_pool_paths = 100000
+monte_carlo_seed = 2024
+# The histograms count the log values standardized by the mean and the deviation of the history, from -8 to 8 deviations
+monte_carlo_bins = 1600
+monte_carlo_range = 8.0
+# The processes of the pool are started by a fork server (spawned where there is none) and not forked from the server of the dashboard:
+# a fork copies the locks held by the other threads of the server, which would never be released in the child
+simulation_context = multiprocessing.get_context('forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+simulation_pool = ProcessThreadPool(os.cpu_count(), executor_class=ProcessPoolExecutor, mp_context=simulation_context)
+# True in the processes of the background jobs of Dash (see timed_callback): they are started by the multiprocess library,
+# so multiprocessing.parent_process doesn't see them
+background_job = False
+
+# Histogram (horizon x bins) of one chunk of paths, the model is given by monte_carlo_model
+def monte_carlo_chunk(model, paths, seed):
+    rng = np.random.default_rng(seed)
+    horizon, weights = model['horizon'], model['weights']
+    steps = np.arange(1, horizon + 1)
+    center, scale = model['center'] * steps, model['scale'] * np.sqrt(steps)
+    block = max(1, monte_carlo_block_bytes // (horizon * len(weights) * 8))
+    counts = np.zeros(horizon * monte_carlo_bins, dtype=np.int64)
+    done = 0
+    while done < paths:
+        size = min(block, paths - done)
+        if model['method'] == 'bootstrap':
+            history = model['returns']
+            growth = 1 + history[rng.integers(0, len(history), size=(size, horizon))] @ weights
+        else:
+            log_returns = rng.standard_normal((size, horizon, len(weights))) @ model['cholesky'].T + model['mean']
+            growth = np.exp(log_returns) @ weights
+        z = (np.cumsum(np.log(growth), axis=1) - center) / scale
+        bins = np.clip(((z + monte_carlo_range) / (2 * monte_carlo_range) * monte_carlo_bins).astype(np.int64), 0, monte_carlo_bins - 1)
+        counts += np.bincount((bins + np.arange(horizon) * monte_carlo_bins).ravel(), minlength=horizon * monte_carlo_bins)
+        done += size
+    return counts.reshape(horizon, monte_carlo_bins)
+
+# Model of the simulations from the simple returns of the assets (rows of bars where all the assets are defined)
+def monte_carlo_model(returns, weights, method, horizon):
+    log_returns = np.log1p(returns)
+    portfolio = np.log1p(returns @ weights)
+    model = {'method': method, 'horizon': horizon, 'weights': weights, 'center': portfolio.mean(), 'scale': portfolio.std() or 1e-9}
+    if method == 'bootstrap':
+        model['returns'] = returns
+    else:
+        model['mean'] = log_returns.mean(axis=0)
+        covariance = np.atleast_2d(np.cov(log_returns, rowvar=False))
+        # A tiny ridge keeps the Cholesky decomposition possible for assets moving exactly together
+        model['cholesky'] = np.linalg.cholesky(covariance + np.eye(len(weights)) * 1e-12)
+    return model
+
+# Histogram of all the paths, the chunks run on the pool of processes when there are many paths and several cores
+# The pool is only used by the main process: the processes of a pool (e.g. the workers of the batch report, which already use all
+# the cores) and the background jobs (see background_job) run the chunks themselves
+def simulate(model, paths):
+    chunks = [min(monte_carlo_chunk_paths, paths - start) for start in range(0, paths, monte_carlo_chunk_paths)]
+    seeds = np.random.SeedSequence(monte_carlo_seed).spawn(len(chunks))
+    main_process = multiprocessing.parent_process() is None and not background_job
+    with telemetry.span('monte_carlo', method=model['method']):
+        if paths >= monte_carlo_pool_paths and (os.cpu_count() or 1) > 1 and main_process:
+            try:
+                return sum(simulation_pool.map(monte_carlo_chunk, [model] * len(chunks), chunks, seeds))
+            except (OSError, RuntimeError) as e:
+                print(f"The Monte Carlo simulation runs in this process, the pool of processes failed: {e}")
+        return sum(monte_carlo_chunk(model, size, seed) for size, seed in zip(chunks, seeds))
+
+# Standardized log values (see monte_carlo_chunk) of the quantiles of each row of histograms, interpolated inside the bins
+def histogram_quantiles(counts, quantile):
+    cumulative = np.cumsum(counts, axis=1)
+    target = quantile * cumulative[:, -1]
+    bins = np.minimum((cumulative < target[:, None]).sum(axis=1), monte_carlo_bins - 1)
+    rows = np.arange(len(counts))
+    inside = (target - cumulative[rows, bins] + counts[rows, bins]) / np.maximum(counts[rows, bins], 1)
+    return -monte_carlo_range + (bins + inside) * 2 * monte_carlo_range / monte_carlo_bins
+
+# Value of 1 invested after each bar of the horizon at each quantile
+def simulation_quantiles(model, counts, quantiles):
+    steps = np.arange(1, model['horizon'] + 1)
+    return [np.exp(model['center'] * steps + model['scale'] * np.sqrt(steps) * histogram_quantiles(counts, quantile)) for quantile in quantiles]
+
+# Value at risk and expected shortfall of the simulated return over the whole horizon
+# The expected shortfall is the mean of the bins of the histogram below the value at risk
+def simulation_var(model, counts, level=0.95):
+    horizon = model['horizon']
+    def to_return(z):
+        return np.exp(model['center'] * horizon + model['scale'] * np.sqrt(horizon) * z) - 1
+    var_z = histogram_quantiles(counts[-1:], 1 - level)[0]
+    centers = -monte_carlo_range + (np.arange(monte_carlo_bins) + 0.5) * 2 * monte_carlo_range / monte_carlo_bins
+    tail = centers <= var_z
+    if not counts[-1][tail].sum():
+        return to_return(var_z), to_return(var_z)
+    return to_return(var_z), (counts[-1][tail] * to_return(centers[tail])).sum() / counts[-1][tail].sum()
+
+
+### Creation of the downsampling functions
+
+# A browser can't draw more points than it has pixels, so the long time series are reduced on the server before being sent
+# Each series gets a pyramid of levels, each level keeping the minimum and the maximum of groups of points of the level below
+# A figure takes the finest level with few enough points in the visible range, then LTTB brings it to the point budget
+point_budget = 2000
+# Above this number of points, the scatter plots are drawn with WebGL (Scattergl) instead of SVG
+webgl_threshold = 5000
+# Above this number of values (dates x tickers), the time series of a run are not sent to the browser (see FinancialAnalysis.client_data)
+client_value_budget = 200000
+
+# Largest-Triangle-Three-Buckets: keep in each bucket the point making the largest triangle with its neighbours
+# This keeps the visual shape of the line (peaks and drops) with only "threshold" points
+def lttb(x, y, threshold):
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return x, y
+    x_values = x.astype('int64').astype(float) if np.issubdtype(x.dtype, np.datetime64) else x.astype(float)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    selected = np.empty(threshold, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        next_x, next_y = x_values[end:next_end].mean(), y[end:next_end].mean()
+        areas = np.abs((x_values[previous] - next_x) * (y[start:end] - y[previous])
+                       - (x_values[previous] - x_values[start:end]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(areas))
+        selected[i + 1] = previous
+    return x[selected], y[selected]
+
+# One level of the pyramid: the minimum and the maximum of each group of points, in the order of the dates
+def minmax_level(x, y, group=4):
+    length = len(y) // group * group
+    groups = y[:length].reshape(-1, group)
+    starts = np.arange(0, length, group)
+    rows = np.sort(np.stack([starts + groups.argmin(axis=1), starts + groups.argmax(axis=1)], axis=1), axis=1).ravel()
+    rows = np.concatenate([rows, np.arange(length, len(y))])
+    return x[rows], y[rows]
+
+class DownsamplePyramid:
+    def __init__(self, x, y, budget=point_budget):
+        self.levels = [(x, y)]
+        while len(self.levels[-1][0]) > budget:
+            self.levels.append(minmax_level(*self.levels[-1]))
+        # The view of the whole history is the one drawn first, it is computed once
+        self.full_view = None
+
+    # Points to draw for the visible range (all the series if None), at most "budget" points
+    def query(self, x_range=None, budget=point_budget):
+        if x_range is None and budget == point_budget:
+            if self.full_view is None:
+                self.full_view = self._query(None, budget)
+            return self.full_view
+        return self._query(x_range, budget)
+
+    def _query(self, x_range, budget):
+        for x, y in self.levels:
+            if x_range is None:
+                rows = slice(0, len(x))
+            else:
+                # One more point on each side so that the line goes until the border of the figure
+                start, end = np.searchsorted(x, [np.datetime64(pd.Timestamp(bound), 'ns') for bound in x_range])
+                rows = slice(max(start - 1, 0), end + 1)
+            if len(x[rows]) <= 2 * budget:
+                break
+        return lttb(x[rows], y[rows], budget)
+
+
+### Creation of the PricePanel class
+
+# The panel keeps all the loaded tickers on one shared index of dates
+# Each field is a 2D array with one contiguous column per ticker, the returns and volatility are derived on demand by DerivedMetrics
+# A validity mask tells on which dates each ticker traded, since calendars differ (.SW equities, BTC-USD trading every day, ...)
+class PricePanel:
+    fields = ['prices']
+    # Currency all the prices are converted to (see FxConverter), None when each ticker is in its own currency
+    currency = None
+
+    def __init__(self, dtype=np.float64):
+        self.dtype = dtype
+        self.dates = np.array([], dtype='datetime64[ns]')
+        self.tickers = []
+        self.columns = {}
+        self.values = {field: np.empty((0, 0), dtype=dtype, order='F') for field in self.fields}
+        self.valid = np.empty((0, 0), dtype=bool, order='F')
+
+    def __contains__(self, ticker):
+        return ticker in self.columns
+
+    def __len__(self):
+        return len(self.tickers)
+
+    # Memory used by the arrays of the panel
+    @property
+    def nbytes(self):
+        return self.dates.nbytes + self.valid.nbytes + sum(values.nbytes for values in self.values.values())
+
+    # Add (or replace) the prices of several tickers, given as a dictionary {ticker: pandas Series of prices}
+    # The panel is rebuilt once for all the tickers so that the shared index is only computed once
+    def add_many(self, prices):
+        series = {}
+        for ticker in self.tickers:
+            if ticker not in prices:
+                dates, values = self.series(ticker)
+                series[ticker] = pd.Series(values, index=dates)
+        series.update({ticker: prices[ticker].dropna() for ticker in prices})
+
+        self.tickers = list(series)
+        self.columns = {ticker: position for position, ticker in enumerate(self.tickers)}
+        self.dates = np.unique(np.concatenate([np.asarray(s.index.values, dtype='datetime64[ns]') for s in series.values()]))
+        shape = (len(self.dates), len(self.tickers))
+        self.values = {field: np.full(shape, np.nan, dtype=self.dtype, order='F') for field in self.fields}
+        self.valid = np.zeros(shape, dtype=bool, order='F')
+
+        for ticker, s in series.items():
+            column = self.columns[ticker]
+            rows = np.searchsorted(self.dates, np.asarray(s.index.values, dtype='datetime64[ns]'))
+            self.valid[rows, column] = True
+            self.values['prices'][rows, column] = s.values
+
+    # Column of a ticker on the shared index, this is a view (no copy) thanks to the column order of the arrays
+    def column(self, ticker, field='prices'):
+        return self.values[field][:, self.columns[ticker]]
+
+    # Dates and values of a ticker where the field is defined (only views when nothing is missing)
+    def series(self, ticker, field='prices'):
+        values = self.column(ticker, field)
+        mask = ~np.isnan(values)
+        if mask.all():
+            return self.dates, values
+        return self.dates[mask], values[mask]
+
+    # Dates and values of several tickers on the dates where all of them are defined
+    def aligned(self, tickers, field='prices'):
+        columns = [self.column(ticker, field) for ticker in tickers]
+        mask = np.logical_and.reduce([~np.isnan(values) for values in columns])
+        if mask.all():
+            return self.dates, columns
+        return self.dates[mask], [values[mask] for values in columns]
+
+    # Rows of the shared index between two dates, slicing a column with it gives a view
+    def rows(self, start_date, end_date):
+        start, end = np.searchsorted(self.dates, [np.datetime64(start_date, 'ns'), np.datetime64(end_date, 'ns')])
+        return slice(start, end)
+
+    # Version of the data: range, length and last price of each ticker, like the keys of DerivedMetrics
+    # Two panels with the same prices have the same fingerprint, a refreshed bar of today changes it
+    def fingerprint(self):
+        fingerprint = []
+        for ticker in self.tickers:
+            dates, prices = self.series(ticker)
+            fingerprint.append((ticker, dates[0], dates[-1], len(dates), float(prices[-1])) if len(dates) else (ticker,))
+        return tuple(fingerprint)
+
+
+### Creation of the FxConverter class
+
+# The prices of a panel converted to one base currency, to compare assets listed in different currencies (NESN.SW, NVDA, 005930.KS)
+# The exchange rates are tickers of Yahoo Finance ('EUR=X': euros for 1 USD, 1 for the USD) read through the price store like the prices,
+# so they are only downloaded once. The rate of a date is the last one known at that date (the markets of currencies close on weekends),
+# the first rate is used for the dates before it. The prices quoted in a fraction of a currency (GBp: pence) are first divided into it
+# The converted panels are kept per (data, base currency), so that the analyses of a session don't convert them again
+base_currencies = ['USD', 'EUR', 'CHF', 'GBP', 'JPY', 'CNY', 'HKD', 'KRW', 'INR', 'CAD', 'AUD']
+minor_currencies = {'GBp': ('GBP', 100), 'GBX': ('GBP', 100), 'ZAc': ('ZAR', 100), 'ILA': ('ILS', 100)}
+
+def fx_ticker(currency):
+    return f'{currency}=X'
+
+# With fetch False the rates are only read from the price store (see PriceStore.get_many)
+class FxConverter:
+    def __init__(self, store, max_entries=32, fetch=True):
+        self.store = store
+        self.fetch = fetch
+        self.max_entries = max_entries
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+
+    # Units of each currency for 1 USD on the dates of the panel, as {currency: array}, without the currencies which have no rates
+    def rates(self, panel, currencies, interval='1d'):
+        currencies = [currency for currency in dict.fromkeys(currencies) if currency != 'USD']
+        # A week before the first date, so that a rate is known on the first date even after a weekend
+        start = pd.Timestamp(panel.dates[0]) - pd.Timedelta(days=7)
+        end = pd.Timestamp(panel.dates[-1]) + pd.Timedelta(days=1)
+        with telemetry.span('fx_rates', interval=interval):
+            downloaded = self.store.for_interval(interval).get_many([fx_ticker(currency) for currency in currencies], start, end,
+                                                                    columns=['Adj Close'], fetch=self.fetch)
+        rates = {'USD': np.ones(len(panel.dates))}
+        for currency in currencies:
+            series = downloaded[fx_ticker(currency)]['Adj Close'].dropna()
+            series = series[series > 0]
+            if series.empty:
+                continue
+            rows = np.searchsorted(np.asarray(series.index.values, dtype='datetime64[ns]'), panel.dates, side='right') - 1
+            rates[currency] = series.values[np.maximum(rows, 0)]
+        return rates
+
+    # Panel with the prices of the tickers in the base currency, the tickers without exchange rate are left out
+    def convert(self, panel, base_currency, interval='1d'):
+        if not len(panel) or panel.currency == base_currency:
+            return panel
+        key = (panel.fingerprint(), base_currency, interval)
+        with self.lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                telemetry.increment('cache_requests', cache='fx_conversion', result='hit')
+                return self.cache[key]
+        telemetry.increment('cache_requests', cache='fx_conversion', result='miss')
+
+        # Currency and divisor of each ticker (100 for the prices in pence)
+        quotes = {}
+        for ticker in panel.tickers:
+            currency = get_currency(ticker)
+            quotes[ticker] = minor_currencies.get(currency, (currency, 1))
+        rates = self.rates(panel, [currency for currency, _ in quotes.values() if currency] + [base_currency], interval)
+
+        converted = PricePanel(panel.dtype)
+        converted.currency = base_currency
+        converted.dates = panel.dates
+        if base_currency in rates:
+            converted.tickers = [ticker for ticker in panel.tickers if quotes[ticker][0] in rates]
+        converted.columns = {ticker: position for position, ticker in enumerate(converted.tickers)}
+        columns = [panel.columns[ticker] for ticker in converted.tickers]
+        # One factor per currency, applied to all the columns of the panel at once
+        factors = np.column_stack([rates[base_currency] / rates[quotes[ticker][0]] / quotes[ticker][1] for ticker in converted.tickers]) \
+            if columns else np.empty((len(panel.dates), 0))
+        with telemetry.span('fx_conversion'):
+            converted.values = {'prices': (panel.values['prices'][:, columns] * factors).astype(panel.dtype, order='F')}
+            converted.valid = np.asfortranarray(panel.valid[:, columns])
+
+        with self.lock:
+            self.cache[key] = converted
+            while len(self.cache) > self.max_entries:
+                self.cache.popitem(last=False)
+        return converted
+
+
+### Creation of the DerivedMetrics class
+
+# Returns, volatility and resampled series are only computed when an analysis asks for them
+# The results are kept per (ticker, date range, metric, parameters), so switching between analyses or windows costs nothing
+# Each result is given on the dates where the ticker traded, as (dates, values) numpy arrays
+class DerivedMetrics:
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+
+    # Main method: return the memoized metric of a ticker of the panel, computing it on the first access
+    def get(self, panel, ticker, metric, **params):
+        dates, prices = panel.series(ticker, 'prices')
+        # The range of the prices identifies the data, the last price changes when the bar of today is refreshed
+        # The currency separates the prices of a ticker converted to another currency from its own prices
+        key = (ticker, panel.currency, dates[0], dates[-1], len(dates), float(prices[-1]), metric, tuple(sorted(params.items())))
+        with self.lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                telemetry.increment('cache_requests', cache='derived_metrics', result='hit')
+                return self.cache[key]
+        telemetry.increment('cache_requests', cache='derived_metrics', result='miss')
+        with telemetry.span('derived_metric', metric=metric):
+            result = getattr(self, f'_{metric}')(panel, ticker, dates, prices, **params)
+        with self.lock:
+            self.cache[key] = result
+            while len(self.cache) > self.max_entries:
+                self.cache.popitem(last=False)
+        return result
+
+    # Same metric for several tickers, on the dates where all of them are defined (used for the regressions)
+    def aligned(self, panel, tickers, metric, **params):
+        columns = []
+        for ticker in tickers:
+            dates, values = self.get(panel, ticker, metric, **params)
+            column = np.full(len(panel.dates), np.nan)
+            column[np.searchsorted(panel.dates, dates)] = values
+            columns.append(column)
+        mask = np.logical_and.reduce([~np.isnan(column) for column in columns])
+        return panel.dates[mask], [column[mask] for column in columns]
+
+    def _returns(self, panel, ticker, dates, prices):
+        return dates[1:], prices[1:] / prices[:-1] - 1
+
+    def _log_returns(self, panel, ticker, dates, prices):
+        return dates[1:], np.diff(np.log(prices))
+
+    # Rolling standard deviation of the daily returns, O(n) whatever the window
+    def _volatility(self, panel, ticker, dates, prices, window=20):
+        return_dates, returns = self.get(panel, ticker, 'returns')
+        return return_dates[window - 1:], rolling_std(returns, window)
+
+    # Prices resampled to another frequency ('W' weekly, 'M' monthly), keeping the last price of each period
+    def _resampled_prices(self, panel, ticker, dates, prices, frequency='W'):
+        resampled = pd.Series(prices, index=dates).resample(resample_rule(frequency)).last().dropna()
+        return resampled.index.values, resampled.values
+
+    # Share of the daily returns in each bin between start and end, computed once per range of bins
+    def _histogram(self, panel, ticker, dates, prices, start, end, bins=50):
+        _, returns = self.get(panel, ticker, 'returns')
+        counts, _ = np.histogram(returns, bins=bins, range=(start, end))
+        return counts / len(returns)
+
+    # Gaussian kernel density of the daily returns on a grid of points, with the bandwidth of Scott's rule
+    # The returns are first counted in 1024 fine bins, so the cost depends on the grid and not on the length of the history
+    def _kde(self, panel, ticker, dates, prices, start, end, points=200):
+        _, returns = self.get(panel, ticker, 'returns')
+        bandwidth = 1.06 * returns.std() * len(returns) ** (-1 / 5)
+        counts, edges = np.histogram(returns, bins=1024)
+        centers = (edges[:-1] + edges[1:]) / 2
+        grid = np.linspace(start, end, points)
+        kernels = np.exp(-0.5 * ((grid[:, None] - centers[None, :]) / bandwidth) ** 2) / (bandwidth * np.sqrt(2 * np.pi))
+        return grid, kernels @ counts / len(returns)
+
+    # Fall of the price from its highest value before, as a negative share
+    def _drawdown(self, panel, ticker, dates, prices):
+        return dates, prices / np.maximum.accumulate(prices) - 1
+
+    # Pyramid of downsampled levels of a series ('prices' or one of the metrics above) used to draw long histories
+    def _pyramid(self, panel, ticker, dates, prices, source='prices', **params):
+        if source == 'prices':
+            return DownsamplePyramid(dates, prices)
+        return DownsamplePyramid(*self.get(panel, ticker, source, **params))
+
+    # Returns between two periods of the resampled prices (weekly returns for example)
+    def _resampled_returns(self, panel, ticker, dates, prices, frequency='W'):
+        period_dates, period_prices = self.get(panel, ticker, 'resampled_prices', frequency=frequency)
+        return period_dates[1:], period_prices[1:] / period_prices[:-1] - 1
+
+# Creation of a function that translates a frequency to a pandas rule, the month end rule was renamed in pandas 2.2
+# The intraday frequencies are written like the intervals ('5m', '1h')
+def resample_rule(frequency):
+    if frequency[0].isdigit():
+        return pd.tseries.frequencies.to_offset(interval_length(frequency))
+    if frequency == 'M':
+        try:
+            pd.tseries.frequencies.to_offset('ME')
+            return 'ME'
+        except ValueError:
+            return 'M'
+    return frequency
+
+# Creation of a generator resampling a stream of chunks of prices (sorted, one after the other) to another frequency
+# The last price of each period is kept, a period spread over two chunks is only given once the next chunk is read
+# Only one chunk is in memory at a time, so a history of millions of intraday bars is resampled in a bounded memory
+def resample_chunks(chunks, frequency):
+    rule = resample_rule(frequency)
+    pending = None
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        resampled = chunk.resample(rule).last().dropna(how='all')
+        if resampled.empty:
+            continue
+        # The later chunk has the last price of a period it shares with the previous chunk
+        if pending is not None and pending.index[-1] != resampled.index[0]:
+            yield pending
+        pending = resampled.iloc[-1:]
+        if len(resampled) > 1:
+            yield resampled.iloc[:-1]
+    if pending is not None:
+        yield pending
+
+
+
+### Creation of the FigureCache class
+
+# The figures already drawn are kept so that switching between analyses in the dropdown does not draw them again
+# The key contains the analysis, the tickers, the parameters and the fingerprint of the data, so new prices never hit an old figure
+# The least recently used figures are dropped when the arrays of the cached figures go over max_bytes
+class FigureCache:
+    def __init__(self, max_bytes=256 * 1024 ** 2):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                return self.cache[key][0]
+        return None
+
+    def put(self, key, figure):
+        size = figure_nbytes(figure)
+        with self.lock:
+            if key in self.cache:
+                self.nbytes -= self.cache.pop(key)[1]
+            self.cache[key] = (figure, size)
+            self.nbytes += size
+            while self.nbytes > self.max_bytes and len(self.cache) > 1:
+                self.nbytes -= self.cache.popitem(last=False)[1][1]
+
+    def clear(self):
+        with self.lock:
+            self.cache.clear()
+            self.nbytes = 0
+
+# Approximate memory of a figure: the arrays of its traces, the layout is small
+def figure_nbytes(figure):
+    size = 0
+    for trace in figure.data:
+        for name in ('x', 'y', 'z', 'text', 'customdata'):
+            values = getattr(trace, name, None)
+            if values is not None:
+                size += np.asarray(values).nbytes
+    return size
+
+
+# Plotly sends the numpy arrays of the traces as base64 typed arrays, but the dates as one ISO string per point (about 21 bytes)
+# The dates become milliseconds since 1970 (exact in float64) on axes of type 'date', and the values float32, 4 bytes each,
+# which still keeps 7 significant digits, more than a figure can show
+def compact_figure(figure):
+    for trace in figure.data:
+        for name in ('x', 'y', 'z'):
+            values = getattr(trace, name, None)
+            if not isinstance(values, np.ndarray):
+                continue
+            if np.issubdtype(values.dtype, np.datetime64):
+                trace[name] = values.astype('datetime64[ms]').astype(np.int64).astype(np.float64)
+                # 'x2' is drawn on the axis 'xaxis2' of the layout
+                axis = getattr(trace, f'{name}axis', None) or name
+                figure.update_layout({axis.replace(name, f'{name}axis', 1): {'type': 'date'}})
+            elif values.dtype == np.float64:
+                trace[name] = values.astype(np.float32)
+    return figure
+
+
+# Array encoded like plotly encodes the arrays of the traces: the little endian bytes in base64 and their type ('f4' or 'f8')
+def typed_array(values):
+    values = np.ascontiguousarray(values, dtype=values.dtype.newbyteorder('<'))
+    return {'dtype': values.dtype.str[1:], 'bdata': base64.b64encode(values.tobytes()).decode()}
+
+
+# Creation of a function that joins the names of the assets for the titles, a long basket is only counted
+def join_titles(titles):
+    if len(titles) > 3:
+        return f"{len(titles)} assets"
+    return " and ".join(titles)
+
+### Creation of the FinancialAnalysis class 
+
+# This class stocks the downloading of the datas and all the analysis available for the the user in the application
+# Each public method is timed (see timed_methods)
+@timed_methods
+class FinancialAnalysis:
+    # Analyses drawn from downsampled series, they can be refined for the visible range when the user zooms
+    zoomable_analyses = {'plot_index_evolution', 'plot_volatility_evolution', 'plot_daily_returns_evolution', 'plot_weekly_returns_evolution',
+                         'plot_drawdowns'}
+    # Analyses which the browser can also draw from client_data, switching between them then needs no request (see assets/dashboard.js)
+    client_analyses = {'plot_index_evolution', 'plot_volatility_evolution', 'plot_daily_returns_evolution', 'plot_weekly_returns_evolution'}
+
+    def __init__(self, store=None):
+        self.data = PricePanel()
+        self.tickers = []
+        # The derived series are computed on demand and memoized, the volatility window can be changed by the dashboard
+        self.metrics = DerivedMetrics()
+        self.volatility_window = 20
+        # Weights of the portfolio {ticker: weight} in the mode with several assets, equal weights if None
+        self.weights = None
+        # Curves drawn over the distribution of returns: 'kde' and/or 'normal'
+        self.distribution_overlays = []
+        # Windows (in bars) of the rolling regression
+        self.regression_windows = (60, 120, 252)
+        # Confidence level of the values at risk, and method, number of paths and horizon (in bars) of the Monte Carlo projection
+        self.var_level = 0.95
+        self.monte_carlo = ('bootstrap', 10000, 252)
+        # Interval of the bars downloaded ('1d' or intraday, e.g. '5m') and optional frequency they are resampled to ('1h', 'D', 'W', ...)
+        self.interval = '1d'
+        self.frequency = None
+        # The prices are read through the local price store, only missing dates are downloaded
+        self.store = store if store is not None else price_store
+        # Currency all the prices are converted to ('EUR' for example), None keeps each ticker in its own currency
+        self.base_currency = None
+        self.fx = FxConverter(self.store)
+        # The figures drawn for the whole history, the lock keeps the parameters unchanged while a figure is drawn
+        self.figures = FigureCache()
+        self.lock = threading.RLock()
+
+    # Copy of the analysis for one session of the dashboard, with its own data, tickers and parameters
+    # The price store and the caches of derived series, figures and converted panels are shared, their keys depend on the data
+    # and not on the session. With a base currency, all the analyses of the session run on the prices converted to it
+    def session(self, panel, tickers, weights=None, interval='1d', frequency=None, base_currency=None):
+        analysis = copy.copy(self)
+        analysis.data = self.fx.convert(panel, base_currency, interval) if base_currency else panel
+        analysis.tickers = tickers
+        analysis.weights = weights
+        analysis.interval = interval
+        analysis.frequency = frequency
+        analysis.base_currency = base_currency
+        analysis.distribution_overlays = []
+        analysis.lock = threading.RLock()
+        return analysis
+
+    def analysis(self, tickers, start_date, end_date):
+        
+        # Save the tickers provided as a list
+        self.tickers = tickers
+        self.data = PricePanel()
+       
+        # Determine if we need to include the S&P 500 for the regression purpose, if we provide one ticker not equal to one from the S&P 500
+        # With more than two assets, the S&P 500 is the benchmark of the betas
+        include_spy = len(tickers) != 2 and '^GSPC' not in tickers
+
+        try:
+            self.data, missing_tickers = self.load(tickers, start_date, end_date, benchmark=include_spy,
+                                                   interval=self.interval, frequency=self.frequency)
+            if self.base_currency:
+                self.data = self.fx.convert(self.data, self.base_currency, self.interval)
+        except Exception as e:
+            print(f"An error occurred while loading {', '.join(tickers)}: {e}")
+            return
+        for ticker in missing_tickers:
+            print(f"No data found for {ticker}, skipping.")
+        for ticker in tickers:
+            if ticker not in missing_tickers and ticker not in self.data:
+                print(f"No exchange rate found to convert {ticker} to {self.base_currency}, skipping.")
+
+    # The loading pipeline used by the analysis method and by the dashboard: names and currencies, prices and panel
+    # The S&P 500 is loaded in the same batch as the tickers when benchmark is True
+    # With a frequency, the bars are resampled file by file while they are read, so the whole history is never in memory
+    # Return the panel and the tickers without data, progress is given to the price store
+    # With fetch False the prices are only read from the price store (see PriceStore.get_many)
+    def load(self, tickers, start_date, end_date, benchmark=False, progress=None, interval='1d', frequency=None, fetch=True):
+        tickers_to_fetch = tickers + ['^GSPC'] if benchmark and '^GSPC' not in tickers else list(tickers)
+        store = self.store.for_interval(interval)
+
+        # The names and currencies used in the figures are fetched while the prices are downloaded, not while drawing
+        metadata_service.prefetch(tickers_to_fetch, timeout=0)
+
+        # Get the data of all the tickers at once from the price store (yfinance library is only called for the missing dates)
+        if frequency is None:
+            downloaded = store.get_many(tickers_to_fetch, start_date, end_date, progress=progress, columns=['Adj Close'], fetch=fetch)
+            prices = {ticker: data['Adj Close'] for ticker, data in downloaded.items() if not data.empty}
+        else:
+            if fetch:
+                store.fetch_many(tickers_to_fetch, start_date, end_date, progress=progress)
+            start = pd.Timestamp(start_date).normalize()
+            end = pd.Timestamp(end_date).normalize()
+            prices = {}
+            for ticker in tickers_to_fetch:
+                with telemetry.span('resample', interval=interval, frequency=frequency):
+                    periods = list(resample_chunks(store.iter_chunks(ticker, start, end, columns=['Adj Close']), frequency))
+                if periods:
+                    prices[ticker] = pd.concat(periods)['Adj Close']
+        panel = PricePanel()
+        if prices:
+            panel.add_many(prices)
+
+        # Wait for the names and currencies so that drawing the figures never waits for them
+        metadata_service.prefetch(tickers_to_fetch)
+        return panel, [ticker for ticker in tickers_to_fetch if ticker not in prices]
+
+    # Figure of an analysis (name of one of the plot methods), taken from the figure cache if it was drawn with the same data and parameters
+    # The zoomed figures (x_range given) depend on a continuous range and are always drawn
+    def figure(self, analysis_name, x_range=None):
+        with self.lock:
+            if x_range is not None:
+                return compact_figure(getattr(self, analysis_name)(x_range=x_range))
+            # The currency separates a converted panel from the same prices unconverted (USD tickers converted to USD for example)
+            key = (analysis_name, tuple(self.tickers), self.data.fingerprint(), self.data.currency, self.bar_frequency, self.volatility_window,
+                   tuple(self.distribution_overlays), tuple(sorted((self.weights or {}).items())), self.regression_windows, self.var_level,
+                   self.monte_carlo)
+            figure = self.figures.get(key)
+            telemetry.increment('cache_requests', cache='figure', result='miss' if figure is None else 'hit')
+            if figure is None:
+                with telemetry.span('figure', analysis=analysis_name):
+                    figure = compact_figure(getattr(self, analysis_name)())
+                # Keep the zoom and the legend selection when the figure is refined
+                figure.update_layout(uirevision=analysis_name)
+                self.figures.put(key, figure)
+            return figure
+
+    # Draw several analyses in advance (the ones selected before the run), in a background thread
+    def prerender(self, analysis_names):
+        def draw():
+            for analysis_name in analysis_names:
+                try:
+                    self.figure(analysis_name)
+                except Exception as e:
+                    print(f"Failed to prepare the analysis {analysis_name}: {e}")
+        threading.Thread(target=draw, daemon=True).start()
+
+    # Frequency of the bars of the panel, and the names used in the titles ('Daily' returns, window in 'days', or '5m' returns in 'bars')
+    @property
+    def bar_frequency(self):
+        return self.frequency or self.interval
+
+    @property
+    def bar_label(self):
+        return {'1d': 'Daily', 'D': 'Daily', 'W': 'Weekly', 'M': 'Monthly'}.get(self.bar_frequency, self.bar_frequency)
+
+    @property
+    def bar_unit(self):
+        return 'days' if self.bar_frequency in ('1d', 'D') else 'bars'
+
+    # Shortcuts to the memoized derived series of a loaded ticker, as (dates, values) arrays
+    def returns(self, ticker):
+        return self.metrics.get(self.data, ticker, 'returns')
+
+    def volatility(self, ticker, window=None):
+        return self.metrics.get(self.data, ticker, 'volatility', window=window or self.volatility_window)
+
+    # Currency of the prices of a loaded ticker, the base currency when they are converted
+    def ticker_currency(self, ticker):
+        return self.data.currency or get_currency(ticker)
+
+    # Points of a series to draw for the visible range (all the history if None), at most point_budget points
+    def downsampled(self, ticker, source='prices', x_range=None, **params):
+        return self.metrics.get(self.data, ticker, 'pyramid', source=source, **params).query(x_range)
+
+    # Data of the client analyses sent once to the browser: the dates of the panel in milliseconds since 1970 and the prices of each ticker
+    # on them (NaN where it didn't trade), as base64 typed arrays like plotly (see typed_array). None when the run is larger than
+    # client_value_budget values, the server then draws the figures from its downsampled series
+    def client_data(self):
+        tickers = [ticker for ticker in self.tickers if ticker in self.data]
+        if not tickers:
+            return None
+        prices = np.column_stack([self.data.column(ticker) for ticker in tickers])
+        rows = ~np.isnan(prices).all(axis=1)
+        if rows.sum() * len(tickers) > client_value_budget:
+            return None
+        return {
+            'dates': typed_array(self.data.dates[rows].astype('datetime64[ms]').astype(np.int64).astype(np.float64)),
+            'tickers': tickers,
+            'names': [get_company_name(ticker) for ticker in tickers],
+            'currencies': [self.ticker_currency(ticker) for ticker in tickers],
+            'currency': self.data.currency,
+            'prices': [typed_array(column.astype(np.float32)) for column in prices[rows].T],
+            'bar_label': self.bar_label,
+            'bar_unit': self.bar_unit,
+            'webgl_threshold': webgl_threshold,
+        }
+
+    ### Definition of our analysis 
+    
+    # Plot the index evolution and include currency information in the title
+    def plot_index_evolution(self, x_range=None):
+        fig = go.Figure()
+        titles = []
+        for ticker in self.tickers:
+            if ticker in self.data:
+                company_name = get_company_name(ticker)
+                currency=self.ticker_currency(ticker)
+                titles.append(f"{company_name}")
+                
+                dates, prices = self.downsampled(ticker, 'prices', x_range)
+                fig.add_trace(go.Scatter(
+                    x=dates,y=prices,mode='lines',name=f'{company_name} Prices ({currency})'))
+
+        # Dynamic adaptation of titles
+        if len(titles) == 1:
+            title = f"Evolution of Index prices {titles[0]} in {currency}"
+        elif len(titles) > 1:
+            title = join_titles(titles)
+            title = f"Evolution of Index for {title}"
+            # The assets converted to one currency are compared in it
+            if self.data.currency:
+                title = f"{title} in {self.data.currency}"
+        else:
+            title = "Evolution of Index prices"
+        fig.update_layout(title=title, xaxis_title='Date', yaxis_title='Adjusted Close Price')
+        return fig
+
+    # Define the returns distribution
+    def plot_returns_distribution(self):
+        fig = go.Figure()
+        titles = []
+        
+        # Determine global min and max for bin edges
+        # Ensure histograms are plotted on the same scale
+        min_return = min(self.returns(ticker)[1].min() for ticker in self.tickers)
+        max_return = max(self.returns(ticker)[1].max() for ticker in self.tickers)
+        
+        # Each histogram is segmented into identical ranges
+        bin_edges = np.linspace(min_return, max_return, 51)  
+        bin_centers = (bin_edges[:-1] + bin_edges[1:]) / 2
+        bin_width = bin_edges[1] - bin_edges[0]
+
+        # The bins are counted on the server, only the 50 bars are sent whatever the length of the history
+        for ticker in self.tickers:
+            company_name = get_company_name(ticker)  
+            titles.append(company_name)
+            probabilities = self.metrics.get(self.data, ticker, 'histogram', start=min_return, end=max_return)
+            fig.add_trace(go.Bar(
+                x=bin_centers,
+                y=probabilities,
+                name=f'{company_name}',
+                opacity=0.5
+            ))
+            # The densities are multiplied by the width of a bin to be on the same scale as the probabilities of the bars
+            if 'kde' in self.distribution_overlays:
+                grid, density = self.metrics.get(self.data, ticker, 'kde', start=min_return, end=max_return)
+                fig.add_trace(go.Scatter(x=grid, y=density * bin_width, mode='lines', name=f'{company_name} Density'))
+            if 'normal' in self.distribution_overlays:
+                _, daily_returns = self.returns(ticker)
+                mean, std = daily_returns.mean(), daily_returns.std()
+                grid = np.linspace(min_return, max_return, 200)
+                density = np.exp(-0.5 * ((grid - mean) / std) ** 2) / (std * np.sqrt(2 * np.pi))
+                fig.add_trace(go.Scatter(x=grid, y=density * bin_width, mode='lines', line=dict(dash='dash'),
+                                         name=f'{company_name} Normal Fit'))
+
+        if len(titles) == 1:
+            title = f"Distribution of {self.bar_label.lower()} Returns for {titles[0]}"
+        elif len(titles) > 1:
+            title = join_titles(titles)
+            title = f"Distribution of {self.bar_label.lower()} Returns for {title}"
+        else:
+            title = f"Distribution of {self.bar_label.lower()} Returns"
+
+        fig.update_layout(
+            title=title,
+            xaxis_title=f'{self.bar_label} Returns',
+            yaxis_title='Probability', 
+            barmode='overlay',
+            bargap=0.1  
+        )
+        return fig
+
+    # Define the volatility evolution 
+    def plot_volatility_evolution(self, x_range=None):
+        fig = go.Figure()
+        titles = [] 
+        for ticker in self.tickers:
+            company_name = get_company_name(ticker)  
+            titles.append(company_name)  
+            dates, volatility = self.downsampled(ticker, 'volatility', x_range, window=self.volatility_window)
+            fig.add_trace(go.Scatter(x=dates, y=volatility, mode='lines', name=f'{company_name} Volatility ({self.volatility_window} {self.bar_unit})'))
+        
+        if len(titles) == 1:
+            title = f"Evolution of {self.bar_label} Volatility for {titles[0]}"
+        elif len(titles) > 1:
+            title = join_titles(titles)
+            title = f"Evolution of {self.bar_label} Volatility for {title}"
+        else:
+            title = f"Evolution of {self.bar_label} Volatility"
+
+        fig.update_layout(title=title, xaxis_title='Date', yaxis_title='Volatility')
+        return fig
+    
+    # Define the daily returns evolution
+    def plot_daily_returns_evolution(self, x_range=None):
+        fig = go.Figure()
+        titles = [] 
+        for ticker in self.tickers:
+            company_name = get_company_name(ticker)  
+            titles.append(company_name)  
+            dates, daily_returns = self.downsampled(ticker, 'returns', x_range)
+            fig.add_trace(go.Scatter(
+                x=dates,
+                y=daily_returns,
+                mode='lines',
+                name=f'{company_name} {self.bar_label} Returns'
+            ))
+
+        if len(titles) == 1:
+            title = f"Evolution of {self.bar_label} Returns for {titles[0]}"
+        elif len(titles) > 1:
+            title = join_titles(titles)
+            title = f"Evolution of {self.bar_label} Returns for {title}"
+        else:
+            title = f"Evolution of {self.bar_label} Returns"
+
+        fig.update_layout(
+            title=title,
+            xaxis_title='Date',
+            yaxis_title=f'{self.bar_label} Returns (%)',
+            yaxis_tickformat='%',  
+            
+        )
+        return fig
+
+    # Define the weekly returns evolution 
+    def plot_weekly_returns_evolution(self, x_range=None):
+        fig = go.Figure()
+        titles=[]
+        for ticker in self.tickers:
+            company_name = get_company_name(ticker) 
+            titles.append(company_name)
+            # Define the weekly prices and weekly returns
+            if ticker in self.data:
+                # Weekly returns from the last available price of each week
+                weekly_dates, weekly_returns = self.downsampled(ticker, 'resampled_returns', x_range, frequency='W')
+                fig.add_trace(go.Scatter(
+                    x=weekly_dates,
+                    y=weekly_returns,
+                    mode='lines',
+                    name=f'{company_name} Weekly Returns'
+                ))
+        if len(titles) == 1:
+            title = f"Weekly Returns Evolution for {titles[0]}"
+        elif len(titles) > 1:
+            title = join_titles(titles)
+            title = f"Weekly Returns Evolution for {title}"
+        else:
+            title = "Weekly Returns Evolution"
+        
+        fig.update_layout(
+            title=title,
+            xaxis_title='Date',
+            yaxis_title='Weekly Returns (%)',
+            yaxis_tickformat='%',  
+            
+        )
+        return fig
+    
+    # Define the linear regression 
+    # We use the daily returns for the linear regression
+    def perform_linear_regression(self):
+        
+        # If one ticker is provided, we use the S&P 500 for the linear regression 
+        if len(self.tickers) == 1:
+            ticker = self.tickers[0]
+            market_ticker = '^GSPC' if ticker != '^GSPC' else ticker
+        
+            # Align data by common dates and drop any NaN values (the panel already shares the dates)
+            _, (market_data_aligned, asset_data_aligned) = self.metrics.aligned(self.data, [market_ticker, ticker], 'returns')
+
+            # Check if lengths are equal after cleaning
+            if len(market_data_aligned) != len(asset_data_aligned):
+                print("Data alignment error: Arrays do not match in length.")
+                return None
+
+            # Perform linear regression
+            slope, intercept = np.polyfit(market_data_aligned, asset_data_aligned, 1)
+            beta = slope
+
+            # Generate plot
+            # Large scatters are drawn with WebGL, the regression line only needs its two ends
+            scatter = go.Scattergl if len(market_data_aligned) > webgl_threshold else go.Scatter
+            trace = scatter(x=market_data_aligned, y=asset_data_aligned, mode='markers', name=get_company_name(ticker))
+            line_x = np.array([market_data_aligned.min(), market_data_aligned.max()])
+            regression_line = np.polyval([slope, intercept], line_x)
+            regression_trace = go.Scatter(x=line_x, y=regression_line, mode='lines', name='Regression Line')
+        
+            figure = go.Figure(data=[trace, regression_trace])
+            figure.update_layout(
+                title=f'Linear Regression: {get_company_name(ticker)} on {"itself" if ticker == "^GSPC" else "S&P 500 index"}',
+                xaxis_title='S&P 500 Returns' if ticker != '^GSPC' else get_company_name(ticker) + ' Returns',
+                yaxis_title=get_company_name(ticker) + ' Returns'
+            )
+            # Display the beta value in the graph
+            figure.add_annotation(x=max(market_data_aligned), y=max(asset_data_aligned), text=f'Beta: {beta:.2f}', showarrow=False, arrowhead=1)
+            return figure
+        
+        # If two tickers are provided, we regress the first asset's daily returns on the second 
+        elif len(self.tickers) == 2:
+           # Align data by common dates and drop any NaN values (the panel already shares the dates)
+           _, (asset1_data_aligned, asset2_data_aligned) = self.metrics.aligned(self.data, self.tickers, 'returns')
+
+           # Check if lengths are equal after cleaning
+           if len(asset1_data_aligned) != len(asset2_data_aligned):
+            print("Data alignment error: Arrays do not match in length.")
+            return None
+
+           # Perform linear regression
+           slope, intercept = np.polyfit(asset2_data_aligned, asset1_data_aligned, 1)
+           beta = slope
+
+           # Generate plot
+           # Large scatters are drawn with WebGL, the regression line only needs its two ends
+           scatter = go.Scattergl if len(asset2_data_aligned) > webgl_threshold else go.Scatter
+           trace = scatter(x=asset2_data_aligned, y=asset1_data_aligned, mode='markers', name=get_company_name(self.tickers[1]))
+           line_x = np.array([asset2_data_aligned.min(), asset2_data_aligned.max()])
+           regression_line = np.polyval([slope, intercept], line_x)
+           regression_trace = go.Scatter(x=line_x, y=regression_line, mode='lines', name='Regression Line')
+        
+           figure = go.Figure(data=[trace, regression_trace])
+           figure.update_layout(
+               title=f'Linear Regression: {get_company_name(self.tickers[0])} on {get_company_name(self.tickers[1])}',
+               xaxis_title=get_company_name(self.tickers[1]) + ' Returns',
+               yaxis_title=get_company_name(self.tickers[0]) + ' Returns'
+           )
+           figure.add_annotation(x=max(asset2_data_aligned), y=max(asset1_data_aligned), text=f'Beta: {beta:.2f}', showarrow=True, arrowhead=1)
+           return figure
+
+    # Define the rolling regression: beta, alpha and correlation over rolling windows
+    # One asset is regressed on the S&P 500, two assets the first on the second, a portfolio its returns on the S&P 500
+    def plot_rolling_regression(self):
+        if len(self.tickers) == 2:
+            dates, (y, x) = self.metrics.aligned(self.data, self.tickers, 'returns')
+            y_name, x_name = get_company_name(self.tickers[0]), get_company_name(self.tickers[1])
+        elif len(self.tickers) == 1:
+            ticker = self.tickers[0]
+            market_ticker = '^GSPC' if ticker != '^GSPC' else ticker
+            dates, (y, x) = self.metrics.aligned(self.data, [ticker, market_ticker], 'returns')
+            y_name, x_name = get_company_name(ticker), 'S&P 500'
+        else:
+            portfolio_dates, portfolio_returns = self.portfolio_returns()
+            market_dates, market_returns = self.returns('^GSPC')
+            dates, portfolio_rows, market_rows = np.intersect1d(portfolio_dates, market_dates, return_indices=True)
+            y, x = portfolio_returns[portfolio_rows], market_returns[market_rows]
+            y_name, x_name = 'Portfolio', 'S&P 500'
+
+        fig = make_subplots(rows=3, cols=1, shared_xaxes=True, vertical_spacing=0.06,
+                            subplot_titles=('Beta', f'Alpha ({self.bar_label.lower()})', 'Correlation'))
+        for window in self.regression_windows:
+            beta, alpha, correlation = rolling_regression(x, y, window)
+            window_dates = dates[window - 1:]
+            for row, values in enumerate([beta, alpha, correlation], start=1):
+                fig.add_trace(go.Scatter(x=window_dates, y=values, mode='lines', name=f'{window} {self.bar_unit}', legendgroup=str(window),
+                                         showlegend=row == 1), row=row, col=1)
+        fig.update_layout(title=f'Rolling Regression: {y_name} on {x_name}', height=800)
+        return fig
+
+    ### Analysis of a portfolio of several assets
+    # Everything is computed in vectorized passes over the panel, without loops over the pairs of assets
+
+    # Daily returns of several tickers on the shared dates of the panel, NaN on the dates where a ticker didn't trade
+    # The return of a ticker is measured from its previous trading date, like with its own series
+    def returns_matrix(self, tickers):
+        columns = [self.data.columns[ticker] for ticker in tickers]
+        prices = self.data.values['prices'][:, columns]
+        previous = np.vstack([np.full((1, len(columns)), np.nan), forward_fill(prices)[:-1]])
+        return self.data.dates, prices / previous - 1
+
+    # Covariance and correlation matrices of the daily returns, with the volatility and the beta of each asset
+    # The beta is measured against the S&P 500 when it is loaded
+    def portfolio_statistics(self):
+        tickers = list(self.tickers)
+        with_benchmark = '^GSPC' in self.data and '^GSPC' not in tickers
+        _, returns = self.returns_matrix(tickers + ['^GSPC'] if with_benchmark else tickers)
+        covariance, correlation = pairwise_covariance(returns)
+        benchmark = len(tickers) if with_benchmark else (tickers.index('^GSPC') if '^GSPC' in tickers else None)
+        betas = covariance[:len(tickers), benchmark] / covariance[benchmark, benchmark] if benchmark is not None else None
+        return {
+            'tickers': tickers,
+            'covariance': covariance[:len(tickers), :len(tickers)],
+            'correlation': correlation[:len(tickers), :len(tickers)],
+            'volatility': np.sqrt(np.diag(covariance)[:len(tickers)]),
+            'betas': betas,
+        }
+
+    # Weights of the tickers summing to 1, equal weights without weights of the user or when theirs sum to zero
+    # (the tickers left out for lack of data can leave weights which sum to zero, the dashboard rejects them otherwise)
+    def portfolio_weights(self, tickers):
+        weights = np.array([self.weights.get(ticker, 0) if self.weights else 1 for ticker in tickers], dtype=float)
+        if not np.isfinite(weights).all() or abs(weights.sum()) < 1e-12:
+            weights = np.ones(len(tickers))
+        return weights / weights.sum()
+
+    # Daily returns of the portfolio rebalanced every day to its weights
+    # The prices are carried over the days where an asset doesn't trade, so it counts for a zero return on these days
+    def portfolio_returns(self):
+        tickers = list(self.tickers)
+        weights = self.portfolio_weights(tickers)
+        prices = forward_fill(self.data.values['prices'][:, [self.data.columns[ticker] for ticker in tickers]])
+        returns = prices[1:] / prices[:-1] - 1
+        # The portfolio starts when all the assets have a price, it has no returns when they never have one together
+        complete = ~np.isnan(returns).any(axis=1)
+        if not complete.any():
+            return self.data.dates[:0], np.array([])
+        start = np.argmax(complete)
+        return self.data.dates[start + 1:], returns[start:] @ weights
+
+    # Statistics of each ticker for the screener: total return, annualized volatility, maximum drawdown and beta on the S&P 500
+    # They are computed for all the tickers at once over the columns of the panel, thousands of tickers take a fraction of a second
+    def screen_statistics(self):
+        tickers = [ticker for ticker in self.tickers if ticker in self.data]
+        prices = self.data.values['prices'][:, [self.data.columns[ticker] for ticker in tickers]]
+        first_rows = np.argmax(~np.isnan(prices), axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            total_returns = forward_fill(prices)[-1] / prices[first_rows, np.arange(len(tickers))] - 1
+        _, returns = self.returns_matrix(tickers)
+        betas = np.full(len(tickers), np.nan)
+        if '^GSPC' in self.data:
+            _, market_returns = self.returns_matrix(['^GSPC'])
+            betas = market_betas(returns, market_returns[:, 0])
+        return {
+            'tickers': tickers,
+            'total return': total_returns,
+            'volatility': column_std(returns) * np.sqrt(periods_per_year(self.bar_frequency)),
+            'max drawdown': max_drawdowns(prices),
+            'beta': betas,
+            'bars': (~np.isnan(prices)).sum(axis=0),
+        }
+
+    # Define the correlation heatmap of the daily returns
+    def plot_correlation_heatmap(self):
+        statistics = self.portfolio_statistics()
+        fig = go.Figure(go.Heatmap(
+            z=statistics['correlation'],
+            x=statistics['tickers'],
+            y=statistics['tickers'],
+            zmin=-1, zmax=1, colorscale='RdBu', reversescale=True,
+            colorbar=dict(title='Correlation')
+        ))
+        fig.update_layout(title=f"Correlation of {self.bar_label} Returns for {join_titles([get_company_name(ticker) for ticker in self.tickers])}",
+                          yaxis_autorange='reversed')
+        return fig
+
+    # Define the evolution of the portfolio: value of 1 invested and rolling volatility of its returns
+    def plot_portfolio_evolution(self):
+        dates, returns = self.portfolio_returns()
+        fig = make_subplots(rows=2, cols=1, shared_xaxes=True, vertical_spacing=0.08,
+                            subplot_titles=('Value of 1 invested', f'{self.bar_label} Volatility ({self.volatility_window} {self.bar_unit})'))
+        fig.add_trace(go.Scatter(x=dates, y=np.cumprod(1 + returns), mode='lines', name='Portfolio Value'), row=1, col=1)
+        fig.add_trace(go.Scatter(x=dates[self.volatility_window - 1:], y=rolling_std(returns, self.volatility_window),
+                                 mode='lines', name='Portfolio Volatility'), row=2, col=1)
+        weights = 'custom weights' if self.weights else 'equal weights'
+        fig.update_layout(title=f"Evolution of the Portfolio of {join_titles([get_company_name(ticker) for ticker in self.tickers])} ({weights})")
+        return fig
+
+    # Define the annualized volatility and the beta on the S&P 500 of each asset
+    def plot_asset_statistics(self):
+        statistics = self.portfolio_statistics()
+        fig = go.Figure()
+        fig.add_trace(go.Bar(x=statistics['tickers'], y=statistics['volatility'] * np.sqrt(periods_per_year(self.bar_frequency)), name='Annualized Volatility'))
+        if statistics['betas'] is not None:
+            fig.add_trace(go.Bar(x=statistics['tickers'], y=statistics['betas'], name='Beta on S&P 500'))
+        fig.update_layout(title=f"Volatility and Beta of {join_titles([get_company_name(ticker) for ticker in self.tickers])}",
+                          xaxis_title='Ticker', barmode='group')
+        return fig
+
+    ### Definition of the risk analyses (see the risk functions)
+
+    # Prices and returns of the assets on the dates of the panel for the risk measures, one column per asset
+    # With more than two assets which have common dates, the portfolio (value of 1 invested) is added as a last column
+    def risk_matrix(self):
+        tickers = [ticker for ticker in self.tickers if ticker in self.data]
+        dates, returns = self.returns_matrix(tickers)
+        prices = self.data.values['prices'][:, [self.data.columns[ticker] for ticker in tickers]]
+        portfolio_dates, portfolio_returns = self.portfolio_returns() if len(tickers) > 2 else ([], [])
+        # Without common dates of all the assets there is no portfolio, only the assets are measured
+        if len(portfolio_returns):
+            rows = np.searchsorted(dates, portfolio_dates)
+            returns = np.column_stack([returns, np.full(len(dates), np.nan)])
+            prices = np.column_stack([prices, np.full(len(dates), np.nan)])
+            returns[rows, -1] = portfolio_returns
+            # The value of 1 invested is set on the bar before the first return, when the panel has one
+            if rows[0] > 0:
+                prices[rows[0] - 1, -1] = 1
+            prices[rows, -1] = np.cumprod(1 + portfolio_returns)
+            tickers = tickers + ['Portfolio']
+        return tickers, dates, prices, returns
+
+    # Define the value at risk and the expected shortfall (CVaR) of one bar, from the past returns and from a normal distribution
+    def plot_value_at_risk(self):
+        labels, _, _, returns = self.risk_matrix()
+        historical, historical_cvar = historical_var(returns, self.var_level)
+        parametric, parametric_cvar = parametric_var(returns, self.var_level)
+        fig = go.Figure()
+        for name, values in [('Historical VaR', historical), ('Historical CVaR', historical_cvar),
+                             ('Parametric VaR', parametric), ('Parametric CVaR', parametric_cvar)]:
+            fig.add_trace(go.Bar(x=labels, y=values, name=name))
+        fig.update_layout(title=f"{self.bar_label} Value at Risk ({self.var_level:.0%}) of {join_titles([get_company_name(ticker) for ticker in self.tickers])}",
+                          xaxis_title='Ticker', yaxis_title=f'{self.bar_label} Return', yaxis_tickformat='.1%', barmode='group')
+        return fig
+
+    # Define the drawdowns: fall from the highest value before, with the maximum drawdown and the longest time spent under a peak
+    # With more than two assets, only the drawdown of the portfolio is drawn (the drawdown of each asset when they have no common dates)
+    def plot_drawdowns(self, x_range=None):
+        labels, dates, prices, _ = self.risk_matrix()
+        maximum, durations = max_drawdowns(prices), drawdown_durations(dates, prices)
+        days = '.0f' if self.bar_unit == 'days' else '.1f'
+        fig = go.Figure()
+        for i, label in enumerate(labels):
+            if label == 'Portfolio':
+                valid = ~np.isnan(prices[:, i])
+                values = prices[valid, i]
+                x, y = DownsamplePyramid(dates[valid], values / np.maximum.accumulate(values) - 1).query(x_range)
+                name = 'Portfolio'
+            elif 'Portfolio' in labels:
+                continue
+            else:
+                x, y = self.downsampled(label, 'drawdown', x_range)
+                name = get_company_name(label)
+            fig.add_trace(go.Scatter(x=x, y=y, mode='lines', fill='tozeroy',
+                                     name=f'{name} (max {maximum[i]:.1%}, longest {durations[i]:{days}} days)'))
+        fig.update_layout(title=f"Drawdowns of {join_titles([get_company_name(ticker) for ticker in self.tickers])}",
+                          xaxis_title='Date', yaxis_title='Drawdown', yaxis_tickformat='%')
+        return fig
+
+    # Define the annualized Sharpe and Sortino ratios, with a risk free rate of 0
+    def plot_risk_ratios(self):
+        labels, _, _, returns = self.risk_matrix()
+        periods = periods_per_year(self.bar_frequency)
+        fig = go.Figure()
+        fig.add_trace(go.Bar(x=labels, y=sharpe_ratios(returns, periods), name='Sharpe Ratio'))
+        fig.add_trace(go.Bar(x=labels, y=sortino_ratios(returns, periods), name='Sortino Ratio'))
+        fig.update_layout(title=f"Sharpe and Sortino Ratios of {join_titles([get_company_name(ticker) for ticker in self.tickers])} (annualized, risk free rate of 0)",
+                          xaxis_title='Ticker', barmode='group')
+        return fig
+
+    # Define the Monte Carlo projection of the value of 1 invested in the assets (with their weights, equal weights by default)
+    # The bands contain 50% and 90% of the paths, the title gives the value at risk over the whole horizon
+    # The simulations draw from the bars where all the assets are defined, without two of them the figure only explains why
+    def plot_monte_carlo(self):
+        method, paths, horizon = self.monte_carlo
+        tickers = [ticker for ticker in self.tickers if ticker in self.data]
+        _, returns = self.returns_matrix(tickers)
+        returns = returns[~np.isnan(returns).any(axis=1)]
+        title = f"Monte Carlo Projection of {join_titles([get_company_name(ticker) for ticker in tickers])}"
+        if len(returns) < 2:
+            fig = go.Figure()
+            fig.update_layout(title=f"{title}<br>Not enough common dates: the assets were not traded together on the dates of the panel",
+                              xaxis_title=f'{self.bar_unit.capitalize()} ahead', yaxis_title='Value of 1 invested')
+            return fig
+        model = monte_carlo_model(returns, self.portfolio_weights(tickers), method, horizon)
+        counts = simulate(model, paths)
+        low, lower, median, upper, high = [np.concatenate([[1.0], values]) for values in
+                                           simulation_quantiles(model, counts, [0.05, 0.25, 0.5, 0.75, 0.95])]
+        var, cvar = simulation_var(model, counts, self.var_level)
+        steps = np.arange(horizon + 1)
+
+        fig = go.Figure()
+        for top, bottom, name, opacity in [(high, low, '5% - 95% of the paths', 0.2), (upper, lower, '25% - 75% of the paths', 0.4)]:
+            fig.add_trace(go.Scatter(x=steps, y=top, mode='lines', line=dict(width=0), showlegend=False, hoverinfo='skip'))
+            fig.add_trace(go.Scatter(x=steps, y=bottom, mode='lines', line=dict(width=0), fill='tonexty',
+                                     fillcolor=f'rgba(31, 119, 180, {opacity})', name=name))
+        fig.add_trace(go.Scatter(x=steps, y=median, mode='lines', line=dict(color='rgb(31, 119, 180)'), name='Median'))
+        model_name = 'bootstrap of the returns' if method == 'bootstrap' else 'geometric Brownian motion'
+        fig.update_layout(title=f"{title} ({paths:,} paths, {model_name})"
+                                f"<br>VaR ({self.var_level:.0%}) over {horizon} {self.bar_unit}: {var:.1%}, CVaR: {cvar:.1%}",
+                          xaxis_title=f'{self.bar_unit.capitalize()} ahead', yaxis_title='Value of 1 invested')
+        return fig
+
+
+### Creation of the Dashboard_Financial_Analysis class
+
+# This class construct the dashboard with two central parts: the layout and the callbacks 
+# The layout define the visual aspect of the dashboard and the callbacks define the interactivity of the dashboard 
+
+
+# Define a common input style for some elements in the dashboard 
+common_input_style = {'margin': '10px', 'font-size': '14px', 'margin-left': '0px'}  # Adjusted 'margin-left
+
+
+### Creation of the SessionStore class
+
+# The data of each run of the dashboard is kept on the server, the browser only keeps its handle in a dcc.Store
+# The store is a diskcache folder shared by all the processes (background jobs and the workers of the server)
+# so any worker can draw the figures of any session, and the users never overwrite each other
+# When the folder goes over max_bytes, the least recently used sessions are dropped
+# Each process also keeps the last sessions it used in memory, up to memory_bytes
+session_store_path = os.path.join(dir_path, 'session_store')
+
+class SessionStore:
+    def __init__(self, path=session_store_path, max_bytes=1024 ** 3, memory_bytes=256 * 1024 ** 2):
+        self.memory_bytes = memory_bytes
+        self.memory = OrderedDict()
+        self.nbytes = 0
+        self.lock = threading.Lock()
+        # Without diskcache the sessions only live in the memory of the process, which is fine with a single worker
+        self.cache = None
+        if diskcache is not None:
+            self.cache = diskcache.Cache(path, size_limit=max_bytes, eviction_policy='least-recently-used')
+
+    def _remember(self, handle, session):
+        with self.lock:
+            if handle in self.memory:
+                self.nbytes -= self.memory.pop(handle)['panel'].nbytes
+            self.memory[handle] = session
+            self.nbytes += session['panel'].nbytes
+            while self.nbytes > self.memory_bytes and len(self.memory) > 1:
+                self.nbytes -= self.memory.popitem(last=False)[1]['panel'].nbytes
+
+    # Save a session {'run': parameters of the run, 'panel': PricePanel} and return its handle
+    # A handle can be given for data shared by all the users (the panel of a screen for example)
+    def put(self, session, handle=None):
+        handle = handle or uuid.uuid4().hex
+        if self.cache is not None:
+            self.cache.set(handle, session)
+        self._remember(handle, session)
+        return handle
+
+    # Return the session of a handle, or None if it was dropped
+    def get(self, handle):
+        with self.lock:
+            if handle in self.memory:
+                self.memory.move_to_end(handle)
+                telemetry.increment('cache_requests', cache='session', result='memory')
+                return self.memory[handle]
+        session = self.cache.get(handle) if self.cache is not None else None
+        telemetry.increment('cache_requests', cache='session', result='miss' if session is None else 'disk')
+        if session is not None:
+            self._remember(handle, session)
+        return session
+
+session_store = SessionStore()
+
+
+# The analysis (downloads included) runs as a background callback, in a separate process, so the server keeps answering the other callbacks
+# The jobs and their progress are kept in a local diskcache folder, no broker (Redis, Celery) is needed
+# Without diskcache, psutil and multiprocess, the analysis runs directly in the callback
+job_cache_path = os.path.join(dir_path, 'job_cache')
+try:
+    background_callback_manager = dash.DiskcacheManager(diskcache.Cache(job_cache_path)) if diskcache is not None else None
+except ImportError:
+    background_callback_manager = None
+
+# Columns of the table of the screener
+screener_columns = [
+    {'name': 'Ticker', 'id': 'ticker'},
+    {'name': 'Company', 'id': 'name'},
+    {'name': 'Sector', 'id': 'sector'},
+    {'name': 'Industry', 'id': 'industry'},
+    {'name': 'Market Cap (billions)', 'id': 'market cap', 'type': 'numeric', 'format': Format(precision=1, scheme=Scheme.fixed)},
+    {'name': 'Total Return', 'id': 'total return', 'type': 'numeric', 'format': FormatTemplate.percentage(1)},
+    {'name': 'Annualized Volatility', 'id': 'volatility', 'type': 'numeric', 'format': FormatTemplate.percentage(1)},
+    {'name': 'Max Drawdown', 'id': 'max drawdown', 'type': 'numeric', 'format': FormatTemplate.percentage(1)},
+    {'name': 'Beta on S&P 500', 'id': 'beta', 'type': 'numeric', 'format': Format(precision=2, scheme=Scheme.fixed)},
+    {'name': 'Days', 'id': 'bars', 'type': 'numeric'},
+]
+
+# Time a callback of the dashboard (see the Telemetry class)
+# The end of the callback is remembered to time the serialization of its answer by Dash (see setup_monitoring)
+# A background job ends with its process, background=True marks the process as a job (see simulate) and sends its measures
+# to the shared folder before the end
+def timed_callback(function, background=False):
+    timed = telemetry.timed('callback', callback=function.__name__)(function)
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        global background_job
+        if background:
+            background_job = True
+        try:
+            return timed(*args, **kwargs)
+        finally:
+            if flask.has_request_context():
+                flask.g.callback_done = (function.__name__, time.perf_counter())
+            if background:
+                telemetry.flush()
+    return wrapper
+
+# The figures and the answers of the callbacks are serialized by plotly, with orjson when it is installed (several times faster than json)
+try:
+    import orjson
+    pio.json.config.default_engine = 'orjson'
+except ImportError:
+    orjson = None
+
+# The answers of the server are compressed when the browser accepts it, with brotli when it is installed (pip install brotli), gzip otherwise
+# The small answers are sent as they are, the files of Dash and of the assets folder are only compressed once
+try:
+    import brotli
+except ImportError:
+    brotli = None
+compression_min_bytes = 500
+compressible_types = {'application/json', 'application/javascript', 'text/javascript', 'text/html', 'text/css', 'text/plain'}
+compressed_files = {}
+
+def compress_body(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=4)
+    return gzip.compress(body, compresslevel=5)
+
+# A request is profiled with cProfile when it has the header "X-Profile: 1", or every request when DASHBOARD_PROFILE_DIR is set
+# The profiles are written in this folder (or in "profiles" next to this script), one .prof file per request, e.g. for snakeviz
+profile_dir = os.environ.get('DASHBOARD_PROFILE_DIR')
+
+# Definition of the overall class
+class Dashboard_Financial_Analysis:
+    def __init__(self, analysis_instance):
+        # The analysis instance holds the shared caches, each session gets its own copy of it (see the session method)
+        self.analysis = analysis_instance
+        # We define here the overall style of the dashboard with the library dash_bootstraps components
+        self.app = dash.Dash(__name__, suppress_callback_exceptions=True, external_stylesheets=[dbc.themes.CERULEAN],
+                             background_callback_manager=background_callback_manager)
+        
+        ### Define the layout
+        # We give "id" for all the components that will be used in the callback part
+        
+        # Use the command container to wrap the whole layout
+        self.app.layout =dbc.Container([
+            # Design the title part
+            dbc.Row(
+                dbc.Col(html.H1("Financial Analysis Dashboard", className="text-center mt-4", style={'font-size': '24px'}), width=12)
+                ),
+            html.Hr(style={'background-color': 'primary', 'height': '2px'}),
+            dbc.Row([
+                dbc.Col([
+                    html.P("This dashboard provides financial analysis tools to explore stock data, visualize market trends, and conduct statistical analysis. Select a number of assets, the tickers, define a date range and choose the type of analysis to perform. In order to select assets, you will need to use the corresponding tickers from Yahoo Finance. You can find via the ticker researcher about seven thousands tickers. Otherwise, here's the link to find the tickers : https://finance.yahoo.com/", className="text-center mb-4", style={'font-size': '14px','font-family':'Segoe UI'})
+                ], width=12)
+            ]),
+            # Design the ticker researcher part 
+            dbc.Row([
+    dbc.Col([
+        html.H3("1 : Ticker Researcher ", className="mb-3", style={'margin-top':'20px','font-size': '16px'}),
+        html.Div("You can search here the symbol (ticker) attributed to your company by entering its name. Then you can copy the ticker and paste it in the tickers fields. ", style={'margin-bottom':'15px','font-size': '14px'}),
+        dbc.Row([ 
+            dbc.Col([
+                dcc.Input(
+                    id='search-input', 
+                    type='text', 
+                    placeholder='Type a company...', 
+                    style={
+                        'width': '240px',  
+                        'height': '25px',  
+                        'font-size': 'smaller', 
+                        'padding': '10px 5px',}
+                ),
+                # Dropdown for company suggestions placed directly below the input
+                dcc.Dropdown(
+                    id='company-suggestions',
+                    placeholder="Open to select a company",
+                    style={
+                        'width': '240px',
+                        'margin-top': '5px',
+                        'font-size': 'smaller',},
+                    options=[],
+                    # Disable the ability to clear the selection
+                    clearable=False,  
+                    searchable=False,)
+            ], width=2),
+            
+            dbc.Col([
+                html.Div(
+                    id='ticker-result', 
+                    className="p-2 border bg-light", 
+                    style={
+                        'width': '160px', 
+                        'height': '25px',  
+                        'font-size': 'smaller',
+                        'padding': '10px 5px',
+                        'display': 'flex',
+                        'align-items': 'center', 
+                        'justify-content': 'center'
+                    }
+                ),
+                # Add a copy button for the ticker 
+                html.Button('Copy', id='copy-btn', n_clicks=0, className="btn btn-primary btn-sm", style={'display': 'inline-block','padding': '3px 6px','font-size': '12px'}),
+                ], width=2), 
+                    ]),
+                html.Div(
+                    id='search-results', 
+                    style={'height': '50px', 'overflow-y': 'auto', 'width': '100%'}
+                )], width=12)
+        ], className="mb-3"),
+
+            # Design the selection of assets 
+            dbc.Row([
+                dbc.Col([
+                    html.H3("2 : Select the number of assets", style={'font-size': 'medium'}),
+                    dbc.RadioItems(
+                        id='num-assets',
+                        options=[
+                            {'label': 'One Asset', 'value': '1'},
+                            {'label': 'Two Assets', 'value': '2'},
+                            {'label': 'Several Assets (portfolio)', 'value': 'N'}
+                        ],
+                        value='1',
+                        inline=True,
+                        style=common_input_style
+                    )], width=12)
+            ], className="mb-5"),
+            
+            # Design the selection of tickers 
+            dbc.Row([
+                dbc.Col([
+                    html.H3("3 : Enter the ticker(s) for your asset(s)", style={'font-size': 'medium'}),
+                    dcc.Input(id='ticker-1', type='text', placeholder='Enter Ticker 1', style=common_input_style),
+                    # The fields are always in the layout, the browser only shows the ones of the number of assets choosen
+                    html.Div(id='ticker-2-container', children=[
+                        dcc.Input(id='ticker-2', type='text', placeholder='Enter Ticker 2', style=common_input_style)
+                    ], style={'display': 'none'}),  # Adjusted for initial hidden state
+                    # The list of tickers of the portfolio replaces the ticker 1 field when several assets are choosen
+                    html.Div(id='tickers-list-container', children=[
+                        dcc.Input(id='tickers-list', type='text', placeholder='Tickers separated by commas, optionally with weights: AAPL:0.5, MSFT:0.3, NVDA:0.2',
+                                  style=dict(common_input_style, width='600px'))
+                    ], style={'display': 'none'})
+                ], width=12)
+            ], className="mb-5"),
+
+            # Design the selection of the dates 
+            dbc.Row([
+                dbc.Col([
+                    html.H3("4 : Enter a date range for analysis", style={'font-size': 'medium'}),
+                    dcc.Input(id='start-date', type='text', placeholder='Start Date (DD.MM.YYYY)', style={'margin': '5px 41px 5px 0', 'font-size': 'smaller'}),
+                    dcc.Input(id='end-date', type='text', placeholder='End Date (DD.MM.YYYY)', style={'margin': '5px 0 5px 41px', 'font-size': 'smaller'}),  # Added margin
+                    # The bars can be intraday (yfinance only keeps the last 30 days of 1m bars, 60 days up to 30m and 730 days of 1h bars)
+                    # and resampled to another frequency while they are read
+                    html.Div([
+                        html.Span("Bars: ", style={'font-size': '14px'}),
+                        dcc.Dropdown(id='bar-interval', options=[{'label': label, 'value': value} for label, value in
+                                                                 [('Daily', '1d'), ('1 hour', '1h'), ('30 minutes', '30m'), ('15 minutes', '15m'),
+                                                                  ('5 minutes', '5m'), ('1 minute', '1m')]],
+                                     value='1d', clearable=False, style={'width': '150px', 'font-size': 'smaller'}),
+                        html.Span("Resampled to: ", style={'font-size': '14px', 'margin-left': '20px'}),
+                        dcc.Dropdown(id='bar-frequency', options=[{'label': label, 'value': value} for label, value in
+                                                                  [('5 minutes', '5m'), ('15 minutes', '15m'), ('1 hour', '1h'), ('Day', 'D'),
+                                                                   ('Week', 'W'), ('Month', 'M')]],
+                                     value=None, placeholder='No resampling', style={'width': '150px', 'font-size': 'smaller'}),
+                        # All the analyses can run on the prices converted to one currency, to compare assets listed in different ones
+                        html.Span("Currency: ", style={'font-size': '14px', 'margin-left': '20px'}),
+                        dcc.Dropdown(id='base-currency', options=base_currencies, value=None, placeholder='Currency of each asset',
+                                     style={'width': '190px', 'font-size': 'smaller'})
+                    ], style={'display': 'flex', 'align-items': 'center', 'margin-top': '10px'})
+                ], width=12)
+            ], className="mb-5"),
+            
+            # Design the selection of the analysis
+                        dbc.Row([
+                dbc.Col([
+                    html.H3("5 : Choose the analysis to perform", style={'font-size': 'medium'}),
+                    # we create a section with a certain id containing an empty checklist that will adapt on the number of assets choosen
+                    html.Div(id='dynamic-analysis-checklist-container', children=[
+                        # The options of the checklist are given by the browser for the number of assets choosen
+                        # We set it initially empty in order to be always present in the layout
+                        dbc.Checklist(
+                            id='analysis-checklist',
+                            options=[],
+                            value=[],
+                            inline=True,
+                            style=common_input_style
+                        )
+                    ]),
+                    # The window of the rolling volatility can be changed without running the analysis again
+                    html.Div([
+                        html.Span("Volatility window (bars): ", style={'font-size': '14px'}),
+                        dcc.Input(id='volatility-window', type='number', value=20, min=2, step=1, style={'width': '70px', 'font-size': 'smaller'})
+                    ], style=common_input_style),
+                    # Curves which can be drawn over the distribution of daily returns
+                    dbc.Checklist(
+                        id='distribution-overlays',
+                        options=[{'label': 'Density (KDE) on the distribution', 'value': 'kde'},
+                                 {'label': 'Normal fit on the distribution', 'value': 'normal'}],
+                        value=[],
+                        inline=True,
+                        style=common_input_style
+                    ),
+                    # Model, number of paths and horizon (bars) of the Monte Carlo projection, also without running the analysis again
+                    html.Div([
+                        html.Span("Monte Carlo: ", style={'font-size': '14px'}),
+                        dcc.Dropdown(id='monte-carlo-method',
+                                     options=[{'label': 'Bootstrap of the returns', 'value': 'bootstrap'},
+                                              {'label': 'Geometric Brownian motion', 'value': 'gbm'}],
+                                     value='bootstrap', clearable=False,
+                                     style={'width': '230px', 'display': 'inline-block', 'vertical-align': 'middle', 'font-size': 'smaller'}),
+                        html.Span(" paths: ", style={'font-size': '14px'}),
+                        dcc.Input(id='monte-carlo-paths', type='number', value=10000, min=100, max=1000000, step=100,
+                                  style={'width': '100px', 'font-size': 'smaller'}),
+                        html.Span(" horizon (bars): ", style={'font-size': '14px'}),
+                        dcc.Input(id='monte-carlo-horizon', type='number', value=252, min=1, max=2520, step=1,
+                                  style={'width': '70px', 'font-size': 'smaller'})
+                    ], style=common_input_style),
+                    # The selected analyses can be drawn right after the run, switching between them is then immediate
+                    dbc.Checklist(
+                        id='prerender-analyses',
+                        options=[{'label': 'Prepare all the selected analyses after the run', 'value': 'prerender'}],
+                        value=['prerender'],
+                        inline=True,
+                        style=common_input_style
+                    ),
+                    # The prices of the run are sent once to the browser, which draws the time series and switches between them by itself
+                    dbc.Checklist(
+                        id='client-rendering',
+                        options=[{'label': 'Draw the time series in the browser', 'value': 'client'}],
+                        value=['client'],
+                        inline=True,
+                        style=common_input_style
+                    )
+                ], width=12)
+            ], className="mb-4"),
+            
+            # Design the run analysis button
+            dbc.Row(dbc.Col(
+                html.Button('Run Analysis', id='run-analysis', n_clicks=0, className="mx-auto mb-2 btn btn-primary btn-sm", style=common_input_style), width=12)),
+                html.Div("This button launches the analysis based on your parameters (number assets, tickers, dates, selected analysis). If you change your setup, don't forget to run again! ",style={'margin-top':'5px','font-size': '14px'}),
+            # Design the progress of the downloads, only visible while the analysis runs
+            html.Div([
+                html.Progress(id='run-progress', value='0', max='1', style={'width': '300px', 'margin-right': '10px'}),
+                html.Span(id='run-progress-label', style={'font-size': 'smaller'})
+            ], id='run-progress-container', style={'display': 'none'}),
+            # The handle of the last run in the session store, the figures are drawn from its data
+            dcc.Store(id='analysis-run'),
+            # The prices of the last run for the analyses drawn in the browser, and the template of the figures of plotly
+            dcc.Store(id='analysis-data'),
+            dcc.Store(id='figure-template', data=pio.templates[pio.templates.default].to_plotly_json()),
+            # The analysis asked to the server, only set by the browser when it can't draw the analysis itself
+            dcc.Store(id='analysis-request'),
+            
+            # Design the dropdown to choose between the selected analysis 
+            dbc.Row([      
+            dbc.Col([
+                html.H3("6 : Choose the analysis you want to display here", className="mt-5 mb-2", style={'font-size': 'medium'}),  # Increased margin-bottom
+                dcc.Dropdown(id='analysis-dropdown', style={'width': '50%', 'font-size': 'smaller', 'margin-top': '15px'}, options=[], value=None)  # Added margin-top
+            ], width=12)
+            ], className="mb-4"),
+            
+            # Design the place where the selected analysis show up
+            dbc.Row([
+                dbc.Col([
+                    html.Div("Select an analysis to display results.", id='selected-analysis-output'),
+                    html.Div(dcc.Graph(id='client-analysis-graph'), id='client-analysis-container', style={'display': 'none'})
+                ], width=12)
+            ], className="mb-4"),
+            # Design a place for a potential apparition of an error message
+            dbc.Row([
+                dbc.Col(html.Div(id='error-message', style={'color': 'red', 'margin': '5px', 'font-size': 'smaller'}), width=12)
+            ], className="mb-4"),
+            # Design and specify the place where the graphs of our analysis show up
+            dbc.Row([
+                dbc.Col(html.Div(id='output-container'), width=12)
+            ], className="mb-4"),
+
+            # Design the screener of the companies of the ticker researcher, independent of the analysis above
+            dbc.Row([
+                dbc.Col([
+                    html.H3("7 : Screen the companies", className="mt-4", style={'font-size': 'medium'}),
+                    html.Div("Compare the return, the volatility, the maximum drawdown and the beta on the S&P 500 of all the companies of the ticker researcher, or of some sectors, industries and market capitalizations. Click on the name of a column to sort the table, or type in the cells below the names to filter it.", style={'font-size': '14px'}),
+                    html.Div([
+                        dcc.Dropdown(id='screener-sectors', options=sorted(set(ticker_universe.table()['sector']) - {''}), multi=True,
+                                     placeholder='All sectors', style={'width': '300px', 'font-size': 'smaller'}),
+                        dcc.Dropdown(id='screener-industries', options=sorted(set(ticker_universe.table()['industry']) - {''}), multi=True,
+                                     placeholder='All industries', style={'width': '300px', 'font-size': 'smaller'}),
+                        html.Span("Minimum market cap (billions): ", style={'font-size': '14px'}),
+                        dcc.Input(id='screener-min-market-cap', type='number', min=0, style={'width': '80px', 'font-size': 'smaller'}),
+                        html.Span("Period: ", style={'font-size': '14px'}),
+                        dcc.Dropdown(id='screener-period', options=[{'label': f'{years} year' + ('s' if years > 1 else ''), 'value': years} for years in (1, 3, 5, 10)],
+                                     value=1, clearable=False, style={'width': '120px', 'font-size': 'smaller'})
+                    ], style={'display': 'flex', 'align-items': 'center', 'flex-wrap': 'wrap', 'gap': '10px', 'margin': '10px 0'}),
+                    html.Button('Run Screener', id='run-screener', n_clicks=0, className="btn btn-primary btn-sm", style=common_input_style),
+                    # Design the progress of the downloads, only visible while the screener runs
+                    html.Div([
+                        html.Progress(id='screener-progress', value='0', max='1', style={'width': '300px', 'margin-right': '10px'}),
+                        html.Span(id='screener-progress-label', style={'font-size': 'smaller'})
+                    ], id='screener-progress-container', style={'display': 'none'}),
+                    html.Div(id='screener-message', style={'color': 'red', 'margin': '5px', 'font-size': 'smaller'}),
+                    # The table is sorted and filtered in the browser
+                    dash_table.DataTable(id='screener-table', columns=screener_columns, data=[], sort_action='native', sort_mode='multi',
+                                         filter_action='native', page_size=25, style_table={'overflowX': 'auto'},
+                                         style_cell={'font-size': '12px', 'font-family': 'Segoe UI', 'text-align': 'left'})
+                ], width=12)
+            ], className="mb-4")
+            # Specify the overall background color and font of the text
+        ], fluid=True,style={'background-color': '#E0EEEE','font-family': 'Segoe UI'})
+       
+        ### Define the callbacks part 
+        
+        self.setup_callbacks()
+        # The compression runs after the timings (the hooks of Flask run in the reverse order), it is timed by itself
+        self.setup_compression()
+        self.setup_monitoring()
+    
+    # Define all the callbacks in this method 
+    # A callback has always two parts, the specification of output/inputs with id's and the function implementing that 
+    def setup_callbacks(self):
+        
+        ### Callbacks for the ticker researcher 
+        # Define the dynamic research of company name and return a list limited to five names
+        @self.app.callback(
+            Output('company-suggestions', 'options'),
+            Input('search-input', 'value')
+        )
+        @timed_callback
+        def update_suggestions(query):
+            if query:
+                return search_index.search(query)
+            return []
+        
+        # The callbacks below only change what is shown, they run in the browser without request to the server
+        # Define the ticker result when you select a company 
+        self.app.clientside_callback(
+            """
+            function(ticker) {
+                return ticker ? String(ticker) : "";
+            }
+            """,
+            Output('ticker-result', 'children'),
+            Input('company-suggestions', 'value')
+        )
+        
+        # Define the apparition of ticker 2 input field when two assets are choosen 
+        self.app.clientside_callback(
+            """
+            function(num_assets) {
+                return {'display': num_assets === '2' ? 'block' : 'none'};
+            }
+            """,
+            Output('ticker-2-container', 'style'),
+            Input('num-assets', 'value')
+        )
+        
+        # Define the apparition of the list of tickers when several assets are choosen, the ticker 1 field is hidden
+        self.app.clientside_callback(
+            """
+            function(num_assets, ticker_1_style) {
+                var several = num_assets === 'N';
+                return [{'display': several ? 'block' : 'none'},
+                        Object.assign({}, ticker_1_style, {'display': several ? 'none' : 'inline-block'})];
+            }
+            """,
+            [Output('tickers-list-container', 'style'), Output('ticker-1', 'style')],
+            Input('num-assets', 'value'),
+            State('ticker-1', 'style')
+        )
+
+        # Define a callback that update dynamically the options for analysis based on number of assets choosen 
+        options = [
+            {'label': 'Evolution of Index Prices', 'value': 'plot_index_evolution'},
+            {'label': 'Distribution of Daily Returns', 'value': 'plot_returns_distribution'},
+            {'label': 'Evolution of Daily Volatility', 'value': 'plot_volatility_evolution'},
+            {'label': 'Evolution of Daily Returns', 'value': 'plot_daily_returns_evolution'},
+            {'label': 'Evolution of Weekly Returns', 'value': 'plot_weekly_returns_evolution'}
+        ]
+        # The risk analyses are proposed for any number of assets (with the portfolio for more than two)
+        risk_options = [
+            {'label': 'Value at Risk (VaR and CVaR)', 'value': 'plot_value_at_risk'},
+            {'label': 'Drawdowns', 'value': 'plot_drawdowns'},
+            {'label': 'Sharpe and Sortino Ratios', 'value': 'plot_risk_ratios'},
+            {'label': 'Monte Carlo Projection', 'value': 'plot_monte_carlo'}
+        ]
+        options_by_mode = {
+            '1': options + [{'label': 'Linear Regression on S&P 500', 'value': 'perform_linear_regression'},
+                            {'label': 'Rolling Regression on S&P 500', 'value': 'plot_rolling_regression'}] + risk_options,
+            '2': options + [{'label': 'Linear Regression Analysis', 'value': 'perform_linear_regression'},
+                            {'label': 'Rolling Regression Analysis', 'value': 'plot_rolling_regression'}] + risk_options,
+            'N': options + [{'label': 'Rolling Beta of the Portfolio', 'value': 'plot_rolling_regression'},
+                            {'label': 'Correlation Heatmap', 'value': 'plot_correlation_heatmap'},
+                            {'label': 'Evolution of the Portfolio', 'value': 'plot_portfolio_evolution'},
+                            {'label': 'Volatility and Beta of the Assets', 'value': 'plot_asset_statistics'}] + risk_options
+        }
+        self.app.clientside_callback(
+            """
+            function(num_assets) {
+                var options_by_mode = %s;
+                return [options_by_mode[num_assets] || options_by_mode['N'], ['plot_index_evolution']];
+            }
+            """ % json.dumps(options_by_mode),
+            [Output('analysis-checklist', 'options'), Output('analysis-checklist', 'value')],
+            Input('num-assets', 'value')
+        )
+        
+        ### Critical compoenent of the dashboard 
+        # Propose : a list of the selected analysis, the default analysis value and the potential error message
+        # This proposition is directly triggered by the "input" (Run-analysis button) and takes "states" of relevant components to display the correct output
+        # The analysis runs in a background process which only downloads the prices in the price store and reports its progress
+        # The figures are then drawn by the server from the run returned in the 'analysis-run' store, or by the browser from the prices
+        # returned in the 'analysis-data' store
+        # Clicking again while it runs cancels the running job and starts a new one
+        run_outputs = [Output('analysis-dropdown', 'options'), Output('analysis-dropdown', 'value'), Output('error-message', 'children'),
+                       Output('analysis-run', 'data'), Output('analysis-data', 'data')]
+        run_states = [State('num-assets', 'value'), State('ticker-1', 'value'), State('ticker-2-container', 'children'),
+                      State('tickers-list-container', 'children'),
+                      State('start-date', 'value'), State('end-date', 'value'), State('analysis-checklist', 'value'),
+                      State('prerender-analyses', 'value'), State('bar-interval', 'value'), State('bar-frequency', 'value'),
+                      State('client-rendering', 'value'), State('base-currency', 'value')]
+
+        def perform_and_display_analysis(set_progress, n_clicks, num_assets, ticker1, ticker2_container, tickers_list_container, start_date, end_date, analysis_options, prerender,
+                                         interval, frequency, client_rendering, base_currency):
+            # Prevent from running until user clicks on the run-analysis button 
+            if n_clicks == 0:
+                raise exceptions.PreventUpdate
+
+            # More robust check for ticker2
+            # start with an empty value for ticker 2 and assign a value if user has choosen two assets and provided two tickers
+            ticker2 = None
+            if num_assets == '2' and ticker2_container:
+                input_component = ticker2_container[0] if ticker2_container else None
+                if input_component and 'props' in input_component and 'value' in input_component['props']:
+                    ticker2 = input_component['props']['value']
+            # create tickers based on user's choices
+            tickers = [ticker1 if ticker1 else None, ticker2 if ticker2 else None]
+
+            # With several assets, the tickers (and the optional weights "TICKER:weight") come from the list field
+            weights = None
+            if num_assets == 'N':
+                tickers_list = ''
+                if tickers_list_container and 'value' in tickers_list_container[0].get('props', {}):
+                    tickers_list = tickers_list_container[0]['props']['value'] or ''
+                entries = [entry.split(':') for entry in tickers_list.replace(';', ',').split(',') if entry.strip()]
+                tickers = list(dict.fromkeys(entry[0].strip() for entry in entries))
+                if len(tickers) < 2:
+                    return [], None, "Please provide at least two tickers separated by commas when several assets are selected.", dash.no_update, dash.no_update
+                # The weights are only used when all the tickers have one, otherwise the portfolio is equally weighted
+                try:
+                    if all(len(entry) == 2 for entry in entries):
+                        weights = {entry[0].strip(): float(entry[1]) for entry in entries}
+                except ValueError:
+                    return [], None, "Invalid weight. Please use the format TICKER:weight, e.g. AAPL:0.5.", dash.no_update, dash.no_update
+                # The weights are divided by their sum, a sum of zero (all zeros or long and short positions which cancel) has no portfolio
+                if weights is not None and (not all(math.isfinite(weight) for weight in weights.values()) or abs(sum(weights.values())) < 1e-12):
+                    return [], None, "The weights must be numbers which don't sum to zero, e.g. AAPL:0.5, MSFT:0.5.", dash.no_update, dash.no_update
+
+            # Check if the required number of tickers matches the number of assets selected
+            if num_assets == '2' and (not tickers[0] or not tickers[1]):
+                return [], None, "Please provide both tickers when two assets are selected.", dash.no_update, dash.no_update
+
+            # Filter out None values for further processing
+            tickers = [ticker for ticker in tickers if ticker]
+            # Check if at least one ticker is provided to run the analysis
+            if not tickers:
+                return [], None, "Please provide at least one ticker.", dash.no_update, dash.no_update
+            # Check if there are dates to run the analysis
+            if not start_date or not end_date:
+                return [], None, "Please ensure all date fields are filled out.", dash.no_update, dash.no_update
+            # Check if the dates are specified properly (correct format and correct order)
+            try:
+                start_date = datetime.strptime(start_date, '%d.%m.%Y')
+                end_date = datetime.strptime(end_date, '%d.%m.%Y')
+                if start_date >= end_date:
+                    return [], None, "Start date must be before end date.", dash.no_update, dash.no_update
+            except ValueError:
+                return [], None, "Invalid date format. Please use DD.MM.YYYY.", dash.no_update, dash.no_update
+            
+            # Add S&P 500 data only for the linear regression analyse in the case of one asset choosen which isn't the S&P 500 itself
+            # With several assets, it is the benchmark of the betas
+            # It is downloaded in the same batch as the tickers of the user
+            include_spy = '^GSPC' not in tickers and (
+                (num_assets == 'N' and {'plot_asset_statistics', 'plot_rolling_regression'} & set(analysis_options))
+                or ({'perform_linear_regression', 'plot_rolling_regression'} & set(analysis_options) and len(tickers) == 1))
+
+            # Load the data of all the tickers at once in the panel of the session and report each ticker loaded
+            def report(done, total, ticker):
+                set_progress((str(done), str(total), f"{done} / {total} tickers loaded" + (f" ({ticker})" if ticker else "")))
+            # With a base currency, the exchange rates are loaded and the panel converted once here, the session then finds it converted
+            try:
+                panel, missing_tickers = self.analysis.load(tickers, start_date, end_date, benchmark=include_spy, progress=report,
+                                                            interval=interval or '1d', frequency=frequency)
+                converted = self.analysis.fx.convert(panel, base_currency, interval or '1d') if base_currency else panel
+            except Exception as e:
+                return [], None, f"Error loading data for {', '.join(tickers)}: {str(e)}\n", dash.no_update, dash.no_update
+            # Tickers (with valid data) go in valid_tickers
+            valid_tickers = [ticker for ticker in tickers if ticker not in missing_tickers and ticker in converted]
+            error_message = "".join(f"No data found for {ticker}. Please check ticker names and try again.\n"
+                                    for ticker in tickers if ticker in missing_tickers)
+            error_message += "".join(f"No exchange rate found to convert {ticker} to {base_currency}.\n"
+                                     for ticker in tickers if ticker not in missing_tickers and ticker not in converted)
+            # If error message, return empty valid_tickers and the appropriate error message
+            # A portfolio goes on without the tickers which have no data, the message is then only a warning
+            if error_message and (num_assets != 'N' or len(valid_tickers) < 2):
+                return [], None, error_message, dash.no_update, dash.no_update
+
+            # The session keeps the panel, the valid tickers and the weights, only its handle goes back to the browser
+            # With the browser drawing the time series, their prices go back too and the server only prepares the other analyses
+            data = None
+            if client_rendering:
+                data = self.analysis.session(panel, valid_tickers, weights, interval or '1d', frequency, base_currency).client_data()
+            server_analyses = [name for name in analysis_options if data is None or name not in self.analysis.client_analyses]
+            run = {'tickers': valid_tickers, 'weights': weights, 'prerender': server_analyses if prerender else [],
+                   'interval': interval or '1d', 'frequency': frequency, 'base_currency': base_currency}
+            handle = session_store.put({'run': run, 'panel': panel})
+            if data is not None:
+                data.update(handle=handle, prerender=bool(run['prerender']))
+            # Return the different option in the dropdown
+            options = [{'label': opt.replace('plot_', '').replace('_', ' ').title(), 'value': opt} for opt in analysis_options]
+            if 'perform_linear_regression' in analysis_options:
+                regression_label = 'Linear Regression on S&P 500' if len(valid_tickers) == 1 else 'Linear Regression Analysis'
+                options = [{'label': regression_label, 'value': 'perform_linear_regression'} if opt['value'] == 'perform_linear_regression' else opt for opt in options]
+
+            return options, options[0]['value'] if options else None, error_message, handle, data
+
+        if background_callback_manager is not None:
+            self.app.callback(
+                run_outputs, Input('run-analysis', 'n_clicks'), run_states,
+                background=True,
+                progress=[Output('run-progress', 'value'), Output('run-progress', 'max'), Output('run-progress-label', 'children')],
+                running=[(Output('run-analysis', 'children'), 'Restart Analysis', 'Run Analysis'),
+                         (Output('run-progress-container', 'style'), {'display': 'flex', 'align-items': 'center'}, {'display': 'none'})]
+            )(timed_callback(perform_and_display_analysis, background=True))
+        else:
+            timed_analysis = timed_callback(perform_and_display_analysis)
+            @self.app.callback(run_outputs, Input('run-analysis', 'n_clicks'), run_states)
+            def perform_analysis_in_callback(*args):
+                return timed_analysis(lambda progress: None, *args)
+        
+        # Define the apparition of the graph based on the user's selection in the dropdown of selected analysis
+        # The browser draws the analysis itself when it has the prices of the run, otherwise it asks the server in the 'analysis-request' store
+        # (the analysis, the handle of the run and the parameters), it doesn't ask again for the analysis already shown
+        self.app.clientside_callback(
+            ClientsideFunction(namespace='dashboard', function_name='route_analysis'),
+            [Output('client-analysis-graph', 'figure'), Output('client-analysis-container', 'style'),
+             Output('selected-analysis-output', 'style'), Output('analysis-request', 'data')],
+            [Input('analysis-dropdown', 'value'), Input('volatility-window', 'value'), Input('distribution-overlays', 'value'),
+             Input('client-rendering', 'value'), Input('analysis-data', 'data'), Input('analysis-run', 'data'),
+             Input('monte-carlo-method', 'value'), Input('monte-carlo-paths', 'value'), Input('monte-carlo-horizon', 'value')],
+            [State('figure-template', 'data'), State('analysis-request', 'data')]
+        )
+
+        # The server draws the analyses asked by the browser
+        @self.app.callback(
+            Output('selected-analysis-output', 'children'),
+            Input('analysis-request', 'data'),
+            prevent_initial_call=True
+        )
+        @timed_callback
+        def display_analysis_result(request):
+            selected_analysis = request.get('analysis')
+            session = session_store.get(request['handle']) if request.get('handle') else None
+            if session is None and request.get('client'):
+                return dash.no_update
+            if session is None:
+                return "This analysis has expired, please run it again." if request.get('handle') else "Select an analysis to display results."
+            analysis = self.session_analysis(session, request.get('window'), request.get('overlays'), request.get('monte_carlo'))
+            # The other selected analyses are drawn while the user looks at the first one (only once per run)
+            prerender = [name for name in session['run']['prerender'] if name != selected_analysis] if request.get('prerender') else []
+            # The first analysis of the run is drawn by the browser, the server only prepares the other ones
+            if request.get('client'):
+                analysis.prerender(prerender)
+                return dash.no_update
+            # Verifies that the method to execute exists, preventing runtime errors
+            if selected_analysis and hasattr(analysis, selected_analysis):
+                # Return the plotly figure created in the analysis of the session, or the one already drawn
+                figure = analysis.figure(selected_analysis)
+                analysis.prerender(prerender)
+                return dcc.Graph(id='analysis-graph', figure=figure)
+            return "Select an analysis to display results."
+
+        # When the user zooms on a time series, the visible range is drawn again from a finer level of its pyramid
+        # A double click (autorange) goes back to the whole history
+        @self.app.callback(
+            Output('analysis-graph', 'figure'),
+            Input('analysis-graph', 'relayoutData'),
+            [State('analysis-dropdown', 'value'), State('analysis-run', 'data'), State('volatility-window', 'value'),
+             State('distribution-overlays', 'value')],
+            prevent_initial_call=True
+        )
+        @timed_callback
+        def refine_zoomed_figure(relayout_data, selected_analysis, handle, volatility_window, distribution_overlays):
+            session = session_store.get(handle) if handle else None
+            if not relayout_data or session is None or selected_analysis not in self.analysis.zoomable_analyses:
+                raise exceptions.PreventUpdate
+            if 'xaxis.range[0]' in relayout_data:
+                x_range = [relayout_data['xaxis.range[0]'], relayout_data['xaxis.range[1]']]
+            elif 'xaxis.range' in relayout_data:
+                x_range = relayout_data['xaxis.range']
+            elif relayout_data.get('xaxis.autorange'):
+                x_range = None
+            else:
+                raise exceptions.PreventUpdate
+            analysis = self.session_analysis(session, volatility_window, distribution_overlays)
+            figure = analysis.figure(selected_analysis, x_range=x_range)
+            figure.update_layout(uirevision=selected_analysis)
+            if x_range is not None:
+                figure.update_xaxes(range=x_range)
+            return figure
+        ### Callbacks for the screener
+        # The industries proposed are the ones of the sectors selected
+        @self.app.callback(
+            Output('screener-industries', 'options'),
+            Input('screener-sectors', 'value')
+        )
+        @timed_callback
+        def update_screener_industries(sectors):
+            companies = ticker_universe.table()
+            if sectors:
+                companies = companies[companies['sector'].isin(sectors)]
+            return sorted(set(companies['industry']) - {''})
+
+        # The screen runs in a background process like the analysis, the table gets one row per company with prices
+        screener_outputs = [Output('screener-table', 'data'), Output('screener-message', 'children')]
+        screener_states = [State('screener-sectors', 'value'), State('screener-industries', 'value'), State('screener-min-market-cap', 'value'),
+                           State('screener-period', 'value')]
+
+        def run_screener(set_progress, n_clicks, sectors, industries, min_market_cap, period):
+            if n_clicks == 0:
+                raise exceptions.PreventUpdate
+            tickers = ticker_universe.select(sectors, industries, min_market_cap * 1e9 if min_market_cap else None)
+            if not tickers:
+                return [], "No company matches these filters."
+            end_date = pd.Timestamp.today().normalize()
+            start_date = end_date - pd.DateOffset(years=period or 1)
+
+            # The progress is only sent every percent, each update is a write in the job cache
+            def report(done, total, ticker):
+                if ticker is None or done == total or done % max(1, total // 100) == 0:
+                    set_progress((str(done), str(total), f"{done} / {total} companies loaded"))
+            try:
+                rows = self.screen(tickers, start_date, end_date, progress=report)
+            except Exception as e:
+                return [], f"Error loading the prices of the screen: {str(e)}"
+            missing = len(tickers) - len(rows)
+            return rows, f"No price found for {missing} of the {len(tickers)} companies." if missing else ""
+
+        if background_callback_manager is not None:
+            self.app.callback(
+                screener_outputs, Input('run-screener', 'n_clicks'), screener_states,
+                background=True,
+                progress=[Output('screener-progress', 'value'), Output('screener-progress', 'max'), Output('screener-progress-label', 'children')],
+                running=[(Output('run-screener', 'children'), 'Restart Screener', 'Run Screener'),
+                         (Output('screener-progress-container', 'style'), {'display': 'flex', 'align-items': 'center'}, {'display': 'none'})]
+            )(timed_callback(run_screener, background=True))
+        else:
+            timed_screener = timed_callback(run_screener)
+            @self.app.callback(screener_outputs, Input('run-screener', 'n_clicks'), screener_states)
+            def run_screener_in_callback(*args):
+                return timed_screener(lambda progress: None, *args)
+
+        # This callback uses a JavaScript function to handle clipboard actions 
+        self.app.clientside_callback(
+            """
+            function(n_clicks, ticker) {
+                if (n_clicks > 0) {
+                    navigator.clipboard.writeText(ticker).then(function() {
+                        // Change button text temporarily to indicate success
+                        setTimeout(function(){ document.getElementById('copy-btn').textContent = 'Copy'; }, 2000);  // Revert to 'Copy' after 2 seconds
+                        return 'Copied!';
+                    }, function(err) {
+                        console.error('Could not copy text: ', err);
+                        return 'Failed to copy!';
+                    });
+                }
+                return 'Copy';  // Default text ensuring users know it's the copy button
+            }
+            """,
+            Output('copy-btn', 'children'),
+            [Input('copy-btn', 'n_clicks')],
+            [State('ticker-result', 'children')]
+        )
+
+    # Analysis of a session with the parameters of the dashboard, a missing or too small window keeps the default one
+    # The number of paths and the horizon of the Monte Carlo projection are kept in their bounds, missing ones keep the defaults
+    def session_analysis(self, session, volatility_window, distribution_overlays, monte_carlo=None):
+        run = session['run']
+        analysis = self.analysis.session(session['panel'], run['tickers'], run['weights'], run['interval'], run['frequency'],
+                                         run.get('base_currency'))
+        analysis.volatility_window = int(volatility_window) if volatility_window and volatility_window >= 2 else 20
+        analysis.distribution_overlays = distribution_overlays or []
+        if monte_carlo:
+            method, paths, horizon = monte_carlo
+            analysis.monte_carlo = ('gbm' if method == 'gbm' else 'bootstrap',
+                                    int(min(max(paths or 10000, 100), 1000000)), int(min(max(horizon or 252, 1), 2520)))
+        return analysis
+
+    # The timings are served on the /metrics route of the Flask server, each request is timed and profiled on demand
+    def setup_monitoring(self):
+        server = self.app.server
+
+        @server.route('/metrics')
+        def metrics():
+            return flask.Response(telemetry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+        @server.before_request
+        def start_request():
+            flask.g.request_start = time.perf_counter()
+            if profile_dir or flask.request.headers.get('X-Profile') == '1':
+                flask.g.profiler = cProfile.Profile()
+                flask.g.profiler.enable()
+
+        @server.after_request
+        def end_request(response):
+            now = time.perf_counter()
+            # The rule ('/_dash-update-component', '/_dash-component-suites/<...>') rather than the path keeps the labels few
+            rule = flask.request.url_rule.rule if flask.request.url_rule is not None else 'unknown'
+            telemetry.observe('request', now - flask.g.pop('request_start', now), rule=rule, status=response.status_code)
+            # Between the end of the callback and here, Dash serialized the answer of the callback to json
+            if 'callback_done' in flask.g:
+                callback, callback_done = flask.g.pop('callback_done')
+                telemetry.observe('serialization', now - callback_done, callback=callback)
+                if not response.direct_passthrough:
+                    telemetry.increment('response_bytes', response.content_length or 0, callback=callback)
+            profiler = flask.g.pop('profiler', None)
+            if profiler is not None:
+                profiler.disable()
+                self.dump_profile(profiler)
+            return response
+
+    # Compress the answers of the server (see compress_body), the bytes sent are counted for each encoding
+    def setup_compression(self):
+        @self.app.server.after_request
+        def compress_response(response):
+            accepted = flask.request.headers.get('Accept-Encoding', '')
+            encoding = 'br' if brotli is not None and 'br' in accepted else 'gzip' if 'gzip' in accepted else None
+            if (encoding is None or response.direct_passthrough or response.status_code != 200 or 'Content-Encoding' in response.headers
+                    or response.mimetype not in compressible_types):
+                return response
+            body = response.get_data()
+            if len(body) < compression_min_bytes:
+                return response
+            with telemetry.span('compression', encoding=encoding):
+                if flask.request.path.startswith(('/_dash-component-suites/', '/assets/')):
+                    key = (flask.request.path, encoding, zlib.crc32(body))
+                    if key not in compressed_files:
+                        compressed_files[key] = compress_body(body, encoding)
+                    compressed = compressed_files[key]
+                else:
+                    compressed = compress_body(body, encoding)
+            response.set_data(compressed)
+            response.headers['Content-Encoding'] = encoding
+            response.vary.add('Accept-Encoding')
+            telemetry.increment('compressed_bytes', len(compressed), encoding=encoding)
+            return response
+
+    # One .prof file per request, named after the time, the route and the callback (the output for Dash)
+    def dump_profile(self, profiler):
+        folder = profile_dir or os.path.join(dir_path, 'profiles')
+        body = flask.request.get_json(silent=True) if flask.request.is_json else None
+        target = body.get('output', '') if isinstance(body, dict) else ''
+        name = '_'.join(part for part in (flask.request.path.strip('/'), target) if part) or 'index'
+        name = ''.join(character if character.isalnum() or character in '-_.' else '_' for character in name)[:120]
+        try:
+            os.makedirs(folder, exist_ok=True)
+            profiler.dump_stats(os.path.join(folder, f"{time.strftime('%Y%m%d-%H%M%S')}_{uuid.uuid4().hex[:6]}_{name}.prof"))
+        except OSError as e:
+            print(f"Failed to save the profile of the request: {e}")
+
+    # Rows of the table of the screener for the tickers, between two dates
+    # The panel of a screen is kept in the session store under a handle made of the tickers, the dates and the version of their prices
+    # in the price store, so the next screens of the same companies (by any user, in any process) only compute the statistics
+    def screen(self, tickers, start_date, end_date, progress=None):
+        store = self.analysis.store
+        store.fetch_many(tickers + ['^GSPC'], start_date, end_date, progress=progress)
+        key = json.dumps([tickers, str(start_date), str(end_date), store.coverage_fingerprint(tickers + ['^GSPC'])])
+        handle = f"screen-{hashlib.sha1(key.encode()).hexdigest()}"
+        session = session_store.get(handle)
+        if session is None:
+            panel, _ = self.analysis.load(tickers, start_date, end_date, benchmark=True)
+            session = {'run': {'tickers': tickers, 'weights': None, 'prerender': [], 'interval': '1d', 'frequency': None}, 'panel': panel}
+            session_store.put(session, handle=handle)
+        statistics = self.analysis.session(session['panel'], tickers).screen_statistics()
+        companies = ticker_universe.table().drop_duplicates('ticker').set_index('ticker')
+        rows = companies.loc[statistics.pop('tickers'), ['name', 'sector', 'industry', 'market cap']]
+        rows['market cap'] = rows['market cap'] / 1e9
+        for column, values in statistics.items():
+            rows[column] = values
+        rows = rows.sort_values('market cap', ascending=False).reset_index()
+        # NaN is not valid json, the cells without value are left empty
+        return rows.astype(object).where(rows.notna(), None).to_dict('records')
+
+### This part makes the application running and create the server 
+    def run(self):
+        self.app.run_server(debug=True)
+
+# Entry point for a WSGI server running several worker processes, e.g. gunicorn -w 4 "Dashboard_Financial_Analysis:create_server()"
+# The workers share the price store and the session store on disk
+def create_server():
+    return Dashboard_Financial_Analysis(FinancialAnalysis()).app.server
+
+# When the app is created, it creates two instances of the class directly
+# The app instance which represents the dashboard, utilizes the financial analysis functionalities directly !
+if __name__ == '__main__':
+    analysis_instance = FinancialAnalysis()
+    app = Dashboard_Financial_Analysis(analysis_instance)
+    app.run()
+
+                                                            ### End of code
+
 # This code is meant to be used with the csv file "companies", don't forget to download in the same place as this script 
\ No newline at end of file
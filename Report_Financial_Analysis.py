@@ -0,0 +1,195 @@
+### Batch reports of the Financial Analysis Dashboard
+
+# The analyses of the dashboard for many tickers at once, without starting the dashboard (nightly reports for example)
+# The prices of all the tickers are first downloaded in the price store (in batches, only the missing dates), then the tickers are
+# shared out in chunks to a pool of processes which read them from the store and draw the figures, so the work scales with the cores
+# Each figure is saved as html and/or json in <output>/figures/<ticker>/, the statistics of all the tickers in <output>/statistics.csv
+#     python Report_Financial_Analysis.py AAPL MSFT NVDA --start 2015-01-01 --output reports
+#     python Report_Financial_Analysis.py --sector Technology --formats json --workers 8
+#     python Report_Financial_Analysis.py NESN.SW NVDA 005930.KS --currency EUR
+# From Python: run_report(['AAPL', 'MSFT'], '2015-01-01', '2024-01-01', 'reports')
+
+import os
+import sys
+import math
+import argparse
+from urllib.parse import quote
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+import Dashboard_Financial_Analysis as dfa
+
+# The analyses of one asset proposed by the dashboard
+single_asset_analyses = ['plot_index_evolution', 'plot_returns_distribution', 'plot_volatility_evolution', 'plot_daily_returns_evolution',
+                         'plot_weekly_returns_evolution', 'perform_linear_regression', 'plot_rolling_regression', 'plot_value_at_risk',
+                         'plot_drawdowns', 'plot_risk_ratios', 'plot_monte_carlo']
+
+
+### Selection of the tickers
+
+# Tickers of companies.csv in one of the sectors or industries (case insensitive)
+def tickers_by_classification(sectors=(), industries=()):
+    tickers = dfa.ticker_universe.select(sectors=sectors) if sectors else []
+    return list(dict.fromkeys(tickers + (dfa.ticker_universe.select(industries=industries) if industries else [])))
+
+# Tickers of a text file, separated by new lines or commas
+def tickers_from_file(path):
+    with open(path) as f:
+        return [ticker.strip() for line in f for ticker in line.split(',') if ticker.strip()]
+
+
+### Creation of the work of one process
+
+# The price stores of the process, one per folder
+stores = {}
+
+def process_store(store_root):
+    if store_root not in stores:
+        stores[store_root] = dfa.PriceStore(dfa.data_provider, root=store_root)
+    return stores[store_root]
+
+# Statistics of the tickers of a chunk, computed in one pass over their panel
+def chunk_statistics(session, tickers):
+    statistics = session.portfolio_statistics()
+    annualization = np.sqrt(dfa.periods_per_year(session.bar_frequency))
+    rows = []
+    for i, ticker in enumerate(tickers):
+        dates, prices = session.data.series(ticker)
+        _, volatility = session.volatility(ticker)
+        rows.append({
+            'ticker': ticker,
+            'name': dfa.get_company_name(ticker),
+            'currency': session.ticker_currency(ticker),
+            'start': pd.Timestamp(dates[0]),
+            'end': pd.Timestamp(dates[-1]),
+            'bars': len(dates),
+            'total return': prices[-1] / prices[0] - 1,
+            'annualized volatility': statistics['volatility'][i] * annualization,
+            f'last volatility ({session.volatility_window} {session.bar_unit}, annualized)': volatility[-1] * annualization if len(volatility) else np.nan,
+            'beta on S&P 500': statistics['betas'][i] if statistics['betas'] is not None else np.nan,
+        })
+    return rows
+
+# Draw the analyses of a chunk of tickers and save their figures, return the statistics of the tickers
+# The prices (and exchange rates) were downloaded by run_report, they are only read here: the tickers without data are not asked again
+# With a base currency, the prices (and the S&P 500 of the regressions) are converted to it, the tickers without exchange rate are errors
+def report_chunk(tickers, start_date, end_date, output, analyses, formats, interval, frequency, store_root, base_currency=None):
+    analysis = dfa.FinancialAnalysis(store=process_store(store_root))
+    analysis.fx = dfa.FxConverter(analysis.store, fetch=False)
+    panel, missing_tickers = analysis.load(tickers, start_date, end_date, benchmark=True, interval=interval, frequency=frequency, fetch=False)
+    valid_tickers = [ticker for ticker in tickers if ticker not in missing_tickers]
+    rows = [{'ticker': ticker, 'error': 'No data found'} for ticker in tickers if ticker in missing_tickers]
+    if valid_tickers:
+        chunk_session = analysis.session(panel, valid_tickers, interval=interval, frequency=frequency, base_currency=base_currency)
+        rows += [{'ticker': ticker, 'error': f'No exchange rate to {base_currency}'} for ticker in valid_tickers if ticker not in chunk_session.data]
+        valid_tickers = [ticker for ticker in valid_tickers if ticker in chunk_session.data]
+        rows += chunk_statistics(chunk_session, valid_tickers)
+    errors = {}
+    for ticker in valid_tickers:
+        session = analysis.session(panel, [ticker], interval=interval, frequency=frequency, base_currency=base_currency)
+        folder = os.path.join(output, 'figures', quote(ticker, safe=''))
+        os.makedirs(folder, exist_ok=True)
+        for analysis_name in analyses:
+            try:
+                # The figures are only drawn once, they don't go through the figure cache
+                figure = getattr(session, analysis_name)()
+                if figure is None:
+                    continue
+                if 'html' in formats:
+                    figure.write_html(os.path.join(folder, f'{analysis_name}.html'), include_plotlyjs='cdn')
+                if 'json' in formats:
+                    figure.write_json(os.path.join(folder, f'{analysis_name}.json'))
+            except Exception as e:
+                errors.setdefault(ticker, []).append(f'{analysis_name}: {e}')
+    for row in rows:
+        if row['ticker'] in errors:
+            row['error'] = '; '.join(errors[row['ticker']])
+    # The process may be stopped by the pool at any time, its timings are saved after each chunk
+    dfa.telemetry.flush()
+    return rows
+
+
+### Creation of the report
+
+def run_report(tickers, start_date, end_date, output, analyses=single_asset_analyses, formats=('html', 'json'), workers=None,
+               interval='1d', frequency=None, chunk_size=None, store_root=dfa.price_store_path, base_currency=None):
+    tickers = list(dict.fromkeys(tickers))
+    workers = workers or os.cpu_count()
+    store = process_store(store_root).for_interval(interval)
+    # The dates after the last closed bar would be asked again by every chunk, they can't be in the store yet
+    end_date = min(pd.Timestamp(end_date), store.covered_until())
+    os.makedirs(output, exist_ok=True)
+
+    # All the missing prices are downloaded once, in batches and in parallel (S&P 500 included for the betas and regressions)
+    # The report waits for every download, the processes of the pool then find all the prices in the store
+    def report_progress(done, total, ticker):
+        if ticker is not None and (done % 100 == 0 or done == total):
+            print(f"{done} / {total} tickers downloaded")
+    store.fetch_many(tickers + ['^GSPC'], start_date, end_date, progress=report_progress, stale_ok=False)
+    # The exchange rates of the currencies of the tickers too, from a week before the start like FxConverter.rates
+    if base_currency:
+        currencies = {dfa.minor_currencies.get(currency, (currency, 1))[0] for currency in map(dfa.get_currency, tickers + ['^GSPC'])}
+        store.fetch_many([dfa.fx_ticker(currency) for currency in sorted(currencies | {base_currency}) if currency and currency != 'USD'],
+                         pd.Timestamp(start_date) - pd.Timedelta(days=7), end_date, stale_ok=False)
+
+    # Several chunks per process, so that a slow chunk does not leave the other processes waiting at the end
+    chunk_size = chunk_size or max(1, min(50, math.ceil(len(tickers) / (workers * 4))))
+    chunks = [tickers[i:i + chunk_size] for i in range(0, len(tickers), chunk_size)]
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(report_chunk, chunk, start_date, end_date, output, list(analyses), tuple(formats), interval, frequency,
+                                   store_root, base_currency): chunk for chunk in chunks}
+        for done, future in enumerate(as_completed(futures), start=1):
+            try:
+                rows += future.result()
+            except Exception as e:
+                rows += [{'ticker': ticker, 'error': str(e)} for ticker in futures[future]]
+            print(f"{done} / {len(chunks)} chunks of tickers reported")
+
+    # The statistics are written once, in the order of the tickers asked
+    order = {ticker: i for i, ticker in enumerate(tickers)}
+    statistics = pd.DataFrame(sorted(rows, key=lambda row: order[row['ticker']]))
+    statistics = statistics.reindex(columns=[column for column in statistics.columns if column != 'error'] + ['error'])
+    statistics.to_csv(os.path.join(output, 'statistics.csv'), index=False)
+    return statistics
+
+
+### Run the report from the command line
+
+def main():
+    parser = argparse.ArgumentParser(description='Batch reports of the Financial Analysis Dashboard, without starting the dashboard.')
+    parser.add_argument('tickers', nargs='*', help='tickers to report')
+    parser.add_argument('--tickers-file', help='text file with tickers separated by new lines or commas')
+    parser.add_argument('--sector', nargs='+', default=[], help='add the tickers of these sectors of companies.csv')
+    parser.add_argument('--industry', nargs='+', default=[], help='add the tickers of these industries of companies.csv')
+    parser.add_argument('--start', default='2015-01-01', help='start date (YYYY-MM-DD)')
+    parser.add_argument('--end', default=pd.Timestamp.today().strftime('%Y-%m-%d'), help='end date (YYYY-MM-DD), excluded')
+    parser.add_argument('--interval', default='1d', help="interval of the bars ('1d', '1h', '5m', ...)")
+    parser.add_argument('--frequency', help="frequency the bars are resampled to ('1h', 'D', 'W', 'M')")
+    parser.add_argument('--currency', choices=dfa.base_currencies, help='currency all the prices are converted to')
+    parser.add_argument('--analyses', nargs='+', choices=single_asset_analyses, default=single_asset_analyses, help='analyses to draw')
+    parser.add_argument('--formats', nargs='+', choices=['html', 'json'], default=['html', 'json'], help='formats of the figures')
+    parser.add_argument('--output', default='reports', help='folder of the report')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='number of processes')
+    parser.add_argument('--chunk-size', type=int, help='number of tickers per task of a process')
+    args = parser.parse_args()
+
+    tickers = list(args.tickers)
+    if args.tickers_file:
+        tickers += tickers_from_file(args.tickers_file)
+    if args.sector or args.industry:
+        tickers += tickers_by_classification(args.sector, args.industry)
+    if not tickers:
+        parser.error('no ticker to report, give tickers, a file of tickers or a sector/industry')
+
+    statistics = run_report(tickers, args.start, args.end, args.output, analyses=args.analyses, formats=args.formats,
+                            workers=args.workers, interval=args.interval, frequency=args.frequency, chunk_size=args.chunk_size,
+                            base_currency=args.currency)
+    failed = int(statistics['error'].notna().sum()) if 'error' in statistics else 0
+    print(f"Report of {len(statistics)} tickers saved in {args.output} ({failed} with errors)")
+    if failed == len(statistics):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
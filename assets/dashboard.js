@@ -0,0 +1,193 @@
+// Analyses of the Financial Analysis Dashboard drawn in the browser
+
+// The run sends the prices of its tickers once as typed arrays (see FinancialAnalysis.client_data), the browser then computes the returns,
+// the volatility and the weekly returns and draws their figures like the server does, so switching between these analyses
+// or changing the volatility window makes no request to the server
+// Dash loads this file by itself because it is in the assets folder next to the dashboard
+
+(function() {
+    var day = 86400000;
+
+    // Creation of a function that joins the names of the assets for the titles, a long basket is only counted (like join_titles)
+    function joinTitles(titles) {
+        return titles.length > 3 ? titles.length + ' assets' : titles.join(' and ');
+    }
+
+    // Array sent in base64 with its type, like the arrays of the traces of plotly (see typed_array)
+    function decode(array) {
+        var text = atob(array.bdata), bytes = new Uint8Array(text.length);
+        for (var k = 0; k < text.length; k++) {
+            bytes[k] = text.charCodeAt(k);
+        }
+        return array.dtype === 'f4' ? new Float32Array(bytes.buffer) : new Float64Array(bytes.buffer);
+    }
+
+    // The arrays of the last run are only decoded once
+    var decoded = {data: null, dates: null, prices: null};
+    function arrays(data) {
+        if (decoded.data !== data) {
+            decoded = {data: data, dates: decode(data.dates), prices: data.prices.map(decode)};
+        }
+        return decoded;
+    }
+
+    // Dates and prices of a ticker where it traded
+    function series(data, i) {
+        var dates = [], prices = [], all = arrays(data), column = all.prices[i];
+        for (var k = 0; k < column.length; k++) {
+            if (!isNaN(column[k])) {
+                dates.push(all.dates[k]);
+                prices.push(column[k]);
+            }
+        }
+        return [dates, prices];
+    }
+
+    // Returns between two prices, on the dates of the second one
+    function returns(dates, prices) {
+        var x = [], y = [];
+        for (var k = 1; k < prices.length; k++) {
+            x.push(dates[k]);
+            y.push(prices[k] / prices[k - 1] - 1);
+        }
+        return [x, y];
+    }
+
+    // Rolling standard deviation of the returns with running sums of the centered values (like rolling_std)
+    function volatility(dates, values, window) {
+        var x = [], y = [];
+        if (values.length < window) {
+            return [x, y];
+        }
+        var mean = 0;
+        for (var k = 0; k < values.length; k++) {
+            mean += values[k] / values.length;
+        }
+        var sum = 0, squares = 0;
+        for (var k = 0; k < values.length; k++) {
+            var value = values[k] - mean;
+            sum += value;
+            squares += value * value;
+            if (k >= window) {
+                var old = values[k - window] - mean;
+                sum -= old;
+                squares -= old * old;
+            }
+            if (k >= window - 1) {
+                x.push(dates[k]);
+                y.push(Math.sqrt(Math.max((squares - sum * sum / window) / (window - 1), 0)));
+            }
+        }
+        return [x, y];
+    }
+
+    // Last price of each week, the weeks end on Sunday at midnight like the weekly resampling of pandas
+    function weeklyPrices(dates, prices) {
+        var x = [], y = [];
+        for (var k = 0; k < dates.length; k++) {
+            var days = Math.ceil(dates[k] / day);
+            // The 1st of January 1970 was a Thursday
+            var sunday = (days + (7 - ((days + 4) % 7 + 7) % 7) % 7) * day;
+            if (x.length && x[x.length - 1] === sunday) {
+                y[y.length - 1] = prices[k];
+            } else {
+                x.push(sunday);
+                y.push(prices[k]);
+            }
+        }
+        return [x, y];
+    }
+
+    // One line per ticker, drawn with WebGL above the same number of points as the server
+    function figure(data, lines, title, yaxis) {
+        var traces = lines.map(function(line) {
+            return {type: line[0].length > data.webgl_threshold ? 'scattergl' : 'scatter', mode: 'lines', x: line[0], y: line[1], name: line[2]};
+        });
+        return {data: traces, layout: {title: {text: title}, xaxis: {title: {text: 'Date'}, type: 'date'}, yaxis: yaxis}};
+    }
+
+    // Two requests to the server for the same analysis of the same run with the same parameters
+    function sameRequest(request, next) {
+        return ['analysis', 'handle', 'window'].every(function(key) { return request[key] === next[key]; })
+               && JSON.stringify(request.overlays) === JSON.stringify(next.overlays)
+               && JSON.stringify(request.monte_carlo) === JSON.stringify(next.monte_carlo);
+    }
+
+    // The analyses which the browser can draw, with the same names as the plot methods of the server
+    var views = {
+        plot_index_evolution: function(data) {
+            var lines = data.tickers.map(function(ticker, i) {
+                var line = series(data, i);
+                return [line[0], line[1], data.names[i] + ' Prices (' + data.currencies[i] + ')'];
+            });
+            var text = data.names.length === 1 ? 'Evolution of Index prices ' + data.names[0] + ' in ' + data.currencies[0]
+                                               : 'Evolution of Index for ' + joinTitles(data.names) + (data.currency ? ' in ' + data.currency : '');
+            return figure(data, lines, text, {title: {text: 'Adjusted Close Price'}});
+        },
+        plot_volatility_evolution: function(data, windowBars) {
+            var lines = data.tickers.map(function(ticker, i) {
+                var line = series(data, i);
+                line = returns(line[0], line[1]);
+                line = volatility(line[0], line[1], windowBars);
+                return [line[0], line[1], data.names[i] + ' Volatility (' + windowBars + ' ' + data.bar_unit + ')'];
+            });
+            var text = 'Evolution of ' + data.bar_label + ' Volatility for ' + joinTitles(data.names);
+            return figure(data, lines, text, {title: {text: 'Volatility'}});
+        },
+        plot_daily_returns_evolution: function(data) {
+            var lines = data.tickers.map(function(ticker, i) {
+                var line = series(data, i);
+                line = returns(line[0], line[1]);
+                return [line[0], line[1], data.names[i] + ' ' + data.bar_label + ' Returns'];
+            });
+            var text = 'Evolution of ' + data.bar_label + ' Returns for ' + joinTitles(data.names);
+            return figure(data, lines, text, {title: {text: data.bar_label + ' Returns (%)'}, tickformat: '%'});
+        },
+        plot_weekly_returns_evolution: function(data) {
+            var lines = data.tickers.map(function(ticker, i) {
+                var line = series(data, i);
+                line = weeklyPrices(line[0], line[1]);
+                line = returns(line[0], line[1]);
+                return [line[0], line[1], data.names[i] + ' Weekly Returns'];
+            });
+            var text = 'Weekly Returns Evolution for ' + joinTitles(data.names);
+            return figure(data, lines, text, {title: {text: 'Weekly Returns (%)'}, tickformat: '%'});
+        }
+    };
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        dashboard: {
+            // Draw the selected analysis in the browser when it can, otherwise ask the server for it in the 'analysis-request' store
+            // Return the figure drawn in the browser, the styles of its container and of the one of the server, and the request
+            route_analysis: function(selected, volatilityWindow, overlays, clientRendering, data, handle,
+                                     monteCarloMethod, monteCarloPaths, monteCarloHorizon, template, request) {
+                var noUpdate = window.dash_clientside.no_update;
+                var triggered = (window.dash_clientside.callback_context.triggered || []).map(function(t) { return t.prop_id; });
+                var newRun = triggered.indexOf('analysis-run.data') >= 0;
+                // A missing or too small window keeps the default one, like the server
+                var windowBars = volatilityWindow && volatilityWindow >= 2 ? Math.floor(volatilityWindow) : 20;
+                // The parameters of the Monte Carlo projection only change its own figure
+                var monteCarlo = selected === 'plot_monte_carlo' ? [monteCarloMethod, monteCarloPaths, monteCarloHorizon] : null;
+                var next = {analysis: selected || null, handle: handle || null, window: windowBars, overlays: overlays || [], monte_carlo: monteCarlo};
+
+                var local = views.hasOwnProperty(selected) && data && data.handle === handle
+                            && clientRendering && clientRendering.indexOf('client') >= 0;
+                if (local) {
+                    var drawn = views[selected](data, windowBars);
+                    drawn.layout.template = template;
+                    // Keep the zoom and the legend selection when the window changes
+                    drawn.layout.uirevision = selected;
+                    // The server still prepares the other analyses of a new run while the user looks at this one
+                    var prepare = newRun && data.prerender ? Object.assign(next, {prerender: true, client: true}) : noUpdate;
+                    return [drawn, {'display': 'block'}, {'display': 'none'}, prepare];
+                }
+
+                // The analysis already shown by the server is shown again without asking it
+                if (!handle || (request && !request.client && sameRequest(request, next))) {
+                    return [noUpdate, {'display': 'none'}, {'display': 'block'}, noUpdate];
+                }
+                return [noUpdate, {'display': 'none'}, {'display': 'block'}, Object.assign(next, {prerender: newRun})];
+            }
+        }
+    });
+})();
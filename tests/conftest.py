@@ -0,0 +1,21 @@
+# The dashboard reads the data provider when it is imported, the tests run offline on the fixture prices
+import os
+os.environ['DASHBOARD_DATA_PROVIDER'] = 'fixture'
+
+import pytest
+
+import Dashboard_Financial_Analysis as dfa
+
+
+# Cold tickers behind a slow provider: 50 ms per ticker asked, each request guarded by a timeout of 1 s and a deadline of 2 s
+# 48 tickers asked in one request would take 2.4 s, the store must ask them in batches to get them
+# The random walks start at the end of 2022 so that generating them costs little next to the latency
+@pytest.fixture
+def slow_provider():
+    fixture = dfa.FixtureProvider(origin='2022-12-01')
+    return dfa.GuardedProvider(dfa.FaultyProvider(fixture, ticker_latency=0.05), timeout=1.0, deadline=2.0, rate=1000, burst=1000)
+
+
+@pytest.fixture
+def many_tickers():
+    return [f'T{i:03d}' for i in range(48)]
@@ -0,0 +1,16 @@
+
+import Dashboard_Financial_Analysis as dfa
+
+
+# USD tickers converted to USD keep the same prices, hence the same fingerprint: the figure cache must still tell them apart
+def test_figure_cache_separates_converted_panels(tmp_path):
+    analysis = dfa.FinancialAnalysis(store=dfa.PriceStore(dfa.FixtureProvider(), root=str(tmp_path)))
+    panel, _ = analysis.load(['AAPL', 'MSFT'], '2023-01-01', '2024-01-01')
+    native = analysis.session(panel, ['AAPL', 'MSFT'])
+    converted = analysis.session(panel, ['AAPL', 'MSFT'], base_currency='USD')
+    assert converted.data.fingerprint() == native.data.fingerprint()
+
+    native_title = native.figure('plot_index_evolution').layout.title.text
+    converted_title = converted.figure('plot_index_evolution').layout.title.text
+    assert native_title != converted_title
+    assert converted_title.endswith(' in USD')
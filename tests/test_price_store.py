@@ -0,0 +1,29 @@
+import pandas as pd
+
+import Dashboard_Financial_Analysis as dfa
+
+start, end = pd.Timestamp('2023-01-01'), pd.Timestamp('2024-01-01')
+
+
+# Each batch has its own timeout: a basket larger than a batch is stored whole even if one request for all of it would time out
+def test_cold_basket_is_downloaded_in_batches(tmp_path, slow_provider, many_tickers):
+    store = dfa.PriceStore(slow_provider, root=str(tmp_path), batch_size=8)
+    store.fetch_many(many_tickers, start, end)
+    assert all(not store.missing_segments(ticker, start, end) for ticker in many_tickers)
+    assert slow_provider.breaker.opened_at is None
+
+
+# The batches which arrived are kept when another one fails
+def test_failed_batch_keeps_the_others(tmp_path, slow_provider, many_tickers):
+    store = dfa.PriceStore(slow_provider, root=str(tmp_path), batch_size=8)
+    slow_provider.retries = 0
+    slow_provider.provider.ticker_latency = 0
+    download = slow_provider.provider.provider.download
+    def failing_download(tickers, start_date, end_date, interval='1d'):
+        if 'T000' in tickers:
+            raise ConnectionError("Injected failure")
+        return download(tickers, start_date, end_date, interval)
+    slow_provider.provider.provider.download = failing_download
+    store.fetch_many(many_tickers, start, end)
+    assert store.missing_segments('T000', start, end)
+    assert all(not store.missing_segments(ticker, start, end) for ticker in many_tickers[8:])
@@ -0,0 +1,18 @@
+import Dashboard_Financial_Analysis as dfa
+import Report_Financial_Analysis as report
+
+
+# A cold report of more tickers than one request can fetch in time still gets the prices of all of them
+def test_cold_report_of_many_tickers(tmp_path, slow_provider, many_tickers):
+    store_root = str(tmp_path / 'prices')
+    report.stores[store_root] = dfa.PriceStore(slow_provider, root=store_root, batch_size=8)
+    statistics = report.run_report(many_tickers, '2023-01-01', '2024-01-01', str(tmp_path / 'report'), analyses=['plot_index_evolution'],
+                                   formats=['json'], workers=2, store_root=store_root)
+    assert list(statistics['ticker']) == many_tickers
+    assert statistics['error'].isna().all()
+    assert (statistics['bars'] > 200).all()
+
+
+def test_tickers_by_classification_is_case_insensitive():
+    sector = dfa.ticker_universe.table()['sector'].iloc[0]
+    assert report.tickers_by_classification([sector.upper()]) == dfa.ticker_universe.select(sectors=[sector])
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+
+import Dashboard_Financial_Analysis as dfa
+
+
+# Three assets which are never traded on the same day, the last one has a single price: there is no portfolio
+def disjoint_session(tmp_path):
+    fixtures = tmp_path / 'fixtures'
+    fixtures.mkdir()
+    tickers = ['AAA', 'BBB', 'CCC']
+    ranges = [pd.bdate_range('2023-01-02', '2023-02-28'), pd.bdate_range('2023-03-01', '2023-04-28'), pd.DatetimeIndex(['2023-12-29'])]
+    for i, (ticker, dates) in enumerate(zip(tickers, ranges)):
+        prices = 100 * np.exp(np.cumsum(np.random.default_rng(i).normal(0, 0.01, len(dates))))
+        pd.DataFrame({'Open': prices, 'High': prices, 'Low': prices, 'Close': prices, 'Adj Close': prices, 'Volume': 1000},
+                     index=pd.DatetimeIndex(dates, name='Date')).to_csv(fixtures / f'{ticker}.csv')
+    store = dfa.PriceStore(dfa.FixtureProvider(str(fixtures)), root=str(tmp_path / 'prices'))
+    analysis = dfa.FinancialAnalysis(store=store)
+    panel, _ = analysis.load(tickers, '2023-01-01', '2024-01-01')
+    return analysis.session(panel, tickers)
+
+
+def test_drawdowns_without_common_dates_draw_each_asset(tmp_path):
+    figure = disjoint_session(tmp_path).plot_drawdowns()
+    assert [trace.name.split(' (')[0] for trace in figure.data] == [dfa.get_company_name(ticker) for ticker in ['AAA', 'BBB', 'CCC']]
+    assert all(len(trace.y) > 0 for trace in figure.data)
+
+
+def test_monte_carlo_without_common_dates_explains_why(tmp_path):
+    session = disjoint_session(tmp_path)
+    for method in ['bootstrap', 'gbm']:
+        session.monte_carlo = (method, 1000, 20)
+        figure = session.plot_monte_carlo()
+        assert len(figure.data) == 0
+        assert 'Not enough common dates' in figure.layout.title.text
+
+
+# The process of a background job is marked by its callback, its simulations never go to the pool of processes
+def test_background_job_simulates_in_its_process(monkeypatch):
+    monkeypatch.setattr(dfa, 'background_job', False)
+    monkeypatch.setattr(dfa.os, 'cpu_count', lambda: 4)
+    def pool_map(*args):
+        raise AssertionError("the pool of processes was used")
+    monkeypatch.setattr(dfa.simulation_pool, 'map', pool_map)
+    model = dfa.monte_carlo_model(np.random.default_rng(0).normal(0, 0.01, (250, 2)), np.array([0.5, 0.5]), 'bootstrap', 5)
+    counts = dfa.timed_callback(lambda: dfa.simulate(model, dfa.monte_carlo_pool_paths), background=True)()
+    assert dfa.background_job
+    assert counts.sum() == 5 * dfa.monte_carlo_pool_paths
@@ -0,0 +1,16 @@
+import pandas as pd
+
+import Dashboard_Financial_Analysis as dfa
+
+
+# A cold screen of more companies than one request can fetch in time fills the store and has the statistics of all of them
+def test_cold_screen_fills_the_store(tmp_path, monkeypatch, slow_provider):
+    monkeypatch.setattr(dfa, 'session_store', dfa.SessionStore(str(tmp_path / 'sessions')))
+    store = dfa.PriceStore(slow_provider, root=str(tmp_path / 'prices'), batch_size=8)
+    dashboard = dfa.Dashboard_Financial_Analysis(dfa.FinancialAnalysis(store=store))
+    tickers = list(dict.fromkeys(dfa.ticker_universe.table()['ticker']))[:48]
+    rows = dashboard.screen(tickers, '2023-01-01', '2024-01-01')
+    start, end = pd.Timestamp('2023-01-01'), pd.Timestamp('2024-01-01')
+    assert all(not store.missing_segments(ticker, start, end) for ticker in tickers + ['^GSPC'])
+    assert sorted(row['ticker'] for row in rows) == sorted(tickers)
+    assert all(row['total return'] is not None and row['beta'] is not None for row in rows)